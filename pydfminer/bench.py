@@ -0,0 +1,1103 @@
+""" benchmarks
+
+    python -m pydfminer.bench extractors --files=20
+    python -m pydfminer.bench suite --output=bench.json
+    python -m pydfminer.bench suite --baseline=bench.json
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fire
+
+from pydfminer import synthetic
+from pydfminer.cache import ExtractionCache
+from pydfminer.extract import PageStream, extractor
+
+log = logging.getLogger(__name__)
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def extractors(directory=None, files=20, pages=3, backends=('tabula', 'batch')):
+    """ per file extraction latency of each backend over a directory of pdfs
+
+    without a directory a synthetic one is written to a temporary directory
+    """
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        if directory is None:
+            paths = synthetic.write_directory(scratch, files=files, pages=pages)
+        else:
+            paths = sorted(os.path.join(directory, name)
+                           for name in os.listdir(directory)
+                           if name.lower().endswith('.pdf'))
+        report = {'files': len(paths)}
+        for backend in backends:
+            results, elapsed = _timed(list, extractor(backend).extract_many(paths))
+            failed = [pdf for pdf, pdf_json in results if isinstance(pdf_json, Exception)]
+            report[backend] = {
+                'seconds': elapsed,
+                'seconds_per_file': elapsed / len(paths) if paths else 0.0,
+                'failed': len(failed),
+                }
+        return report
+
+
+def _texts(pdf_json):
+    return [[cell['text'] for cell in row] for page in pdf_json for row in page['data']]
+
+
+def parity(files=16, pages=4, transactions=120, reference='batch', backend='pdfminer', area=(6.0, 0, 100, 100)):
+    """ backend's pages against reference's on synthetic pdfs of every layout, whole and cropped to area
+
+    raises AssertionError unless every row has the same cell texts, every
+    cell is within a point of the same left and Becu parses both alike
+    """
+    import itertools
+
+    from pydfminer.columnar import ingest
+    from pydfminer.main import Becu
+
+    layouts = itertools.cycle(itertools.product((1, 3), (0, 1), (0.0, 0.3), (SUITE_LAYOUT['sections'], (synthetic.WITHDRAWALS,))))
+    report = {'files': files}
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        paths = []
+        for seed, (accounts, loans, machine, sections) in zip(range(files), layouts):
+            path = os.path.join(scratch, f"statement-{seed:04d}.pdf")
+            with open(path, 'wb') as f:
+                f.write(synthetic.to_pdf(synthetic.statement(pages=pages + seed % 3, transactions=transactions, seed=seed,
+                                                             accounts=accounts, loans=loans, machine=machine,
+                                                             sections=sections)))
+            paths.append(path)
+        for name, options in (('whole', {}), ('cropped', {'area': list(area)})):
+            expected = dict(extractor(reference, **options).extract_many(paths))
+            actual = dict(extractor(backend, **options).extract_many(paths))
+            rows = 0
+            width = 0.0
+            for path in paths:
+                assert len(actual[path]) == len(expected[path]), f"{path} {name} has a different page count"
+                assert _texts(actual[path]) == _texts(expected[path]), f"{path} {name} has different cells"
+                for page, reference_page in zip(actual[path], expected[path]):
+                    for row, reference_row in zip(page['data'], reference_page['data']):
+                        rows += 1
+                        for cell, reference_cell in zip(row, reference_row):
+                            assert abs(cell['left'] - reference_cell['left']) < 1.0, f"{path} {name} cell moved"
+                            width = max(width, abs(cell['width'] - reference_cell['width']))
+                if name == 'whole':
+                    outcomes = []
+                    for pdf_json in (expected[path], actual[path]):
+                        doc = Becu(ingest(pdf_json))
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            doc.run()
+                        outcomes.append((doc.state, doc.records))
+                    assert outcomes[0] == outcomes[1], f"{path} parses differently"
+            report[name] = {'pages': sum(len(pdf_json) for pdf_json in actual.values()), 'rows': rows,
+                            'max_width_difference': width}
+    report['equivalent'] = True
+    return report
+
+
+_BACKEND_RUN = """
+import json, resource, sys, time
+from pydfminer.extract import extractor
+start = time.perf_counter()
+pages = sum(len(pdf_json) for _, pdf_json in extractor(sys.argv[1]).extract_many(sys.argv[2:]))
+elapsed = time.perf_counter() - start
+print(json.dumps({'pages': pages, 'seconds': elapsed,
+                  'self_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'children_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}))
+"""
+
+
+def backends(files=(1, 10), pages=6, transactions=200, backends=('tabula', 'batch', 'pdfminer')):
+    """ per page latency and peak memory of each backend, each run in a fresh interpreter
+
+    rss is the peak resident set of that interpreter and of its largest
+    child, the jvm for the tabula backends
+    """
+    report = {}
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        paths = synthetic.write_directory(scratch, files=max(files), pages=pages, transactions=transactions)
+        for count in files:
+            for backend in backends:
+                done = subprocess.run([sys.executable, '-c', _BACKEND_RUN, backend, *paths[:count]],
+                                      stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      text=True, check=True)
+                run = json.loads(done.stdout.splitlines()[-1])
+                report[f"{backend}_{count}"] = {
+                    'pages': run['pages'],
+                    'seconds': run['seconds'],
+                    'seconds_per_page': run['seconds'] / run['pages'],
+                    'rss_mb': run['self_rss_kb'] / 1024,
+                    'child_rss_mb': run['children_rss_kb'] / 1024,
+                    }
+    return report
+
+
+def cache(files=20, pages=3, backend='batch'):
+    """ cold extraction into an empty cache, then the same pdfs again warm """
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        paths = synthetic.write_directory(os.path.join(scratch, 'pdfs'), files=files, pages=pages)
+        cache_ = ExtractionCache(os.path.join(scratch, 'cache'))
+        report = {'files': len(paths)}
+        for run in ('cold', 'warm'):
+            _, elapsed = _timed(list, extractor(backend, cache=cache_).extract_many(paths))
+            report[run] = {'seconds': elapsed, 'seconds_per_file': elapsed / len(paths)}
+        report['stats'] = cache_.stats()
+        return report
+
+
+def grammar(documents=1000, builds=5, pages=2, transactions=10):
+    """ cost of building the becu grammar against binding documents to a built one """
+    from pydfminer.main import Becu, BecuGrammar
+
+    build = min(_timed(BecuGrammar)[1] for _ in range(builds))
+    compiled = BecuGrammar()
+    pdf_json = synthetic.to_tabula_json(synthetic.statement(pages=pages, transactions=transactions))
+
+    bind = 0.0
+    run = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(documents):
+            doc, elapsed = _timed(Becu, pdf_json, compiled)
+            bind += elapsed
+            run += _timed(doc.run)[1]
+    return {
+        'documents': documents,
+        'build_seconds': build,
+        'bind_seconds_per_document': bind / documents,
+        'run_seconds_per_document': run / documents,
+        # what every document used to pay
+        'rebuild_seconds_per_document': build + run / documents,
+        'shared_seconds_total': build + bind + run,
+        'rebuild_seconds_total': documents * build + run,
+        }
+
+
+def _outcome(doc, output):
+    return {
+        'state': doc.state,
+        'location': dict(doc.location),
+        'locals': {key: vars(value) for key, value in doc.locals.items()},
+        'records': list(doc.records),
+        'output': output,
+        }
+
+
+def dispatch(documents=50, pages=4, transactions=150, repeat=3):
+    """ rows/sec of the trigger loop and the dispatch table, checking both parse alike
+
+    raises AssertionError if any synthetic document ends in a different
+    state, location, per node state or printed output
+    """
+    from pydfminer.main import Becu
+
+    pdf_jsons = [synthetic.to_tabula_json(synthetic.statement(pages=pages, transactions=transactions, seed=seed))
+                 for seed in range(documents)]
+    rows = sum(len(page['data']) for pdf_json in pdf_jsons for page in pdf_json)
+    grammar = Becu.compile()
+    report = {'documents': documents, 'rows': rows}
+    outcomes = {}
+    for engine, use_dispatch in (('trigger', False), ('dispatch', True)):
+        best = None
+        for _ in range(repeat):
+            elapsed = 0.0
+            outcomes[engine] = []
+            for pdf_json in pdf_jsons:
+                doc = Becu(pdf_json, grammar)
+                with contextlib.redirect_stdout(io.StringIO()) as output:
+                    elapsed += _timed(doc.run, dispatch=use_dispatch)[1]
+                outcomes[engine].append(_outcome(doc, output.getvalue()))
+            best = elapsed if best is None else min(best, elapsed)
+        report[engine] = {'seconds': best, 'rows_per_sec': rows / best}
+    for index, (expected, actual) in enumerate(zip(outcomes['trigger'], outcomes['dispatch'])):
+        assert expected == actual, f"document {index} parses differently with dispatch=True"
+    report['equivalent'] = True
+    report['speedup'] = report['trigger']['seconds'] / report['dispatch']['seconds']
+    return report
+
+
+def profiler(documents=50, pages=4, transactions=150, repeat=3, top=5):
+    """ cost of running with a StateProfiler, which must not change what is parsed
+
+    the unprofiled trigger loop also pays for the NodeState.enter/exit
+    checks, so its rows/sec against bench dispatch shows that cost too
+    """
+    from pydfminer.main import Becu
+    from pydfminer.profiler import StateProfiler
+
+    pdf_jsons = [synthetic.to_tabula_json(synthetic.statement(pages=pages, transactions=transactions, seed=seed))
+                 for seed in range(documents)]
+    rows = sum(len(page['data']) for pdf_json in pdf_jsons for page in pdf_json)
+    grammar = Becu.compile()
+    report = {'documents': documents, 'rows': rows}
+    outcomes = {}
+    for mode in ('off', 'on'):
+        best = None
+        for _ in range(repeat):
+            profile = StateProfiler() if mode == 'on' else None
+            elapsed = 0.0
+            outcomes[mode] = []
+            for pdf_json in pdf_jsons:
+                doc = Becu(pdf_json, grammar)
+                elapsed += _timed(doc.run, profiler=profile)[1]
+                outcomes[mode].append(_outcome(doc, None))
+            best = elapsed if best is None else min(best, elapsed)
+        report[mode] = {'seconds': best, 'rows_per_sec': rows / best}
+    assert outcomes['off'] == outcomes['on'], "profiling changes what is parsed"
+    report['overhead'] = report['on']['seconds'] / report['off']['seconds']
+    states = profile.summary()['states']
+    report['slowest'] = {state: {key: states[state][key] for key in ('entries', 'enter_seconds', 'failed', 'ready_calls')}
+                         for state in sorted(states, key=lambda state: -states[state]['trigger_seconds'])[:top]}
+    return report
+
+
+def context(accounts=300, documents=5, pages=20, transactions=3000, repeat=7, lookups=100000):
+    """ run() over documents with hundreds of accounts, and the per line account/header lookup
+
+    the lookup AccountActivityLine does for every line, two treelib parent()
+    walks against the Context resolved when the grammar was built
+    """
+    from pydfminer import ledger as ledger_
+    from pydfminer.main import AccountActivityLine, Becu, ingest
+
+    generated = []
+    for seed in range(documents):
+        records = []
+        pages_ = synthetic.statement(pages=pages, transactions=transactions, seed=seed, accounts=accounts, loans=2,
+                                     sections=(synthetic.DEPOSITS, synthetic.WITHDRAWALS), machine=0.1, records=records)
+        generated.append((ingest(synthetic.to_tabula_json(pages_)), records))
+    rows = sum(len(page) for pages_, _ in generated for page in pages_)
+    grammar_ = Becu.compile()
+    report = {'documents': documents, 'accounts': accounts, 'rows': rows,
+              'transactions': sum(len(records) for _, records in generated)}
+    for engine, dispatch in (('trigger', False), ('dispatch', True)):
+        def run_all():
+            for pages_, _ in generated:
+                Becu(pages_, grammar_).run(dispatch=dispatch)
+        report[engine] = {'rows_per_sec': rows / min(_timed(run_all)[1] for _ in range(repeat))}
+    for index, (pages_, records) in enumerate(generated):
+        doc = Becu(pages_, grammar_)
+        doc.run()
+        assert doc.frame().equals(ledger_.transactions(records, ' 01/01/2020 ', ' 01/31/2020')), f"document {index}"
+
+    line = grammar_.machine.get_state('deposit_account:AccountActivityLine')
+    assert isinstance(line, AccountActivityLine)
+
+    def walk():
+        for _ in range(lookups):
+            header = grammar_.parent(line.identifier)
+            grammar_.parent(header.identifier)
+
+    def resolved():
+        for _ in range(lookups):
+            line.context.header
+            line.context.account
+
+    assert grammar_.parent(line.identifier) is line.context.header
+    assert grammar_.parent(line.context.header.identifier) is line.context.account
+    walk_seconds = min(_timed(walk)[1] for _ in range(repeat))
+    context_seconds = min(_timed(resolved)[1] for _ in range(repeat))
+    report['lookup_ns'] = {'tree': walk_seconds / lookups * 1e9, 'context': context_seconds / lookups * 1e9}
+    return report
+
+
+def logging_overhead(documents=20, pages=4, transactions=150, levels=('WARNING', 'DEBUG'), repeat=3):
+    """ per row cost of a run at each log level, handlers discard everything """
+    from pydfminer.main import Becu
+
+    pdf_jsons = [synthetic.to_tabula_json(synthetic.statement(pages=pages, transactions=transactions, seed=seed))
+                 for seed in range(documents)]
+    rows = sum(len(page['data']) for pdf_json in pdf_jsons for page in pdf_json)
+    grammar = Becu.compile()
+    loggers = [logging.getLogger(name) for name in ('pydfminer.main', 'transitions')]
+    saved = [(logger.level, logger.propagate, logger.handlers) for logger in loggers]
+    report = {'rows': rows}
+    try:
+        for logger in loggers:
+            logger.propagate = False
+            logger.handlers = [logging.NullHandler()]
+        for level in levels:
+            for logger in loggers:
+                logger.setLevel(level)
+            best = None
+            for _ in range(repeat):
+                elapsed = 0.0
+                for pdf_json in pdf_jsons:
+                    doc = Becu(pdf_json, grammar)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        elapsed += _timed(doc.run)[1]
+                best = elapsed if best is None else min(best, elapsed)
+            report[level] = {'seconds': best, 'microseconds_per_row': best / rows * 1e6}
+    finally:
+        for logger, (level, propagate, handlers) in zip(loggers, saved):
+            logger.setLevel(level)
+            logger.propagate = propagate
+            logger.handlers = handlers
+    return report
+
+
+class _FirstRecord(list):
+    """ Document.records that remembers when the first activity line was recorded """
+    def __init__(self, start):
+        super().__init__()
+        self.start = start
+        self.first = None
+
+    def append(self, record):
+        if self.first is None:
+            self.first = time.perf_counter() - self.start
+        super().append(record)
+
+
+def _preload():
+    """ import numpy and build the becu grammar, which happen once on first use, so tracemalloc counts neither """
+    import numpy  # noqa: F401
+
+    from pydfminer.main import Becu
+
+    Becu.compile()
+
+
+def streaming(pages=200, transactions=8000, seconds_per_page=0.005):
+    """ peak memory and time to the first ledger line, whole document against a PageStream
+
+    extraction is simulated from a synthetic statement at seconds_per_page
+    so the numbers do not depend on java
+    """
+    from pydfminer.main import Becu
+
+    statement = synthetic.statement(pages=pages, transactions=transactions)
+
+    def extracted():
+        for page in statement:
+            time.sleep(seconds_per_page)
+            yield from synthetic.to_tabula_json([page])
+
+    report = {'pages': len(statement)}
+    _preload()
+    for mode in ('list', 'stream'):
+        tracemalloc.start()
+        start = time.perf_counter()
+        pdf_json = list(extracted()) if mode == 'list' else PageStream(extracted())
+        doc = Becu(pdf_json)
+        doc.records = records = _FirstRecord(start)
+        doc.run()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report[mode] = {
+            'seconds': elapsed,
+            'first_line_seconds': records.first,
+            'peak_bytes': peak,
+            }
+    return report
+
+
+def columnar(pages=500, transactions=25000, repeat=3):
+    """ memory held and run throughput of tabula's dicts against ColumnarPage on one large statement """
+    from pydfminer.columnar import ingest
+    from pydfminer.main import Becu
+
+    statement = synthetic.statement(pages=pages, transactions=transactions)
+    _preload()
+    tracemalloc.start()
+    pdf_json = synthetic.to_tabula_json(statement)
+    json_bytes, _ = tracemalloc.get_traced_memory()
+    pages_, ingest_seconds = _timed(ingest, pdf_json)
+    both_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = sum(len(page) for page in pages_)
+    report = {
+        'pages': len(pages_),
+        'rows': rows,
+        'json_bytes': json_bytes,
+        'columnar_bytes': both_bytes - json_bytes,
+        'ingest_seconds': ingest_seconds,
+        }
+    outcomes = {}
+    for name, document in (('json', pdf_json), ('columnar', pages_)):
+        for use_dispatch in (False, True):
+            engine = f"{name}_{'dispatch' if use_dispatch else 'trigger'}"
+            best = None
+            for _ in range(repeat):
+                doc = Becu(document)
+                with contextlib.redirect_stdout(io.StringIO()) as output:
+                    elapsed = _timed(doc.run, dispatch=use_dispatch)[1]
+                best = elapsed if best is None else min(best, elapsed)
+            outcomes[engine] = _outcome(doc, output.getvalue())
+            report[engine] = {'seconds': best, 'rows_per_sec': rows / best}
+    first = next(iter(outcomes.values()))
+    assert all(outcome == first for outcome in outcomes.values()), "columnar pages parse differently"
+    report['equivalent'] = True
+    return report
+
+
+def pagestore(pages=500, transactions=25000, repeat=3, touch=10):
+    """ memory held and run time of an ingested page list against a memory mapped PageStore of one large statement
+
+    the store is written from a PageStream of the tabula pages, as store_pages does with a window.
+    touch pages are read from a freshly opened store, as a worker handed one page range would.
+    tests/test_pagestore.py checks the store parses as the list does
+    """
+    from pydfminer.columnar import ingest
+    from pydfminer.main import Becu
+    from pydfminer.pagestore import PageStore, write
+
+    statement = synthetic.statement(pages=pages, transactions=transactions)
+    pdf_json = synthetic.to_tabula_json(statement)
+    report = {'pages': len(pdf_json)}
+    _preload()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'statement.pages')
+        tracemalloc.start()
+        _, report['write_seconds'] = _timed(write, path, PageStream(iter(pdf_json)))
+        report['write_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report['file_bytes'] = os.path.getsize(path)
+
+        for name in ('list', 'store'):
+            best = None
+            for _ in range(repeat):
+                tracemalloc.start()
+                document, open_seconds = _timed(ingest, pdf_json) if name == 'list' else _timed(PageStore, path)
+                held, _ = tracemalloc.get_traced_memory()
+                doc = Becu(document)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    elapsed = _timed(doc.run)[1]
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                if best is None or elapsed < best['run_seconds']:
+                    best = {'open_seconds': open_seconds, 'held_bytes': held, 'run_seconds': elapsed,
+                            'peak_bytes': peak}
+            report[name] = best
+
+        step = max(1, len(pdf_json) // touch)
+        store, open_seconds = _timed(PageStore, path)
+        start = time.perf_counter()
+        rows = sum(len(store[index]) for index in range(0, len(store), step))
+        report['touch'] = {'pages': len(range(0, len(store), step)), 'rows': rows,
+                           'seconds': open_seconds + time.perf_counter() - start}
+        store.close()
+    return report
+
+
+def parallel(pages=500, transactions=25000, accounts=3, workers=(1, 2, 4), spans=(None,), repeat=3):
+    """ run() against parse_pages over one large statement, with each number of workers and pages per span
+
+    tests/test_parallel.py checks the stitched document is the sequential one
+    """
+    from pydfminer.main import Becu, parse_pages
+    from pydfminer.pagestore import PageStore, write
+
+    statement = synthetic.statement(pages=pages, transactions=transactions, accounts=accounts,
+                                    sections=(synthetic.DEPOSITS, synthetic.WITHDRAWALS, synthetic.CHECKS))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'statement.pages')
+        write(path, synthetic.to_tabula_json(statement))
+        store = PageStore(path)
+        rows = sum(len(page) for page in store)
+        report = {'pages': len(store), 'rows': rows, 'cpus': os.cpu_count()}
+        best = None
+        for _ in range(repeat):
+            doc = Becu(store)
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = _timed(doc.run)[1]
+            best = elapsed if best is None else min(best, elapsed)
+        report['sequential'] = {'seconds': best, 'rows_per_sec': rows / best}
+        for count in workers:
+            for span in spans:
+                best = None
+                for _ in range(repeat):
+                    elapsed = _timed(parse_pages, path, 'becu', workers=count, span=span)[1]
+                    best = elapsed if best is None else min(best, elapsed)
+                report[f"workers_{count}_span_{span or 'even'}"] = {
+                    'seconds': best,
+                    'rows_per_sec': rows / best,
+                    'speedup': report['sequential']['seconds'] / best,
+                    }
+        store.close()
+    return report
+
+
+def _ledger_per_line(lines, year):
+    """ the conversion AccountActivityLine.ledger_line_str used to do, one line at a time """
+    import datetime
+    import dateutil.parser
+
+    default = datetime.datetime(year, 1, 1)
+    for line in lines:
+        date = dateutil.parser.parse(line[0], default=default).strftime("%Y-%m-%d")
+        amount = float(re.sub('[(]', '-', re.sub('[,)]', '', line[1])))
+        yield date, amount, ' '.join(line[2:])
+
+
+def recovery(documents=20, pages=6, transactions=300, accounts=2, repeat=3, seed=0):
+    """ run() over documents with one page that fails to parse, and what checkpoints cost
+
+    an empty row, as extraction sometimes leaves, goes after an activity line
+    on one middle page of every document, where AccountActivityLine looks
+    for a continuation line and fails. errors='raise' loses the document;
+    before checkpoints run() ended quietly there, with only the pages before.
+    the transactions errors='skip' and errors='rollback' keep are counted,
+    tests/test_recovery.py checks which they are. lines rollback records
+    under another account than the clean run are counted. the clean
+    documents are also run without checkpoints to price them
+    """
+    import random
+
+    from pydfminer.main import Becu, Document, ingest
+
+    class Unchecked(Becu):
+        checkpoint = Document.checkpoint
+
+    rng = random.Random(seed)
+    grammar_ = Becu.compile()
+    clean, broken = [], []
+    for index in range(documents):
+        pdf_json = synthetic.to_tabula_json(synthetic.statement(pages=pages, transactions=transactions, seed=index,
+                                                                accounts=accounts, records=[]))
+        clean.append(ingest(pdf_json))
+        page = rng.randrange(1, len(pdf_json) - 2)
+        lines = [number for number, row in enumerate(pdf_json[page]['data'])
+                 if re.match(r'\d\d/\d\d', row[0]['text'])]
+        pdf_json[page]['data'].insert(rng.choice(lines) + 1, [])
+        broken.append((ingest(pdf_json), page))
+    rows = sum(len(page) for pages_ in clean for page in pages_)
+    report = {'documents': documents, 'rows': rows}
+
+    for name, cls in (('checkpoints', Becu), ('no_checkpoints', Unchecked)):
+        def run_all():
+            for pages_ in clean:
+                cls(pages_, grammar_).run()
+        report[name] = {'rows_per_sec': rows / min(_timed(run_all)[1] for _ in range(repeat))}
+    report['checkpoint_overhead'] = report['no_checkpoints']['rows_per_sec'] / report['checkpoints']['rows_per_sec'] - 1
+
+    totals = {'clean': 0, 'quiet_before': 0, 'raise': 0, 'skip': 0, 'rollback': 0, 'rollback_misattributed': 0}
+    for pages_, (broken_pages, page) in zip(clean, broken):
+        doc = Becu(pages_, grammar_)
+        doc.run()
+        expected = doc.records
+        totals['clean'] += len(expected)
+        # how many records the pages before the failed one, and it, give
+        bounded = []
+        for stop in (page, page + 1):
+            doc = Becu(pages_, grammar_)
+            doc.stop = (stop, doc.page_entry(stop)[1])
+            doc.run()
+            bounded.append(len(doc.records))
+        before, through = bounded
+
+        doc = Becu(broken_pages, grammar_)
+        try:
+            doc.run(errors='raise')
+        except IndexError:
+            # what the old run() kept, it took every IndexError for the end of the document
+            totals['quiet_before'] += len(doc.records)
+
+        doc = Becu(broken_pages, grammar_)
+        doc.run(errors='skip')
+        totals['skip'] += len(doc.records)
+
+        doc = Becu(broken_pages, grammar_)
+        doc.run(errors='rollback')
+        remaining = expected[:before] + expected[through:]
+        totals['rollback'] += len(doc.records)
+        totals['rollback_misattributed'] += sum(record != clean_ for record, clean_ in zip(doc.records, remaining))
+    report['transactions'] = totals
+    report['kept'] = {name: totals[name] / totals['clean'] for name in ('quiet_before', 'raise', 'skip', 'rollback')}
+    return report
+
+
+def ledger(transactions=50000, repeat=3, seed=0):
+    """ per line dateutil/float conversion against ledger.frame() on random activity lines
+
+    raises AssertionError if any date, amount or description differs
+    """
+    import random
+
+    from pydfminer import ledger as ledger_
+
+    rng = random.Random(seed)
+    lines = [[f"01/{rng.randint(1, 31):02d}",
+              synthetic.amount(rng.randint(-500000, 2500000)),
+              *rng.choice(synthetic.DESCRIPTIONS).split(' ')]
+             for _ in range(transactions)]
+    start, stop = ' 01/01/2020 ', ' 01/31/2020'
+
+    per_line = min(_timed(list, _ledger_per_line(lines, 2020))[1] for _ in range(repeat))
+    bulk = min(_timed(ledger_.frame, lines, start, stop)[1] for _ in range(repeat))
+    expected = list(_ledger_per_line(lines, 2020))
+    frame = ledger_.frame(lines, start, stop)
+    actual = zip(frame['date'].dt.strftime('%Y-%m-%d'), frame['cents'], frame['description'])
+    for index, ((date, amount, description), (date_, cents, description_)) in enumerate(zip(expected, actual)):
+        assert (date, round(amount * 100), description) == (date_, cents, description_), f"line {index} converts differently"
+    return {
+        'transactions': transactions,
+        'per_line': {'seconds': per_line, 'lines_per_sec': transactions / per_line},
+        'frame': {'seconds': bulk, 'lines_per_sec': transactions / bulk},
+        'equivalent': True,
+        'speedup': per_line / bulk,
+        }
+
+
+def sinks(transactions=50000, seed=0, formats=('ledger', 'csv', 'jsonl', 'parquet')):
+    """ writing a ledger line by line with print() against the bulk sinks
+
+    parquet is skipped when neither pyarrow nor fastparquet is installed
+    """
+    import random
+
+    from pydfminer import ledger as ledger_
+
+    rng = random.Random(seed)
+    records = [("Checking 1234",
+                rng.choice(["Deposits and other credits", "Withdrawals and other debits"]),
+                [f"01/{rng.randint(1, 31):02d}",
+                 synthetic.amount(rng.randint(-500000, 2500000)),
+                 rng.choice(synthetic.DESCRIPTIONS)])
+               for _ in range(transactions)]
+    report = {'transactions': transactions}
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        path = os.path.join(scratch, 'print.ledger')
+        start = time.perf_counter()
+        with open(path, 'w') as f, contextlib.redirect_stdout(f):
+            for date, amount, description in _ledger_per_line([line for _, _, line in records], 2020):
+                print(f"{date}\t{description}\n"
+                      f"\tSomething\t{amount}")
+        report['print'] = {'seconds': time.perf_counter() - start}
+
+        frame, report['convert_seconds'] = _timed(ledger_.transactions, records, ' 01/01/2020 ', ' 01/31/2020')
+        for format in formats:
+            path = os.path.join(scratch, f"transactions.{format}")
+            try:
+                _, elapsed = _timed(ledger_.write, frame, path)
+            except ImportError as e:
+                report[format] = {'skipped': str(e).splitlines()[0]}
+                continue
+            report[format] = {'seconds': elapsed, 'bytes': os.path.getsize(path)}
+    return report
+
+
+def database(accounts=4, years=10, per_day=3, overlap=7, redownloads=0.1, corrections=0.1, queries=200, seed=0):
+    """ loading a multi-year archive of overlapping monthly statements into a TransactionStore, and range queries
+
+    every statement covers its month and overlap days of the next, a share
+    of them is loaded twice with the same digest (a re-download) and a
+    share again under a new digest with the descriptions respaced and
+    uppercased (a correction); tests/test_database.py checks the store
+    keeps every transaction once. queries are one month and one year of
+    one account: query() with its frame, the select alone, and the select
+    forced to scan the table
+    """
+    import datetime
+    import random
+
+    import pandas as pd
+
+    from pydfminer.daemon import Latencies
+    from pydfminer.database import TransactionStore
+
+    rng = random.Random(seed)
+    names = [f"Checking {1000 + index}" for index in range(accounts)]
+    first = datetime.date(2010, 1, 1)
+    months = [datetime.date(first.year + month // 12, month % 12 + 1, 1) for month in range(years * 12 + 1)]
+    rows = []
+    day = first
+    while day < months[-1] + datetime.timedelta(overlap):
+        for name in names:
+            previous = None
+            for _ in range(rng.randint(0, 2 * per_day)):
+                if previous is None or rng.random() > 0.05:
+                    previous = (name, rng.choice(('deposit', 'withdrawal', 'check')), day,
+                                rng.randint(-500000, 2500000), rng.choice(synthetic.DESCRIPTIONS))
+                # otherwise the same purchase twice in a day, both must be kept
+                rows.append(previous)
+        day += datetime.timedelta(1)
+    truth = pd.DataFrame.from_records(rows, columns=['account', 'section', 'date', 'cents', 'description'])
+    # parsed like ledger.from_dicts so the frames compare equal
+    truth['date'] = pd.to_datetime(truth['date'].map(datetime.date.isoformat), format='%Y-%m-%d')
+    for column in ('account', 'section', 'description'):
+        truth[column] = truth[column].astype(object)
+
+    statements = []
+    for index, (start, stop) in enumerate(zip(months, months[1:])):
+        frame = truth[(truth['date'] >= pd.Timestamp(start))
+                      & (truth['date'] < pd.Timestamp(stop + datetime.timedelta(overlap)))].reset_index(drop=True)
+        statements.append((f"statement-{index}", frame))
+        if rng.random() < redownloads:
+            statements.append((f"statement-{index}", frame))
+        if rng.random() < corrections:
+            corrected = frame.copy()
+            corrected['description'] = ' ' + corrected['description'].str.upper().str.replace(' ', '  ') + '.'
+            statements.append((f"corrected-{index}", corrected))
+    offered = sum(len(frame) for _, frame in statements)
+    report = {'accounts': accounts, 'years': years, 'statements': len(statements), 'offered': offered,
+              'unique': len(truth)}
+
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        path = os.path.join(scratch, 'transactions.sqlite')
+        with TransactionStore(path) as store:
+            start = time.perf_counter()
+            added = duplicates = skipped = 0
+            for digest, frame in statements:
+                loaded = store.add(frame, digest=digest)
+                added += loaded['added']
+                duplicates += loaded['duplicates']
+                skipped += loaded['skipped']
+            elapsed = time.perf_counter() - start
+            report['load'] = {'seconds': elapsed, 'statements_per_sec': len(statements) / elapsed,
+                              'transactions_per_sec': offered / elapsed, 'added': added,
+                              'duplicates': duplicates, 'skipped_statements': skipped,
+                              'bytes': os.path.getsize(path)}
+
+            spans = {'month': 31, 'year': 366}
+            seconds = {(span, how): [] for span in spans for how in ('query', 'select', 'scan')}
+            select = ('SELECT a.name, t.section, t.date, t.cents, t.description'
+                      ' FROM transactions t {} JOIN accounts a ON a.id = t.account_id'
+                      ' WHERE a.name = ? AND t.date >= ? AND t.date <= ?')
+            for _ in range(queries):
+                name = rng.choice(names)
+                for span, length in spans.items():
+                    low = first + datetime.timedelta(rng.randrange(years * 365 - length))
+                    high = low + datetime.timedelta(length - 1)
+                    seconds[span, 'query'].append(_timed(store.query, name, low, high)[1])
+                    for how, hint in (('select', ''), ('scan', 'NOT INDEXED')):
+                        start = time.perf_counter()
+                        store.connection.execute(select.format(hint),
+                                                 (name, low.isoformat(), high.isoformat())).fetchall()
+                        seconds[span, how].append(time.perf_counter() - start)
+            report['query'] = {f"{span}_{how}": Latencies.percentiles(values) for (span, how), values in seconds.items()}
+            report['query']['month_rows'] = len(store.query(names[0], months[1], months[2] - datetime.timedelta(1)))
+    return report
+
+
+def classify(files=10, others=10, pages=3, backends=('tabula', 'batch'), repeat=1000):
+    """ routing a mixed inbox: first page extraction and probes, against full extraction
+
+    others are statements without the becu footer, which before
+    classification cost a full extraction and a failed Becu parse each
+    """
+    from pydfminer.main import classify as classify_
+
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        becu = synthetic.write_directory(scratch, files=files, pages=pages)
+        other = synthetic.write_directory(scratch, files=others, pages=pages, footer="stripe.com", prefix="other")
+        paths = becu + other
+        report = {'files': len(paths)}
+        for backend in backends:
+            source = extractor(backend)
+            firsts, first_seconds = _timed(list, source.first_pages(paths))
+            _, full_seconds = _timed(list, source.extract_many(paths))
+            report[backend] = {
+                'first_page_seconds_per_file': first_seconds / len(paths),
+                'full_seconds_per_file': full_seconds / len(paths),
+                }
+        pages_ = [page for _, page in firsts]
+        routes, probe_seconds = _timed(lambda: [classify_(page) for _ in range(repeat) for page in pages_])
+        report['probe_microseconds_per_page'] = probe_seconds / len(routes) * 1e6
+        report['routed'] = {str(name): routes[:len(pages_)].count(name) for name in set(routes)}
+        assert routes[:len(becu)] == ['becu'] * len(becu) and routes[len(becu):len(pages_)] == [None] * len(other)
+        return report
+
+
+def profiles(files=10, pages=6, backends=('tabula', 'batch')):
+    """ continuation pages cropped to the parser's Profile, against whole pages
+
+    both read page 1 whole since that is what classification extracts, the
+    cropped documents must parse to the same records
+    """
+    from pydfminer.main import Becu
+
+    def rows(documents):
+        return sum(len(page['data']) for _, pdf_json in documents for page in pdf_json)
+
+    def records(documents, cropped):
+        result = []
+        for _, pdf_json in documents:
+            doc = Becu(pdf_json, cropped=cropped)
+            doc.run()
+            result.append((doc.state, doc.records))
+        return result
+
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        paths = synthetic.write_directory(scratch, files=files, pages=pages)
+        report = {'files': len(paths), 'pages': len(paths) * pages}
+        for backend in backends:
+            full, full_seconds = _timed(list, extractor(backend).extract_many(paths))
+            firsts, first_seconds = _timed(dict, extractor(backend).first_pages(paths))
+            rest, rest_seconds = _timed(list, extractor(backend, **Becu.profile.rest).extract_many(paths, start=2))
+            cropped = [(pdf, [firsts[pdf], *pdf_json]) for pdf, pdf_json in rest]
+            assert records(full, cropped=False) == records(cropped, cropped=True)
+            report[backend] = {
+                'full_seconds_per_file': full_seconds / len(paths),
+                # page 1 is already paid for by classification in process_batch
+                'first_page_seconds_per_file': first_seconds / len(paths),
+                'rest_seconds_per_file': rest_seconds / len(paths),
+                'full_rows_per_page': rows(full) / report['pages'],
+                'profile_rows_per_page': rows(cropped) / report['pages'],
+                }
+        return report
+
+
+def pipeline(files=12, pages=3, backend='tabula', extract_workers=(1, 2, 4), parse_workers=2, queue=None):
+    """ the asyncio pipeline at several extraction concurrencies, against process_batch one pdf after another
+
+    every run must write the same ledgers. the stage metrics show where
+    the time goes, max_depth never exceeds the stage's queue
+    """
+    from pydfminer import ledger as ledger_, main
+
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        source = os.path.join(scratch, 'in')
+        paths = synthetic.write_directory(source, files=files, pages=pages)
+        results, sequential = _timed(main.process_batch, paths, backend=backend)
+        expected = {}
+        for result in results:
+            with io.StringIO() as out:
+                ledger_.write(ledger_.from_dicts(result['transactions']), out, format='ledger')
+                expected[os.path.basename(result['pdf'])[:-len('.pdf')]] = out.getvalue()
+        report = {'files': files, 'sequential_seconds': sequential}
+        for workers in extract_workers:
+            output = os.path.join(scratch, f"out-{workers}")
+            outcome = main.pipeline(source, output, backend=backend, extract_workers=workers,
+                                    parse_workers=parse_workers, queue=queue)
+            for name, text in expected.items():
+                with open(os.path.join(output, name + '.ledger')) as f:
+                    assert f.read() == text, name
+            stages = outcome['throughput']['stages']
+            report[f"extract_workers={workers}"] = {
+                'seconds': stages['seconds'],
+                'speedup': sequential / stages['seconds'],
+                **{name: {key: round(stages[name][key], 3)
+                          for key in ('mean_latency', 'idle_seconds', 'blocked_seconds', 'mean_depth', 'max_depth')}
+                   for name in ('extract', 'parse', 'write')},
+                }
+        return report
+
+
+def daemon(files=10, pages=4, transactions=120, backend='pdfminer', clients=4, cold=3):
+    """ per pdf latency of a resident Daemon on localhost against a fresh python -m pydfminer.main process each
+
+    every pdf is posted once at a time, then all at once from clients
+    threads, then dropped in the inbox; the results must match a direct
+    process_batch. cold is how many pdfs go through the command line
+    """
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    from pydfminer.daemon import Daemon
+    from pydfminer.main import process_batch
+
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        paths = synthetic.write_directory(os.path.join(scratch, 'pdfs'), files=files, pages=pages,
+                                          transactions=transactions)
+        expected = {path: result['transactions'] for path, result in
+                    ((path, process_batch([path], backend=backend)[0]) for path in paths)}
+        report = {'files': files, 'backend': backend}
+
+        environment = {**os.environ, 'PYDFMINER_LOG': 'WARNING'}
+        seconds = []
+        for path in paths[:cold]:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-m', 'pydfminer.main', 'process', f"--pdf={path}", f"--backend={backend}"],
+                           stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           env=environment, check=True)
+            seconds.append(time.perf_counter() - start)
+        report['cold_process'] = {'count': len(seconds), 'seconds_per_pdf': sum(seconds) / len(seconds)}
+
+        inbox = os.path.join(scratch, 'inbox')
+        os.makedirs(inbox)
+        with Daemon(inbox=inbox, port=0, backend=backend, interval=0.05) as service:
+            url = f"http://{service.address[0]}:{service.address[1]}"
+
+            def post(path):
+                with open(path, 'rb') as f:
+                    request = urllib.request.Request(f"{url}/parse?name={os.path.basename(path)}", data=f.read(),
+                                                     headers={'Content-Type': 'application/pdf'})
+                start = time.perf_counter()
+                with urllib.request.urlopen(request) as response:
+                    result = json.load(response)
+                assert result['transactions'] == expected[path], f"{path} parses differently in the daemon"
+                return time.perf_counter() - start
+
+            sequential = [post(path) for path in paths]
+            with ThreadPoolExecutor(clients) as pool:
+                start = time.perf_counter()
+                concurrent = list(pool.map(post, paths))
+                burst = time.perf_counter() - start
+            report['http_sequential'] = service.latencies['http'].percentiles(sequential)
+            report['http_concurrent'] = {**service.latencies['http'].percentiles(concurrent),
+                                         'clients': clients, 'pdfs_per_sec': files / burst}
+
+            start = time.perf_counter()
+            for path in paths:
+                shutil.copy(path, inbox)
+            parsed = os.path.join(inbox, 'parsed')
+            while len(os.listdir(os.path.join(inbox, 'done'))) + len(os.listdir(os.path.join(inbox, 'failed'))) < files:
+                time.sleep(0.05)
+            report['inbox_seconds'] = time.perf_counter() - start
+            for path in paths:
+                with open(os.path.join(parsed, os.path.basename(path)[:-len('.pdf')] + '.json')) as f:
+                    assert json.load(f)['transactions'] == expected[path], f"{path} parses differently from the inbox"
+            with urllib.request.urlopen(f"{url}/stats") as response:
+                report['stats'] = json.load(response)
+    report['equivalent'] = True
+    return report
+
+
+def _importtime(stderr):
+    """ (name, depth, cumulative seconds) of every line -X importtime wrote """
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        yield name.strip(), (len(name) - len(name.lstrip()) - 1) // 2, int(cumulative) / 1e6
+
+
+def startup(command=('page_total', '[]'), repeat=5, top=8, heavy=('tabula', 'pandas', 'numpy', 'pygraphviz', 'IPython', 'fire', 'pdb')):
+    """ cold start of python -m pydfminer.main running a command that does no real work
+
+    best wall time of repeat runs against a bare interpreter, the import
+    time -X importtime reports, the slowest top level imports, and which
+    of the heavy modules were imported at all. fire's help output imports
+    IPython, so the default command is a trivial one rather than no command
+    """
+    def run(*args):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, *args], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True, check=True)
+        return time.perf_counter() - start, done.stderr
+
+    bare = min(run('-c', 'pass')[0] for _ in range(repeat))
+    runs = [run('-X', 'importtime', '-m', 'pydfminer.main', *command) for _ in range(repeat)]
+    wall, stderr = min(runs)
+    imports = list(_importtime(stderr))
+    names = {name.split('.')[0] for name, _, _ in imports}
+    roots = sorted(((name, seconds) for name, depth, seconds in imports if depth == 0),
+                   key=lambda item: -item[1])
+    return {
+        'seconds': wall,
+        'bare_interpreter_seconds': bare,
+        'import_seconds': sum(seconds for _, seconds in roots),
+        'slowest': dict(roots[:top]),
+        'imported': sorted(name for name in heavy if name in names),
+        'deferred': sorted(name for name in heavy if name not in names),
+        }
+
+
+# the documents of bench suite, every part of the layout Becu reads
+SUITE_LAYOUT = {'accounts': 3, 'loans': 1, 'sections': (synthetic.DEPOSITS, synthetic.WITHDRAWALS, synthetic.CHECKS),
+                'machine': 0.2}
+
+
+def suite(output=None, baseline=None, tolerance=0.25, documents=30, pages=6, transactions=300,
+          files=4, backend='batch', repeat=5):
+    """ fixed seed measurements of extraction, grammar construction, run() and the ledger sinks
+
+    output writes the measurements as json, baseline compares against such a
+    file: a metric more than tolerance worse is listed under 'regressions'.
+    seconds are the best of repeat, so noise mostly shows as improvement.
+    the synthetic documents must parse to the transactions they were generated
+    with, AssertionError otherwise
+    """
+    import platform
+
+    from pydfminer import ledger as ledger_
+    from pydfminer.main import Becu, BecuGrammar, ingest
+
+    def best(func, *args, **kwargs):
+        return min(_timed(func, *args, **kwargs)[1] for _ in range(repeat))
+
+    generated = []
+    for seed in range(documents):
+        records = []
+        pages_ = synthetic.statement(pages=pages, transactions=transactions, seed=seed, records=records, **SUITE_LAYOUT)
+        generated.append((synthetic.to_tabula_json(pages_), records))
+    rows = sum(len(page['data']) for pdf_json, _ in generated for page in pdf_json)
+    metrics = {}
+
+    with tempfile.TemporaryDirectory(prefix='pydfminer-bench-') as scratch:
+        paths = synthetic.write_directory(scratch, files=files, pages=pages, transactions=transactions, **SUITE_LAYOUT)
+        # one pass, every extraction starts a jvm
+        extracted, elapsed = _timed(list, extractor(backend).extract_many(paths))
+        metrics['extract_seconds_per_page'] = elapsed / sum(len(pdf_json) for _, pdf_json in extracted)
+        # write_directory seeds its statements 0, 1, ... so these are the first files documents
+        for (pdf, pdf_json), (_, records) in zip(extracted, generated):
+            doc = Becu(ingest(pdf_json))
+            doc.run()
+            assert doc.frame().equals(ledger_.transactions(records, ' 01/01/2020 ', ' 01/31/2020')), \
+                f"{os.path.basename(pdf)} does not parse to the transactions it was generated with"
+
+    metrics['grammar_build_seconds'] = best(BecuGrammar)
+
+    columnar = [(ingest(pdf_json), records) for pdf_json, records in generated]
+    grammar_ = Becu.compile()
+    for engine, dispatch in (('trigger', False), ('dispatch', True)):
+        def run_all():
+            for pages_, _ in columnar:
+                Becu(pages_, grammar_).run(dispatch=dispatch)
+        metrics[f"run_{engine}_rows_per_sec"] = rows / best(run_all)
+
+    frames = []
+    for index, (pages_, records) in enumerate(columnar):
+        expected = ledger_.transactions(records, ' 01/01/2020 ', ' 01/31/2020')
+        for dispatch in (False, True):
+            doc = Becu(pages_, grammar_)
+            doc.run(dispatch=dispatch)
+            assert doc.frame().equals(expected), \
+                f"document {index} does not parse to the transactions it was generated with, dispatch={dispatch}"
+        frames.append(expected)
+    every = [record for doc_records in (records for _, records in generated) for record in doc_records]
+    metrics['ledger_convert_lines_per_sec'] = len(every) / best(ledger_.transactions, every, ' 01/01/2020 ', ' 01/31/2020')
+    combined = ledger_.concat({index: frame for index, frame in enumerate(frames)})
+    for format in ('ledger', 'csv', 'jsonl'):
+        def write():
+            with io.StringIO() as out:
+                ledger_.write(combined, out, format=format)
+        metrics[f"sink_{format}_lines_per_sec"] = len(combined) / best(write)
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'documents': documents,
+        'rows': rows,
+        'transactions': len(every),
+        'metrics': metrics,
+        }
+    if baseline is not None:
+        with open(baseline) as f:
+            previous = json.load(f)['metrics']
+        report['ratios'] = {}
+        report['regressions'] = []
+        for name, value in metrics.items():
+            if name not in previous:
+                continue
+            # seconds are better lower, rates higher
+            ratio = previous[name] / value if 'seconds' in name else value / previous[name]
+            report['ratios'][name] = ratio
+            if ratio < 1 - tolerance:
+                report['regressions'].append(name)
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=1)
+    return report
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARN)
+    fire.Fire()
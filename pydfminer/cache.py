@@ -0,0 +1,138 @@
+""" on disk cache of extracted tabula json
+
+entries are keyed by the sha256 of the pdf's bytes plus the extraction
+options, stored as gzipped compact json and evicted least recently used
+first once the directory grows past max_bytes. a pdf is hashed once for
+as long as its path, mtime and size stay the same.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+log = logging.getLogger(__name__)
+
+SUFFIX = '.json.gz'
+
+
+def file_digest(path, chunk=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # path -> ((mtime_ns, size), digest)
+        self.digests = {}
+        os.makedirs(directory, exist_ok=True)
+        self.bytes = sum(size for _, _, size in self._entries())
+
+    def digest(self, pdf):
+        """ file_digest of pdf, hashed again only once its mtime or size changed """
+        stat = os.stat(pdf)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        memo = self.digests.get(pdf)
+        if memo is None or memo[0] != stamp:
+            memo = self.digests[pdf] = (stamp, file_digest(pdf))
+        return memo[1]
+
+    def key(self, pdf, options):
+        params = json.dumps(options, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256((self.digest(pdf) + params).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key, count=True):
+        """ the entry under key or None
+
+        a caller trying another key on a miss passes count=False and
+        records the outcome of the whole lookup once with count()
+        """
+        path = self.path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                pdf_json = json.load(f)
+        except FileNotFoundError:
+            pdf_json = None
+        except (OSError, ValueError) as e:
+            log.warning(f"dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            pdf_json = None
+        else:
+            # mtime is the recency used for eviction
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        if count:
+            self.count(pdf_json is not None)
+        return pdf_json
+
+    def count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key, pdf_json):
+        data = gzip.compress(json.dumps(pdf_json, separators=(',', ':')).encode('utf-8'))
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path(key))
+        self.bytes += len(data)
+        if self.bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ drop least recently used entries until under max_bytes
+
+        other processes may share the directory, so sizes are re-read here
+        rather than trusted from this instance's running total
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self.bytes = total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        entries = list(self._entries())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(entries),
+            'bytes': sum(size for _, _, size in entries),
+            }
+
+    def _entries(self):
+        """ (mtime, path, size) of every entry """
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, entry.path, stat.st_size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,191 @@
+""" columnar pages
+
+tabula's json spends a dict with five keys on every cell, padding cells
+included. ingest() turns each page into numpy arrays of geometry plus ids
+into a text table shared by the whole document, and hands out Row views
+over them; a Cell is only built when one is indexed. header_columns()
+names a block's columns from where the words of its header rows are.
+"""
+import itertools
+import re
+from operator import itemgetter
+
+_FIELDS = itemgetter('text', 'left', 'width', 'top', 'height')
+
+
+class TextTable:
+    """ interned cell texts, padding cells and repeated headers are stored once """
+    def __init__(self):
+        self.texts = []
+        self.ids = {}
+
+    def intern(self, text):
+        try:
+            return self.ids[text]
+        except KeyError:
+            id_ = self.ids[text] = len(self.texts)
+            self.texts.append(text)
+            return id_
+
+
+class ColumnarPage:
+    __slots__ = ('table', 'text_id', 'left', 'width', 'top', 'height', 'offsets')
+
+    def __init__(self, table, text_id, left, width, top, height, offsets):
+        self.table = table
+        self.text_id = text_id
+        self.left = left
+        self.width = width
+        self.top = top
+        self.height = height
+        # row i is cells offsets[i]:offsets[i + 1]
+        self.offsets = offsets
+
+    @classmethod
+    def from_tabula(cls, page, table):
+        # numpy is only imported once there is a page to ingest
+        import numpy as np
+
+        rows = page['data']
+        fields = _FIELDS
+        cells = [fields(cell) for row in rows for cell in row]
+        if cells:
+            text, left, width, top, height = zip(*cells)
+        else:
+            text = left = width = top = height = ()
+        intern = table.intern
+        return cls(
+            table,
+            np.array([intern(t) for t in text], dtype=np.int32),
+            np.array(left, dtype=np.float32),
+            np.array(width, dtype=np.float32),
+            np.array(top, dtype=np.float32),
+            np.array(height, dtype=np.float32),
+            list(itertools.accumulate([len(row) for row in rows], initial=0)),
+            )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"row {index} out of range")
+        return Row(self, self.offsets[index], self.offsets[index + 1])
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.text_id, self.left, self.width, self.top, self.height))
+
+
+class Row:
+    """ a row of a ColumnarPage, indexes like tabula's list of cells """
+    __slots__ = ('page', 'start', 'stop')
+
+    def __init__(self, page, start, stop):
+        self.page = page
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Cell(self.page, cell) for cell in range(self.start, self.stop)[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"cell {index} out of range")
+        return Cell(self.page, self.start + index)
+
+    def __iter__(self):
+        for cell in range(self.start, self.stop):
+            yield Cell(self.page, cell)
+
+    def texts(self):
+        texts = self.page.table.texts
+        return [texts[id_] for id_ in self.page.text_id[self.start:self.stop].tolist()]
+
+    def __repr__(self):
+        return f"Row({self.texts()!r})"
+
+
+class Cell:
+    """ one cell, subscripted like tabula's cell dict """
+    __slots__ = ('page', 'index')
+
+    def __init__(self, page, index):
+        self.page = page
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == 'text':
+            return self.page.table.texts[self.page.text_id[self.index]]
+        if key in ('left', 'width', 'top', 'height'):
+            return float(getattr(self.page, key)[self.index])
+        raise KeyError(key)
+
+
+def texts(row):
+    """ the text of every cell of a tabula or columnar row """
+    if isinstance(row, Row):
+        return row.texts()
+    return [col['text'] for col in row]
+
+
+def words(row):
+    """ (cell, left, right, text) of every word of a tabula or columnar row
+
+    a cell only has a box of its own, a word's is its share of the cell's
+    width by characters. a word without letters or digits, an &, goes with
+    the word after it
+    """
+    result = []
+    for index, cell in enumerate(row):
+        text = cell['text']
+        if not text:
+            continue
+        left, width = cell['left'], cell['width']
+        for match in re.finditer(r"(?:[^\w\s]+\s+)*\S+", text):
+            result.append((index,
+                           left + width * match.start() / len(text),
+                           left + width * match.end() / len(text),
+                           match.group()))
+    return result
+
+
+def header_columns(top, bottom):
+    """ the column names of a two row header, left to right, from where its words are
+
+    every word of the top row starts a column, a word of the bottom row is
+    added to the one it overlaps most. bottom words under none make columns
+    of their own, one for each run of them in a cell
+    """
+    columns = [[left, right, [text]] for _, left, right, text in words(top)]
+    anchors = list(columns)
+    run = None
+    for cell, left, right, text in words(bottom):
+        overlap, column = max(((min(right, column[1]) - max(left, column[0]), column) for column in anchors),
+                              key=itemgetter(0), default=(0, None))
+        if overlap > 0:
+            column[2].append(text)
+            run = None
+        elif run is not None and run[3] == cell:
+            run[2].append(text)
+        else:
+            run = [left, right, [text], cell]
+            columns.append(run)
+    return [' '.join(column[2]) for column in sorted(columns, key=itemgetter(0))]
+
+
+def ingest_pages(pages, table=None):
+    """ yield a ColumnarPage for each tabula page, interning into one table """
+    table = TextTable() if table is None else table
+    for page in pages:
+        yield ColumnarPage.from_tabula(page, table)
+
+
+def ingest(pdf_json):
+    """ a whole tabula document as a list of ColumnarPage """
+    return list(ingest_pages(pdf_json))
@@ -0,0 +1,359 @@
+""" resident ingestion service
+
+    python -m pydfminer.daemon serve --inbox=statements --backend=pdfminer
+
+one process keeps the parsers' grammars built and the extractor loaded
+and parses pdfs from two sources on a pool of worker threads:
+
+    inbox   pdfs dropped in the inbox directory, polled every interval
+            seconds and taken once their size stops changing. the result
+            goes to output/<name>.json and the pdf to inbox/done or
+            inbox/failed, as <name>-1, <name>-2.. once a pdf of the
+            same name was filed before
+    http    POST /parse with the pdf as the body, ?parser=becu to skip
+            classification and ?name= to report as its 'pdf'. answers
+            with process_batch's result as json, 422 if no parser
+            recognises the pdf, 500 if it failed
+
+GET /stats reports the queue depth and, per source, request latency
+percentiles from the moment a pdf was queued to its result, over the last
+window requests. GET /health answers once the grammars are built. the
+server only listens on a loopback address, any other host is refused.
+"""
+import collections
+import ipaddress
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Job:
+    __slots__ = ('pdf', 'source', 'parser', 'queued', 'future')
+
+    def __init__(self, pdf, source, parser=None):
+        self.pdf = pdf
+        self.source = source
+        self.parser = parser
+        self.queued = time.perf_counter()
+        self.future = Future()
+
+
+class Latencies:
+    """ the last window latencies of one source, and running counts """
+    def __init__(self, window=1000):
+        self.seconds = collections.deque(maxlen=window)
+        self.parse_seconds = collections.deque(maxlen=window)
+        self.count = 0
+        self.failed = 0
+
+    def add(self, seconds, parse_seconds, failed=False):
+        self.seconds.append(seconds)
+        self.parse_seconds.append(parse_seconds)
+        self.count += 1
+        self.failed += failed
+
+    @staticmethod
+    def percentiles(values, points=(50, 90, 99)):
+        ordered = sorted(values)
+        if not ordered:
+            return {f"p{point}": 0.0 for point in (*points, 100)}
+        return {f"p{point}": ordered[min(len(ordered) - 1, len(ordered) * point // 100)]
+                for point in (*points, 100)}
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'failed': self.failed,
+            'latency': self.percentiles(self.seconds),
+            'parse': self.percentiles(self.parse_seconds),
+            }
+
+
+class Daemon:
+    def __init__(self, inbox=None, output=None, host='127.0.0.1', port=8765, backend='pdfminer', cache=None,
+                 dispatch=False, workers=1, interval=1.0, window=1000, max_bytes=50 * 2 ** 20, crop=False):
+        """ port=0 picks a free one, see address once started
+
+        output is where inbox results go, inbox/parsed by default. crop
+        crops pages after the first to the parser's Profile, see process_batch.
+        host is localhost or a loopback address, there is no authentication
+        """
+        if not _loopback(host):
+            raise ValueError(f"the daemon only listens on a loopback address, not {host}")
+        self.inbox = inbox
+        self.output = output or (os.path.join(inbox, 'parsed') if inbox else None)
+        self.host = host
+        self.port = port
+        self.backend = backend
+        self.cache = cache
+        self.dispatch = dispatch
+        self.crop = crop
+        self.workers = workers
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.jobs = queue.Queue()
+        self.latencies = collections.defaultdict(lambda: Latencies(window))
+        self.max_depth = 0
+        self.started = None
+        self.ready = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._server = None
+        self._scratch = None
+        # inbox pdfs queued or waiting for their size to settle, by path
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    @property
+    def address(self):
+        return self._server.server_address if self._server is not None else (self.host, self.port)
+
+    def start(self):
+        from pydfminer.main import PARSERS
+
+        self.started = time.time()
+        start = time.perf_counter()
+        for cls in PARSERS.values():
+            # building the grammar, and its dispatch table, is the cost the service pays once
+            cls.compile().dispatch
+        log.info(f"daemon: {len(PARSERS)} grammars built in {time.perf_counter() - start:.3f}s")
+        self._scratch = tempfile.mkdtemp(prefix='pydfminer-daemon-')
+        for index in range(self.workers):
+            self._spawn(self._work, f"worker-{index}")
+        if self.inbox is not None:
+            for name in ('done', 'failed'):
+                os.makedirs(os.path.join(self.inbox, name), exist_ok=True)
+            os.makedirs(self.output, exist_ok=True)
+            self._spawn(self._watch, 'inbox')
+        self._server = ThreadingHTTPServer((self.host, self.port), _handler(self))
+        self._server.daemon_threads = True
+        self._spawn(self._server.serve_forever, 'http')
+        self.ready.set()
+        log.info(f"daemon: listening on http://{self.address[0]}:{self.address[1]}"
+                 f"{f', watching {self.inbox}' if self.inbox else ''}")
+        return self
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=f"pydfminer-{name}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def close(self):
+        self._stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for _ in range(self.workers):
+            self.jobs.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._scratch is not None:
+            shutil.rmtree(self._scratch, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, pdf, source, parser=None):
+        """ queue pdf, the returned Future gets process_batch's result """
+        job = Job(pdf, source, parser)
+        self.jobs.put(job)
+        self.max_depth = max(self.max_depth, self.jobs.qsize())
+        return job.future
+
+    def _work(self):
+        from pydfminer.main import process_batch
+
+        while True:
+            job = self.jobs.get()
+            if job is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                result = process_batch([job.pdf], backend=self.backend, cache=self.cache, dispatch=self.dispatch,
+                                       parser=job.parser, crop=self.crop)[0]
+            except Exception as e:
+                # process_batch turns failures into results, this is a bug in it
+                log.exception(f"daemon: {job.pdf} broke the worker")
+                job.future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            with self._lock:
+                self.latencies[job.source].add(done - job.queued, done - start, failed='error' in result)
+            job.future.set_result(result)
+
+    def _watch(self):
+        while not self._stopping.is_set():
+            try:
+                self.poll()
+            except OSError as e:
+                log.error(f"daemon: polling {self.inbox} failed {e!r}")
+            self._stopping.wait(self.interval)
+
+    def poll(self):
+        """ queue the inbox pdfs whose size has not changed since the last poll """
+        found = set()
+        settled = []
+        with self._lock:
+            for entry in os.scandir(self.inbox):
+                if not entry.is_file() or not entry.name.lower().endswith('.pdf'):
+                    continue
+                found.add(entry.path)
+                seen = self._seen.get(entry.path)
+                if seen == 'queued':
+                    continue
+                stat = entry.stat()
+                self._seen[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                if seen == self._seen[entry.path]:
+                    self._seen[entry.path] = 'queued'
+                    settled.append(entry.path)
+            for path in set(self._seen) - found:
+                if self._seen[path] != 'queued':
+                    del self._seen[path]
+        for pdf in settled:
+            self.submit(pdf, 'inbox').add_done_callback(lambda future, pdf=pdf: self._filed(pdf, future))
+
+    def _unused(self, pdf):
+        """ pdf's name without extension, suffixed -1, -2.. until neither a result nor a filed pdf has it """
+        name, extension = os.path.splitext(os.path.basename(pdf))
+        candidate = name
+        index = 0
+        while any(os.path.exists(path) for path in (os.path.join(self.output, candidate + '.json'),
+                                                    os.path.join(self.inbox, 'done', candidate + extension),
+                                                    os.path.join(self.inbox, 'failed', candidate + extension))):
+            index += 1
+            candidate = f"{name}-{index}"
+        return candidate, extension
+
+    def _filed(self, pdf, future):
+        """ write an inbox pdf's result and move the pdf out of the inbox, never over an earlier one """
+        try:
+            result = future.result()
+            with self._lock:
+                name, extension = self._unused(pdf)
+                path = os.path.join(self.output, name + '.json')
+                with tempfile.NamedTemporaryFile('w', dir=self.output, suffix='.tmp', delete=False) as f:
+                    json.dump(result, f)
+                os.replace(f.name, path)
+                os.replace(pdf, os.path.join(self.inbox, 'failed' if 'error' in result else 'done', name + extension))
+            log.info(f"daemon: {pdf}{' failed' if 'error' in result else ''} -> {path}")
+        except Exception:
+            log.exception(f"daemon: filing {pdf} failed")
+        finally:
+            with self._lock:
+                del self._seen[pdf]
+
+    def stats(self):
+        with self._lock:
+            sources = {source: latencies.summary() for source, latencies in self.latencies.items()}
+        return {
+            'uptime_seconds': time.time() - self.started if self.started else 0.0,
+            'backend': self.backend,
+            'workers': self.workers,
+            'queue_depth': self.jobs.qsize(),
+            'max_queue_depth': self.max_depth,
+            'sources': sources,
+            }
+
+    def serve(self):
+        """ start and block until interrupted """
+        self.start()
+        try:
+            while not self._stopping.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+
+def _loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            log.debug("daemon: %s " + format, self.address_string(), *args)
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/stats':
+                self._reply(200, daemon.stats())
+            elif path == '/health':
+                self._reply(200 if daemon.ready.is_set() else 503, {'ready': daemon.ready.is_set()})
+            else:
+                self._reply(404, {'error': f"no such endpoint {path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/parse':
+                self._reply(404, {'error': f"no such endpoint {url.path}"})
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            if not 0 < length <= daemon.max_bytes:
+                self._reply(413 if length else 400, {'error': f"a pdf of 1 to {daemon.max_bytes} bytes is expected"})
+                return
+            query = parse_qs(url.query)
+            parser = query.get('parser', [None])[0]
+            fd, pdf = tempfile.mkstemp(dir=daemon._scratch, suffix='.pdf')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(self.rfile.read(length))
+                result = daemon.submit(pdf, 'http', parser=parser).result()
+            except Exception as e:
+                self._reply(500, {'error': repr(e)})
+                return
+            finally:
+                os.unlink(pdf)
+            result['pdf'] = query.get('name', [None])[0]
+            if 'error' in result:
+                self._reply(422 if result.get('unclassified') else 500, result)
+            else:
+                self._reply(200, result)
+
+    return Handler
+
+
+def serve(inbox=None, output=None, host='127.0.0.1', port=8765, backend='pdfminer', cache=None, dispatch=False,
+          workers=1, interval=1.0, crop=False):
+    """ run a Daemon until interrupted """
+    Daemon(inbox=inbox, output=output, host=host, port=port, backend=backend, cache=cache, dispatch=dispatch,
+           workers=workers, interval=interval, crop=crop).serve()
+
+
+if __name__ == '__main__':
+    import fire
+
+    logging.basicConfig(level=os.environ.get('PYDFMINER_LOG', 'INFO').upper())
+    fire.Fire()
@@ -0,0 +1,223 @@
+""" an sqlite archive of the transactions of every statement loaded into it
+
+    accounts      one row per account name
+    statements    one row per loaded pdf, by the sha256 of its bytes
+    transactions  one row per transaction, unique on (account, date, cents,
+                  normalized description, occurrence)
+
+occurrence numbers the transactions of a statement that agree on the other
+four fields, in the order they were read: two identical coffees on one day
+are occurrences 0 and 1. a statement always covers whole days, so the same
+day in an overlapping statement, a re-download or a corrected statement
+numbers them the same way and the second load of a transaction is a
+duplicate that is counted and dropped rather than stored. the normalized
+description is the description casefolded with runs of anything but
+letters and digits collapsed to one space, so spacing and punctuation the
+extraction may vary do not make a new transaction.
+
+the unique key starts with account and date and is what range queries use.
+dates are stored as YYYY-MM-DD text and amounts as integer cents, the
+frames going in and out are those of ledger.transactions().
+"""
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from pydfminer import ledger
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    digest TEXT UNIQUE,
+    pdf TEXT,
+    parser TEXT,
+    first_date TEXT,
+    last_date TEXT,
+    transactions INTEGER NOT NULL,
+    duplicates INTEGER NOT NULL,
+    loaded REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    account_id INTEGER NOT NULL REFERENCES accounts (id),
+    date TEXT NOT NULL,
+    cents INTEGER NOT NULL,
+    normalized TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    description TEXT NOT NULL,
+    statement_id INTEGER NOT NULL REFERENCES statements (id),
+    UNIQUE (account_id, date, cents, normalized, occurrence)
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_statement ON transactions (statement_id);
+"""
+
+_INSERT = """
+INSERT OR IGNORE INTO transactions
+    (account_id, date, cents, normalized, occurrence, section, description, statement_id)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def normalize(descriptions):
+    """ descriptions casefolded, runs of anything but letters and digits as one space """
+    return (pd.Series(descriptions, dtype=object).str.casefold()
+            .str.replace(r'[\W_]+', ' ', regex=True).str.strip())
+
+
+def keyed(frame):
+    """ a transactions() frame with its normalized description and occurrence number """
+    result = frame.reset_index(drop=True)
+    result['normalized'] = normalize(result['description'])
+    result['occurrence'] = result.groupby(['account', 'date', 'cents', 'normalized'], sort=False).cumcount()
+    return result
+
+
+class TransactionStore:
+    def __init__(self, path):
+        """ path is created with the schema if it does not exist, ':memory:' works too """
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        if path != ':memory:':
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            # with wal a crash loses at most the last commits, never the file
+            self.connection.execute('PRAGMA synchronous = NORMAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"{path} has schema version {version}, this is {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._accounts = dict(self.connection.execute('SELECT name, id FROM accounts'))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            # ids handed out inside the transaction are gone with it
+            self._accounts = dict(self.connection.execute('SELECT name, id FROM accounts'))
+            raise
+        self.connection.execute('COMMIT')
+
+    def _account_ids(self, connection, names):
+        for name in set(names) - set(self._accounts):
+            # another connection may have added it since the cache was read
+            connection.execute('INSERT OR IGNORE INTO accounts (name) VALUES (?)', (name,))
+            self._accounts[name] = connection.execute('SELECT id FROM accounts WHERE name = ?', (name,)).fetchone()[0]
+        return [self._accounts[name] for name in names]
+
+    def statement(self, digest):
+        """ the statements row of the pdf with digest as a dict, None if it was never loaded """
+        cursor = self.connection.execute('SELECT * FROM statements WHERE digest = ?', (digest,))
+        row = cursor.fetchone()
+        return None if row is None else dict(zip([column[0] for column in cursor.description], row))
+
+    def add(self, frame, digest=None, pdf=None, parser=None):
+        """ store the transactions of one statement in one sqlite transaction
+
+        frame is a ledger.transactions() frame, digest the sha256 of the pdf.
+        a statement loaded before, by digest, is not loaded again. returns the
+        counts of transactions added and dropped as duplicates, skipped if
+        the whole statement was
+        """
+        if digest is not None and self.statement(digest) is not None:
+            return {'added': 0, 'duplicates': len(frame), 'skipped': True}
+        frame = keyed(frame)
+        dates = frame['date'].dt.strftime('%Y-%m-%d').astype(object)
+        with self._transaction() as connection:
+            statement_id = connection.execute(
+                'INSERT INTO statements (digest, pdf, parser, first_date, last_date, transactions, duplicates, loaded)'
+                ' VALUES (?, ?, ?, ?, ?, 0, 0, ?)',
+                (digest, pdf, parser, dates.min() if len(frame) else None, dates.max() if len(frame) else None,
+                 time.time())).lastrowid
+            account_ids = self._account_ids(connection, frame['account'].tolist())
+            before = connection.total_changes
+            connection.executemany(_INSERT, zip(
+                account_ids, dates, frame['cents'].tolist(),
+                frame['normalized'], frame['occurrence'].tolist(), frame['section'], frame['description'],
+                [statement_id] * len(frame)))
+            added = connection.total_changes - before
+            connection.execute('UPDATE statements SET transactions = ?, duplicates = ? WHERE id = ?',
+                               (added, len(frame) - added, statement_id))
+        log.debug(f"database: {pdf} added {added} of {len(frame)} transactions")
+        return {'added': added, 'duplicates': len(frame) - added, 'skipped': False}
+
+    def load(self, result, digest=None):
+        """ add a process_batch result, digest is that of result['pdf'] if the file is still there """
+        from pydfminer.cache import file_digest
+
+        if 'error' in result:
+            raise ValueError(f"{result['pdf']} did not parse: {result['error']}")
+        if digest is None and result.get('pdf') and os.path.exists(result['pdf']):
+            digest = file_digest(result['pdf'])
+        return self.add(ledger.from_dicts(result['transactions']), digest=digest, pdf=result.get('pdf'),
+                        parser=result.get('parser'))
+
+    def query(self, account=None, start=None, stop=None):
+        """ the transactions of account, all if None, dated start to stop inclusive as a transactions() frame
+
+        start and stop are dates, datetimes or YYYY-MM-DD strings. rows come
+        ordered by account, date and the order they were read in
+        """
+        where = []
+        parameters = []
+        if account is not None:
+            where.append('t.account_id = (SELECT id FROM accounts WHERE name = ?)')
+            parameters.append(account)
+        for bound, operator in ((start, '>='), (stop, '<=')):
+            if bound is not None:
+                where.append(f"t.date {operator} ?")
+                parameters.append(bound if isinstance(bound, str) else bound.strftime('%Y-%m-%d'))
+        rows = self.connection.execute(
+            'SELECT a.name, t.section, t.date, t.cents, t.description'
+            ' FROM transactions t JOIN accounts a ON a.id = t.account_id'
+            f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+            ' ORDER BY t.account_id, t.date, t.id', parameters).fetchall()
+        columns = list(zip(*rows)) or [()] * len(ledger.COLUMNS)
+        return pd.DataFrame({
+            'account': pd.Series(columns[0], dtype=object),
+            'section': pd.Series(columns[1], dtype=object),
+            'date': pd.to_datetime(pd.Series(columns[2], dtype=object), format='%Y-%m-%d'),
+            'cents': pd.Series(columns[3], dtype=np.int64),
+            'description': pd.Series(columns[4], dtype=object),
+            })
+
+    def accounts(self):
+        """ name, transaction count, first and last date of every account """
+        return [dict(zip(('account', 'transactions', 'first_date', 'last_date'), row)) for row in
+                self.connection.execute(
+                    'SELECT a.name, count(t.id), min(t.date), max(t.date)'
+                    ' FROM accounts a LEFT JOIN transactions t ON t.account_id = a.id'
+                    ' GROUP BY a.id ORDER BY a.name')]
+
+    def counts(self):
+        return {table: self.connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                for table in ('accounts', 'statements', 'transactions')}
@@ -0,0 +1,26 @@
+""" the state machine with diagram support
+
+kept apart from main so that parsing never imports GraphMachine and its
+graphviz bindings, Grammar(diagram=True) imports this on demand.
+"""
+from transitions import Transition
+from transitions.extensions import GraphMachine
+from transitions.extensions.diagrams import TransitionGraphSupport
+from transitions.extensions.states import add_state_features, Volatile
+
+
+class CustomTransition(TransitionGraphSupport):
+    """ the grammar is shared, only documents that asked for a graph have one to update """
+    def _change_state(self, event_data):
+        if event_data.model in event_data.machine.model_graphs:
+            super()._change_state(event_data)
+        else:
+            Transition._change_state(self, event_data)
+
+
+@add_state_features(Volatile)
+class CustomGraphMachine(GraphMachine):
+    transition_cls = CustomTransition
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
@@ -0,0 +1,533 @@
+""" pdf -> tabula json extraction backends
+
+every extractor returns what tabula.read_pdf(..., output_format='json')
+returns, a list of per page tables with a 'data' list of rows of cells, so
+PdfDocument does not care which backend ran.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from pydfminer.cache import ExtractionCache
+
+log = logging.getLogger(__name__)
+
+# whole page, stream mode
+TABULA_OPTIONS = {
+    'relative_area': True,
+    'area': [0, 0, 100, 100],
+    'lattice': False,
+    'stream': True,
+    }
+
+
+def page_count(pdf):
+    """ the /Count of the catalog's page tree, None if pdfminer can't read it
+
+    only the tree the catalog points at counts, outlines and the page trees
+    an incremental update leaves behind have a /Count too
+    """
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with open(pdf, 'rb') as f:
+        try:
+            count = resolve1(resolve1(PDFDocument(PDFParser(f)).catalog['Pages'])['Count'])
+        except Exception as e:
+            log.debug(f"page_count: {pdf} {e!r}")
+            return None
+    return count if isinstance(count, int) and count >= 0 else None
+
+
+class Profile:
+    """ the regions of a parser's pages worth extracting
+
+    the first page is always extracted whole, it is what classify() probes.
+    header_rows is the number of running header rows every page after it
+    repeats. rest are tabula options (area, columns, ...) for those pages,
+    typically an area cropping exactly those rows. an area is fitted to one
+    layout, on a statement laid out a few points differently it keeps or
+    drops rows the parser does not expect, so rest is only used when asked
+    for, crop=True to process and the batch entry points
+    """
+    def __init__(self, rest=None, header_rows=0):
+        self.rest = dict(rest or {})
+        self.header_rows = header_rows
+
+    def options(self, crop=False):
+        """ the tabula options for the pages after the first """
+        return self.rest if crop else {}
+
+
+class PageStream:
+    """ lazily filled, forward only stand in for the list of pages
+
+    PdfDocument indexes pages like a list. pages are pulled from the
+    iterator when first indexed and released once a later page is reached,
+    keeping one page behind for the current position while last_page()
+    looks one ahead, so at most a window of pages is ever held.
+    """
+    def __init__(self, pages):
+        self._pages = iter(pages)
+        self._held = {}
+        self._exhausted = False
+        # pages pulled from the iterator so far
+        self.count = 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            raise IndexError("a page stream can only be indexed from the start")
+        while index >= self.count and not self._exhausted:
+            try:
+                self._held[self.count] = next(self._pages)
+                self.count += 1
+            except StopIteration:
+                self._exhausted = True
+        for held in [held for held in self._held if held < index - 1]:
+            del self._held[held]
+        try:
+            return self._held[index]
+        except KeyError:
+            if index < self.count:
+                raise ValueError(f"page {index} was already released by the stream")
+            raise IndexError(f"page {index} is past the end of the document")
+
+
+class Extractor:
+    def __init__(self, **options):
+        self.options = {**TABULA_OPTIONS, **options}
+
+    def extract(self, pdf):
+        raise NotImplementedError
+
+    def pages(self, pdf, window=4, start=1):
+        """ yield the pages of pdf from page start, backends that can extract a few pages at a time override this """
+        yield from self.extract(pdf)[start - 1:]
+
+    def first_pages(self, pdfs):
+        """ yield (pdf, page) with only the first page of each pdf extracted
+
+        page is None for a pdf whose first page has no text, or the
+        exception if the pdf failed
+        """
+        for pdf in pdfs:
+            pages = self.pages(pdf, window=1)
+            try:
+                yield pdf, next(pages, None)
+            except Exception as e:
+                yield pdf, e
+            finally:
+                pages.close()
+
+    def extract_many(self, pdfs, start=1):
+        """ yield (pdf, pdf_json) pairs from page start on, pdf_json is the exception if the pdf failed """
+        for pdf in pdfs:
+            try:
+                yield pdf, self.extract(pdf)[start - 1:]
+            except Exception as e:
+                yield pdf, e
+
+
+class TabulaExtractor(Extractor):
+    """ tabula.read_pdf, one java process per pdf """
+    def extract(self, pdf):
+        import tabula
+
+        return tabula.read_pdf(pdf, pages='all', output_format='json', multiple_tables=True, **self.options)
+
+    def extract_many(self, pdfs, start=1):
+        """ the pages before start are not extracted at all, unless the page count can't be read """
+        import tabula
+
+        for pdf in pdfs:
+            try:
+                count = page_count(pdf) if start > 1 else None
+                if count is None:
+                    pdf_json = self.extract(pdf)[start - 1:]
+                elif start > count:
+                    pdf_json = []
+                else:
+                    pdf_json = tabula.read_pdf(pdf, pages=list(range(start, count + 1)), output_format='json',
+                                               multiple_tables=True, **self.options)
+            except Exception as e:
+                yield pdf, e
+                continue
+            yield pdf, pdf_json
+
+    def pages(self, pdf, window=4, start=1):
+        """ yield pages window pages at a time, one java process per window """
+        import tabula
+
+        count = page_count(pdf)
+        while count is None or start <= count:
+            stop = start + window if count is None else min(start + window, count + 1)
+            try:
+                tables = tabula.read_pdf(pdf, pages=list(range(start, stop)), output_format='json', multiple_tables=True, **self.options)
+            except subprocess.CalledProcessError:
+                # a bad pdf, or past the end somewhere in this window, walk it a page at a time
+                for page in range(start, stop):
+                    try:
+                        yield from tabula.read_pdf(pdf, pages=page, output_format='json', multiple_tables=True, **self.options)
+                    except subprocess.CalledProcessError:
+                        # only an unknown page count makes a failing page the end, a known one it is a bad page
+                        if page == 1 or count is not None:
+                            raise
+                        return
+                start = stop
+                continue
+            yield from tables
+            start = stop
+
+
+class BatchTabulaExtractor(TabulaExtractor):
+    """ tabula.convert_into_by_batch, one java process for a whole set of pdfs
+
+    the pdfs are linked into a staging directory so tabula's directory mode
+    only sees them, and the json it writes next to each one is read back.
+    """
+    def extract(self, pdf):
+        for _, pdf_json in self.extract_many([pdf]):
+            if isinstance(pdf_json, Exception):
+                raise pdf_json
+            return pdf_json
+
+    def extract_many(self, pdfs, start=1):
+        """ from page start on, one java process for the pdfs of each page count when start is past page 1
+
+        tabula applies one page list to the whole directory, and a page past
+        the end of any pdf in it fails the lot
+        """
+        if start == 1:
+            yield from self._batch(pdfs, 'all')
+            return
+        groups = {}
+        for pdf in pdfs:
+            try:
+                count = page_count(pdf)
+            except OSError:
+                # _batch reports it
+                count = None
+            groups.setdefault(count, []).append(pdf)
+        for count, group in groups.items():
+            if count is None:
+                for pdf, pdf_json in self._batch(group, 'all'):
+                    yield pdf, pdf_json if isinstance(pdf_json, Exception) else pdf_json[start - 1:]
+            elif start > count:
+                for pdf in group:
+                    yield pdf, []
+            else:
+                yield from self._batch(group, list(range(start, count + 1)), start=start)
+
+    def first_pages(self, pdfs):
+        """ the first page of every pdf from one java process """
+        for pdf, pdf_json in self._batch(pdfs, 1):
+            if isinstance(pdf_json, Exception):
+                yield pdf, pdf_json
+            else:
+                yield pdf, pdf_json[0] if pdf_json else None
+
+    def _batch(self, pdfs, pages, start=1):
+        found = []
+        for pdf in pdfs:
+            if os.path.isfile(pdf):
+                found.append(pdf)
+            else:
+                yield pdf, FileNotFoundError(f"no such pdf {pdf}")
+        if not found:
+            return
+        import tabula
+
+        with tempfile.TemporaryDirectory(prefix='pydfminer-') as staging:
+            staged = []
+            for index, pdf in enumerate(found):
+                path = os.path.join(staging, f"{index:06d}.pdf")
+                try:
+                    os.symlink(os.path.abspath(pdf), path)
+                except OSError:
+                    shutil.copyfile(pdf, path)
+                staged.append(path)
+
+            try:
+                tabula.convert_into_by_batch(staging, output_format='json', pages=pages, **self.options)
+            except subprocess.CalledProcessError as e:
+                # tabula stops the whole directory on the first bad pdf, find out which
+                log.warning(f"batch extraction failed ({e}), falling back to one pdf at a time")
+                if pages == 1:
+                    for pdf, page in super().first_pages(found):
+                        yield pdf, page if isinstance(page, Exception) else [page] if page else []
+                else:
+                    yield from super().extract_many(found, start=start)
+                return
+
+            for pdf, path in zip(found, staged):
+                output = path[:-len('.pdf')] + '.json'
+                try:
+                    with open(output) as f:
+                        yield pdf, json.load(f)
+                except (OSError, ValueError) as e:
+                    yield pdf, e
+
+
+class PdfminerExtractor(Extractor):
+    """ pdfminer.six, no java process: tabula's stream mode rebuilt from character positions
+
+    characters whose boxes overlap vertically make a line, split into chunks
+    where the gap between two characters is more than an em. columns are
+    the right edges of the regions the chunks of successive lines overlap
+    into, as tabula's BasicExtractionAlgorithm finds them, and a chunk goes
+    in the first column whose edge is right of its left; chunks in one
+    column are joined with spaces. texts and lefts are tabula's, widths come
+    from the pdf's font metrics rather than pdfbox's so can be off by a
+    point, top and height are the glyph box, a few points above and taller
+    than tabula's. area and relative_area crop, a character is in the area
+    if the middle of its box is. stream mode only
+    """
+    def __init__(self, **options):
+        super().__init__(**options)
+        if self.options.get('lattice'):
+            raise ValueError("the pdfminer backend only extracts in stream mode")
+        # part of the options so an ExtractionCache keeps these apart from tabula's pages
+        self.options['extractor'] = 'pdfminer'
+
+    def extract(self, pdf):
+        return list(self.pages(pdf))
+
+    def extract_many(self, pdfs, start=1):
+        for pdf in pdfs:
+            try:
+                yield pdf, list(self.pages(pdf, start=start))
+            except Exception as e:
+                yield pdf, e
+
+    def pages(self, pdf, window=4, start=1):
+        """ yield pages one at a time, window is irrelevant in process """
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        resources = PDFResourceManager()
+        # no layout analysis, the page is a flat list of characters
+        device = PDFPageAggregator(resources, laparams=None)
+        interpreter = PDFPageInterpreter(resources, device)
+        with open(pdf, 'rb') as f:
+            for number, page in enumerate(PDFPage.get_pages(f), start=1):
+                if number < start:
+                    continue
+                interpreter.process_page(page)
+                yield self._table(device.get_result())
+
+    def _area(self, layout):
+        """ (top, left, bottom, right) of the area to extract in points from the top left of the page """
+        top, left, bottom, right = self.options.get('area') or (0, 0, 100, 100)
+        if self.options.get('relative_area'):
+            top, bottom = top * layout.height / 100, bottom * layout.height / 100
+            left, right = left * layout.width / 100, right * layout.width / 100
+        return float(top), float(left), float(bottom), float(right)
+
+    def _table(self, layout):
+        from pdfminer.layout import LTChar
+
+        area_top, area_left, area_bottom, area_right = self._area(layout)
+        chars = []
+        for char in layout:
+            if not isinstance(char, LTChar):
+                continue
+            top, bottom = layout.y1 - char.y1, layout.y1 - char.y0
+            left, right = char.x0 - layout.x0, char.x1 - layout.x0
+            if area_top <= (top + bottom) / 2 <= area_bottom and area_left <= (left + right) / 2 <= area_right:
+                chars.append((top, bottom, left, right, char.get_text(), char.size))
+        chars.sort(key=lambda char: (round(char[0], 1), char[2]))
+
+        lines = []
+        for char in chars:
+            top, bottom = char[0], char[1]
+            if lines and top < lines[-1][1] - (bottom - top) / 2:
+                lines[-1][1] = max(lines[-1][1], bottom)
+                lines[-1][2].append(char)
+            else:
+                lines.append([top, bottom, [char]])
+        lines = [chunks for chunks in (self._chunks(line) for _, _, line in lines) if chunks]
+
+        columns = [float(column) for column in self.options['columns']] if self.options.get('columns') else _column_edges(lines)
+        rows = []
+        for chunks in lines:
+            cells = {}
+            for chunk in chunks:
+                column = next((index for index, edge in enumerate(columns) if chunk['left'] <= edge), len(columns))
+                cells.setdefault(column, []).append(chunk)
+            rows.append(cells)
+        width = max((max(cells) + 1 for cells in rows), default=0)
+        data = []
+        for cells in rows:
+            row = []
+            for column in range(width):
+                chunks = cells.get(column)
+                if chunks is None:
+                    row.append({'top': 0.0, 'left': 0.0, 'width': 0.0, 'height': 0.0, 'text': ''})
+                    continue
+                top = min(chunk['top'] for chunk in chunks)
+                row.append({
+                    'top': top,
+                    'left': chunks[0]['left'],
+                    'width': max(chunk['right'] for chunk in chunks) - chunks[0]['left'],
+                    'height': max(chunk['bottom'] for chunk in chunks) - top,
+                    'text': ' '.join(chunk['text'] for chunk in chunks),
+                    })
+            data.append(row)
+        return {
+            'extraction_method': 'stream',
+            'top': area_top,
+            'left': area_left,
+            'width': area_right - area_left,
+            'height': area_bottom - area_top,
+            'right': area_right,
+            'bottom': area_bottom,
+            'data': data,
+            }
+
+    @staticmethod
+    def _chunks(line):
+        """ the runs of characters of a line, left to right, with a space wherever one was left out """
+        chunks = []
+        for top, bottom, left, right, text, size in sorted(line, key=lambda char: char[2]):
+            chunk = chunks[-1] if chunks else None
+            if chunk is not None and left - chunk['right'] <= size:
+                # tabula's word spacing, the smaller of a third of a character and half a space
+                if left - chunk['right'] > min(0.3 * (right - left), 0.125 * size) and not chunk['text'].endswith(' '):
+                    chunk['text'] += ' '
+                chunk['text'] += text
+                chunk['right'] = max(chunk['right'], right)
+                chunk['top'] = min(chunk['top'], top)
+                chunk['bottom'] = max(chunk['bottom'], bottom)
+            else:
+                chunks.append({'top': top, 'bottom': bottom, 'left': left, 'right': right, 'text': text})
+        for chunk in chunks:
+            chunk['text'] = chunk['text'].strip()
+        return [chunk for chunk in chunks if chunk['text']]
+
+
+def _column_edges(lines):
+    """ tabula's column positions: the right edges of the first line's chunks, widened by every later chunk overlapping them """
+    regions = []
+    for chunks in lines:
+        unplaced = list(chunks)
+        for region in regions:
+            overlapping = [chunk for chunk in unplaced if chunk['left'] < region[1] and region[0] < chunk['right']]
+            for chunk in overlapping:
+                region[0] = min(region[0], chunk['left'])
+                region[1] = max(region[1], chunk['right'])
+            unplaced = [chunk for chunk in unplaced if chunk not in overlapping]
+        regions.extend([chunk['left'], chunk['right']] for chunk in unplaced)
+    return sorted(right for _, right in regions)
+
+
+class CachedExtractor(Extractor):
+    """ serve pdfs from an ExtractionCache, handing only the misses to the wrapped extractor """
+    def __init__(self, extractor, cache):
+        self.extractor = extractor
+        self.options = extractor.options
+        self.cache = cache
+        # pdfs answered from the cache by the last extract_many
+        self.cached = set()
+
+    def extract(self, pdf):
+        for _, pdf_json in self.extract_many([pdf]):
+            if isinstance(pdf_json, Exception):
+                raise pdf_json
+            return pdf_json
+
+    def _lookup(self, pdf, start=1):
+        """ (key, pages from start) of pdf, the pages None on a miss
+
+        pages from start are kept under their own key, a whole document
+        cached under these options is used too
+        """
+        key = self.cache.key(pdf, self.options if start == 1 else {**self.options, 'start': start})
+        pdf_json = self.cache.get(key, count=False)
+        if pdf_json is None and start > 1:
+            pdf_json = self.cache.get(self.cache.key(pdf, self.options), count=False)
+            pdf_json = None if pdf_json is None else pdf_json[start - 1:]
+        self.cache.count(pdf_json is not None)
+        return key, pdf_json
+
+    def pages(self, pdf, window=4, start=1):
+        """ cached pages, or the wrapped extractor's stream on a miss
+
+        a streamed miss is not written back, that would hold the whole
+        document the stream exists to avoid holding
+        """
+        _, pdf_json = self._lookup(pdf, start)
+        if pdf_json is None:
+            yield from self.extractor.pages(pdf, window=window, start=start)
+        else:
+            yield from pdf_json
+
+    def first_pages(self, pdfs):
+        """ first pages of cached pdfs from the cache, the rest from the wrapped extractor
+
+        a first page is kept under its own key, a routed pdf's later pages
+        are extracted with another profile so no whole document under
+        these options is ever cached for it. one that is is used too
+        """
+        keys = {}
+        for pdf in pdfs:
+            try:
+                key = self.cache.key(pdf, {**self.options, 'pages': 1})
+                pdf_json = self.cache.get(key, count=False)
+                if pdf_json is None:
+                    pdf_json = self.cache.get(self.cache.key(pdf, self.options), count=False)
+                    pdf_json = None if pdf_json is None else pdf_json[:1]
+                self.cache.count(pdf_json is not None)
+            except OSError as e:
+                yield pdf, e
+                continue
+            if pdf_json is None:
+                keys[pdf] = key
+            else:
+                yield pdf, pdf_json[0] if pdf_json else None
+        for pdf, page in self.extractor.first_pages(list(keys)):
+            if not isinstance(page, Exception):
+                # an empty list for a pdf whose first page has no text, so that is cached too
+                self.cache.put(keys[pdf], [page] if page else [])
+            yield pdf, page
+
+    def extract_many(self, pdfs, start=1):
+        self.cached = set()
+        keys = {}
+        for pdf in pdfs:
+            try:
+                key, pdf_json = self._lookup(pdf, start)
+            except OSError as e:
+                yield pdf, e
+                continue
+            if pdf_json is None:
+                keys[pdf] = key
+            else:
+                self.cached.add(pdf)
+                yield pdf, pdf_json
+
+        for pdf, pdf_json in self.extractor.extract_many(list(keys), start=start):
+            if not isinstance(pdf_json, Exception):
+                self.cache.put(keys[pdf], pdf_json)
+            yield pdf, pdf_json
+
+
+EXTRACTORS = {
+    'tabula': TabulaExtractor,
+    'batch': BatchTabulaExtractor,
+    'pdfminer': PdfminerExtractor,
+    }
+
+
+def extractor(backend='tabula', cache=None, **options):
+    """ build a backend, cache is an ExtractionCache or a directory for one """
+    result = EXTRACTORS[backend](**options)
+    if cache is not None:
+        if not isinstance(cache, ExtractionCache):
+            cache = ExtractionCache(cache)
+        result = CachedExtractor(result, cache)
+    return result
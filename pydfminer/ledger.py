@@ -0,0 +1,221 @@
+""" bulk normalization of activity lines and the transaction sinks
+
+an activity line is [MM/DD, amount, description...] as collected by
+AccountActivityLine. frame() converts a whole list of them at once: dates
+take their year from the statement period, amounts like (1,234.56) become
+integer cents so totals stay exact. transactions() adds the account and
+section each line was recorded under, and the write_* sinks turn that
+frame into ledger text, csv, json lines or parquet in one pass.
+"""
+import datetime
+import os
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+PERIOD_FORMAT = '%m/%d/%Y'
+
+# activity header text -> section, first match wins; "desposits" is a misspelling older grammars looked for
+SECTIONS = [
+    ('deposit', r'des?posit'),
+    ('withdrawal', r'withdrawal'),
+    ('check', r'check'),
+    ]
+COLUMNS = ['account', 'section', 'date', 'cents', 'description']
+
+
+class Transaction(NamedTuple):
+    account: str
+    section: str
+    date: datetime.date
+    cents: int
+    description: str
+
+
+def period_date(text):
+    """ a statement period bound like ' 01/31/2020', None when missing """
+    if text is None:
+        return None
+    return datetime.datetime.strptime(text.strip(), PERIOD_FORMAT)
+
+
+def dates(mmdd, start=None, stop=None):
+    """ MM/DD strings as datetime64, NaT where they don't parse
+
+    the year is the period's start year, or its stop year for dates that
+    would fall before the start, which covers periods spanning new year.
+    without a period the current year is used, as dateutil did
+    """
+    mmdd = pd.Series(mmdd, dtype=object)
+    if start is None:
+        start = stop = datetime.datetime(datetime.date.today().year, 1, 1)
+    stop = start if stop is None else stop
+    first = pd.to_datetime(f"{start.year}/" + mmdd, format='%Y/%m/%d', errors='coerce')
+    if stop.year == start.year:
+        return first
+    second = pd.to_datetime(f"{stop.year}/" + mmdd, format='%Y/%m/%d', errors='coerce')
+    return first.where(first >= start, second)
+
+
+def cents(amounts):
+    """ amount strings as int64 cents, parentheses or a minus sign for negative """
+    text = pd.Series(amounts, dtype=object)
+    if text.empty:
+        return pd.Series([], dtype=np.int64)
+    text = text.str.strip()
+    negative = text.str.startswith('(') | text.str.startswith('-')
+    parts = text.str.replace(r'[$,()\s-]', '', regex=True).str.partition('.')
+    whole = parts[0].replace('', '0').astype(np.int64)
+    fraction = parts[2].str.ljust(2, '0').str[:2].astype(np.int64)
+    result = whole * 100 + fraction
+    return result.where(~negative, -result).astype(np.int64)
+
+
+def format_cents(values):
+    """ int64 cents as -1234.56 strings """
+    values = pd.Series(values, dtype=np.int64)
+    magnitude = values.abs()
+    sign = pd.Series(np.where(values < 0, '-', ''), index=values.index, dtype=object)
+    return (sign
+            + (magnitude // 100).astype(str).astype(object)
+            + '.'
+            + (magnitude % 100).astype(str).astype(object).str.zfill(2))
+
+
+def frame(lines, start_date=None, stop_date=None):
+    """ lines as a DataFrame of date, cents and description
+
+    start_date and stop_date are the StatementPeriod strings. a line whose
+    date is not a day of the period's years, 02/30 say, raises ValueError
+    rather than becoming a NaT no sink can write
+    """
+    lines = list(lines)
+    result = pd.DataFrame({
+        'date': dates([line[0] for line in lines], period_date(start_date), period_date(stop_date)),
+        'cents': cents([line[1] for line in lines]),
+        'description': pd.Series([' '.join(line[2:]) for line in lines], dtype=object),
+        })
+    invalid = np.flatnonzero(result['date'].isna().to_numpy())
+    if len(invalid):
+        shown = [lines[index] for index in invalid[:5]]
+        raise ValueError(f"{len(invalid)} activity lines with no valid date, {shown}"
+                         f"{' ...' if len(invalid) > len(shown) else ''}")
+    return result
+
+
+def sections(headers):
+    """ activity header texts as 'deposit', 'withdrawal' or 'check', the text itself otherwise """
+    headers = pd.Series(headers, dtype=object)
+    result = headers.copy()
+    matched = pd.Series(False, index=headers.index)
+    for name, pattern in SECTIONS:
+        hit = ~matched & headers.str.contains(pattern, flags=re.IGNORECASE, regex=True).fillna(False).astype(bool)
+        result[hit] = name
+        matched |= hit
+    return result
+
+
+def transactions(records, start_date=None, stop_date=None):
+    """ (account, activity header, line) records as a DataFrame of the Transaction fields """
+    records = list(records)
+    result = frame([line for _, _, line in records], start_date, stop_date)
+    result.insert(0, 'account', pd.Series([account for account, _, _ in records], dtype=object))
+    result.insert(1, 'section', sections([header for _, header, _ in records]))
+    return result
+
+
+def concat(frames):
+    """ one frame of several documents' transactions, frames maps each pdf to its frame
+
+    a 'pdf' column says which document a transaction came from
+    """
+    parts = []
+    for pdf, frame in frames.items():
+        frame = frame.copy()
+        frame.insert(0, 'pdf', pdf)
+        parts.append(frame)
+    if not parts:
+        result = transactions([])
+        result.insert(0, 'pdf', pd.Series([], dtype=object))
+        return result
+    return pd.concat(parts, ignore_index=True)
+
+
+def records(frame):
+    """ the rows of a transactions() frame as Transaction """
+    dates = frame['date'].dt.date
+    return [Transaction(*row) for row in zip(
+        frame['account'], frame['section'], dates, frame['cents'].tolist(), frame['description'])]
+
+
+def to_dicts(frame):
+    """ json friendly rows of python values, dates as YYYY-MM-DD """
+    plain = _plain(frame)
+    columns = [plain[column].tolist() for column in plain.columns]
+    return [dict(zip(plain.columns, row)) for row in zip(*columns)]
+
+
+def from_dicts(rows):
+    """ the inverse of to_dicts """
+    result = pd.DataFrame.from_records(list(rows), columns=COLUMNS)
+    result['date'] = pd.to_datetime(result['date'], format='%Y-%m-%d')
+    result['cents'] = result['cents'].astype(np.int64)
+    return result
+
+
+def _plain(frame):
+    result = frame.copy()
+    result['date'] = result['date'].dt.strftime('%Y-%m-%d').astype(object)
+    return result
+
+
+def entries(frame):
+    """ the ledger entry text of every row of a transactions() frame """
+    return list(frame['date'].dt.strftime('%Y-%m-%d').astype(object)
+                + '\t' + frame['description']
+                + '\n\t' + frame['account'] + '\t' + format_cents(frame['cents']))
+
+
+def write_ledger(frame, out):
+    text = ''.join(entry + '\n' for entry in entries(frame))
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'w') as f:
+            f.write(text)
+    else:
+        out.write(text)
+
+
+def write_csv(frame, out):
+    """ amounts as exact decimal text rather than cents, for spreadsheets """
+    result = _plain(frame)
+    position = result.columns.get_loc('cents')
+    result.insert(position, 'amount', format_cents(result.pop('cents')))
+    result.to_csv(out, index=False)
+
+
+def write_jsonl(frame, out):
+    _plain(frame).to_json(out, orient='records', lines=True)
+
+
+def write_parquet(frame, out):
+    """ needs pyarrow or fastparquet """
+    frame.to_parquet(out, index=False)
+
+
+SINKS = {
+    'ledger': write_ledger,
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+    }
+
+
+def write(frame, out, format=None):
+    """ write frame with the sink named by format, or by out's extension """
+    if format is None:
+        if not isinstance(out, (str, os.PathLike)):
+            raise ValueError("format is needed when writing to a file object")
+        format = os.path.splitext(out)[1].lstrip('.').lower()
+    SINKS[format](frame, out)
@@ -1,22 +1,34 @@
-from pprint import pprint
-import datetime
+# imports that are only needed by some commands (fire, pdb, pandas via
+# ledger, tabula, graphviz via diagram, the process pool) are made where
+# they are used, so startup stays cheap for per file invocations
+import hashlib
+import itertools
 import json
 import logging
-import pdb
+import os
 import re
+import sys
+import time
 import traceback
+from types import SimpleNamespace
+from typing import NamedTuple
 
 from transitions import Machine
-from transitions.extensions import GraphMachine
+from transitions.core import EventData
 from transitions import State
 from transitions.extensions.states import add_state_features, Volatile
 from treelib import Node, Tree
-import dateutil
-import fire
-import tabula
+
+from pydfminer.columnar import ColumnarPage, header_columns, ingest, ingest_pages, texts
+from pydfminer.extract import PageStream, Profile, extractor
+from pydfminer.manifest import Manifest
 
 #NestedState.separator = '↦'
 
+log = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
 
 # institution classifier
 ## bank
@@ -41,25 +53,269 @@ import tabula
 #     keyword: volatile (class, optional) -- every time the state is entered an object of type class will be assigned to the model. The attribute name is defined by hook. If omitted, an empty VolatileObject will be created instead
 #     keyword: hook (string, default='scope') -- The model's attribute name fore the temporal object.
 @add_state_features(Volatile)
-class CustomStateMachine(GraphMachine):
+class CustomStateMachine(Machine):
+    """ the machine documents run on, pydfminer.diagram.CustomGraphMachine when a diagram is wanted """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-class Document(Tree):
-    def __init__(self, document, *args, **kwargs):
+class Context(NamedTuple):
+    """ the ancestors of a grammar node its handlers need, resolved once when the node is added """
+    account: 'AccountDetailHeader' = None
+    header: 'AccountActivityHeader' = None
+
+
+class Carried(NamedTuple):
+    """ stands in for a node's local value set on a page before the ones being parsed, see parse_pages """
+    node: str
+    name: str
+
+
+class Checkpoint(NamedTuple):
+    """ where a run was when a page's running headers were consumed, see PdfDocument.recover """
+    state: str
+    previous_state: str
+    location: dict
+    # how many records, and rows consumed, there were
+    records: int
+    consumed: int
+    # the length of every local's accumulates lists
+    locals: dict
+
+
+class EndOfDocument(IndexError):
+    """ row() ran out of rows on the last page, or past the pages being parsed """
+
+
+class Grammar(Tree):
+    """ states, transitions and tree of a statement layout
+
+    built once and shared by every Document bound to it, anything that
+    differs per document lives in Document.local(node)
+    """
+    def __init__(self, *args, diagram=False, **kwargs):
         super().__init__(*args, **kwargs)
+        self._initial = State(name='machine_initial')
+        if diagram:
+            from pydfminer.diagram import CustomGraphMachine
+            self.machine = CustomGraphMachine(model=None, initial=self._initial, auto_transitions=False, show_conditions=True, show_auto_transitions=True, show_state_attributes=True)
+        else:
+            self.machine = CustomStateMachine(model=None, initial=self._initial, auto_transitions=False)
+        self.diagram = diagram
+        self._dispatch = None
+        self._version = None
+        self._identifiers = 0
+
+    def identifier(self, tag):
+        """ the next node identifier, the same in every build so documents' locals mean the same in every process """
+        self._identifiers += 1
+        return f"{tag}:{self._identifiers}"
+
+    def add_node(self, node, parent=None):
+        """ Tree.add_node, also giving node its Context and its state name
+
+        the root's children are the statement's sections, a node below one
+        is named <section tag>:<tag> so the same node class in two sections
+        is two states, each with its own Context
+        """
+        super().add_node(node, parent=parent)
+        if parent is None:
+            context = Context()
+        else:
+            parent = self[parent.identifier if isinstance(parent, Node) else parent]
+            context = parent.context
+            if parent.scope is not None:
+                node.qualify(parent.scope)
+            node.scope = parent.scope or (node.tag if parent.identifier == self.root else None)
+        if node.role is not None:
+            context = context._replace(**{node.role: node})
+        node.context = context
+
+    def version(self):
+        """ hash of the source of the grammar, its node classes and the ledger conversion
+
+        changes whenever editing the code could change what a document parses to
+        """
+        if self._version is None:
+            import importlib.util
+            import inspect
+
+            classes = {type(self), *(type(node) for node in self.all_nodes_itr()),
+                       *(type(state) for state in self.machine.states.values())}
+            classes = {base for cls in classes for base in cls.__mro__
+                       if base.__module__.startswith('pydfminer')}
+            digest = hashlib.sha256()
+            for cls in sorted(classes, key=lambda cls: (cls.__module__, cls.__qualname__)):
+                digest.update(inspect.getsource(cls).encode())
+            # read rather than imported, importing ledger imports pandas
+            with open(importlib.util.find_spec('pydfminer.ledger').origin, 'rb') as f:
+                digest.update(f.read())
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    @property
+    def dispatch(self):
+        """ DispatchTable for Document.run(dispatch=True), compiled on first use """
+        if self._dispatch is None:
+            self._dispatch = DispatchTable(self.machine)
+        return self._dispatch
+
+class DispatchTable:
+    """ precompiled next state selection
+
+    for each state the transitions get_triggers/Event would try, in the same
+    order, and one regex combining every RegexMatchingSection.ready pattern
+    they depend on. each pattern sits in its own optional lookahead group, so
+    a single match per cell reports every pattern found anywhere in it, which
+    is exactly what the separate ready() searches answer. conditions that are
+    not a plain done/ready are still called.
+    """
+    def __init__(self, machine):
+        self.machine = machine
+        self.states = {}
+
+    def candidates(self, state):
+        try:
+            return self.states[state]
+        except KeyError:
+            compiled = self.states[state] = self._compile(state)
+            return compiled
+
+    def _compile(self, state):
+        groups = {}
+        candidates = []
+        flags = None
+        for trigger in self.machine.get_triggers(state):
+            event = self.machine.events[trigger]
+            for transition in event.transitions[state]:
+                required = []
+                opaque = []
+                for condition in transition.conditions:
+                    func = getattr(condition.func, '__func__', None)
+                    node = getattr(condition.func, '__self__', None)
+                    if condition.target and func in (Section.done, Section.ready):
+                        continue
+                    if (condition.target and func is RegexMatchingSection.ready
+                            and flags in (None, node.regex.flags)):
+                        flags = node.regex.flags
+                        if node.regex.pattern not in groups:
+                            groups[node.regex.pattern] = f"g{len(groups)}"
+                        required.append(groups[node.regex.pattern])
+                    else:
+                        opaque.append(condition)
+                candidates.append((event, transition, required, opaque))
+
+        regex = None
+        if groups:
+            regex = re.compile(''.join(
+                f"(?:(?=[\\s\\S]*?(?P<{name}>{pattern}))|)"
+                for pattern, name in groups.items()), flags)
+        return candidates, regex
+
+    def select(self, document, row):
+        """ the (event, transition) the trigger loop would take for row, or None """
+        candidates, regex = self.candidates(document.state)
+        found = set()
+        if regex is not None:
+            for text in texts(row):
+                match = regex.match(text)
+                found.update(name for name, value in match.groupdict().items() if value is not None)
+        for event, transition, required, opaque in candidates:
+            if not found.issuperset(required):
+                continue
+            if opaque:
+                state = self.machine.get_state(document.state)
+                event_data = EventData(state, event, self.machine, document, args=(row,), kwargs={})
+                if not all(condition.check(event_data) for condition in opaque):
+                    continue
+            return event, transition
+        return None
+
+    def execute(self, document, event, transition, row):
+        """ Transition.execute without re-checking the conditions select already checked """
+        machine = self.machine
+        event_data = EventData(machine.get_state(document.state), event, machine, document, args=(row,), kwargs={})
+        event_data.transition = transition
+        for func in itertools.chain(machine.prepare_event, transition.prepare):
+            machine.callback(func, event_data)
+        for func in itertools.chain(machine.before_state_change, transition.before):
+            machine.callback(func, event_data)
+        if transition.dest:
+            transition._change_state(event_data)
+        for func in itertools.chain(transition.after, machine.after_state_change, machine.finalize_event):
+            machine.callback(func, event_data)
+
+class Document:
+    def __init__(self, document, grammar):
         self.document = document
-        self._machine = None
-        #self.machine.add_model(self)
+        self.grammar = grammar
+        # per document state of each grammar node, by node identifier
+        self.locals = {}
         # used for returning to previous state when page ends
         self.previous_state = None
+        self.state = grammar.machine.initial
+        # (account, activity header, line) for every activity line, in the order read
+        self.records = []
+        # rows consumed so far, for the profiler
+        self.consumed = 0
+        # the StateProfiler of the run in progress, if any
+        self.profiler = None
+        # parsing pages without the ones before them, see parse_pages
+        self.partial = False
+        # what run(errors='skip' or 'rollback') recovered from, one dict per failed page
+        self.errors = []
 
     @property
     def machine(self):
-        if self._machine is None:
-            self._initial = State(name='machine_initial')
-            self._machine = CustomStateMachine(model=self, initial=self._initial, auto_transitions=False, show_conditions=True, show_auto_transitions=True, show_state_attributes=True)
-        return self._machine
+        return self.grammar.machine
+
+    def local(self, node):
+        try:
+            return self.locals[node.identifier]
+        except KeyError:
+            local = self.locals[node.identifier] = node.new_local()
+            return local
+
+    def value(self, node, name):
+        """ the name attribute of node's local
+
+        a Carried for it when partial and node has not been entered yet,
+        its value is whatever the pages before left it at
+        """
+        if self.partial and node.identifier not in self.locals:
+            return Carried(node.identifier, name)
+        return getattr(self.local(node), name)
+
+    def trigger(self, trigger, *args, **kwargs):
+        return self.machine.events[trigger].trigger(self, *args, **kwargs)
+
+    def get_graph(self, title=None):
+        """ a diagram of the grammar that follows this document's state, needs Grammar(diagram=True) """
+        if not self.grammar.diagram:
+            raise ValueError("the grammar was built without diagram=True")
+        return self.machine._get_graph(self, title=title, force_new=True)
+
+    def record(self, account, header, line):
+        self.records.append((account, header, line))
+
+    def frame(self):
+        """ the records as a ledger.transactions() DataFrame, converted in one pass """
+        from pydfminer import ledger
+
+        period = self.local(self.grammar.statement_period)
+        return ledger.transactions(self.records, period.start_date, period.stop_date)
+
+    def transactions(self):
+        from pydfminer import ledger
+
+        return ledger.records(self.frame())
+
+    def ledger(self, out=None, format=None):
+        """ write the transactions with one of ledger.SINKS, ledger text to stdout by default """
+        from pydfminer import ledger
+
+        if out is None:
+            out, format = sys.stdout, format or 'ledger'
+        ledger.write(self.frame(), out, format=format)
 
     def last_page(self):
         pass
@@ -73,8 +329,44 @@ class Document(Tree):
     def col(self):
         pass
 
-    def run(self):
-        assert self.machine.model == self
+    def checkpoint(self):
+        pass
+
+    def recover(self, error, rollback=False):
+        """ move past the page that failed, rolling back to the last checkpoint first if rollback
+
+        False if there is no page left, raises error if the document cannot recover
+        """
+        raise error
+
+    def run(self, dispatch=False, profiler=None, errors='raise'):
+        """ parse the document until no transition matches a row or the rows run out
+
+        an exception from a state's callbacks is raised with errors='raise'.
+        errors='skip' records it in errors instead and carries on from the
+        next page, keeping what was parsed before it. errors='rollback' also
+        drops what the failed page added, see PdfDocument.recover
+        """
+        if errors not in ('raise', 'skip', 'rollback'):
+            raise ValueError(f"errors is 'raise', 'skip' or 'rollback', not {errors!r}")
+        self.checkpoint()
+        while True:
+            try:
+                if profiler is not None:
+                    self.run_profiled(profiler)
+                elif dispatch:
+                    self.run_dispatch()
+                else:
+                    self.run_triggers()
+                return
+            except Exception as e:
+                if errors == 'raise':
+                    raise
+                if not self.recover(e, rollback=errors == 'rollback'):
+                    return
+
+    def run_triggers(self):
+        """ run() trying each of the state's triggers in turn """
         try:
             # stop if there is no where to go
             triggers = True
@@ -82,36 +374,198 @@ class Document(Tree):
             while triggers and successful_trigger: # self.state != 'terminus' and
                 self.previous_state = self.state
                 triggers = self.machine.get_triggers(self.state)
-                log.debug(f"run:st {self.state} tr {triggers}")
+                log.debug("run:st %s tr %s", self.state, triggers)
                 for trigger in triggers:
                     successful_trigger = self.trigger(trigger, self.row())
                     if successful_trigger:
-                        log.debug(f"run:st {self.state} tr {trigger} worked")
+                        log.debug("run:st %s tr %s worked", self.state, trigger)
                         break
 
-            log.debug(f"run:complete state {self.state} prev {self.previous_state} row {self.row()} suc {successful_trigger}")
-        except IndexError:
-            log.debug(f"run:complete out of document, state {self.state} prev {self.previous_state}")
+            log.debug("run:complete state %s prev %s row %s suc %s", self.state, self.previous_state, self.row(), successful_trigger)
+        except EndOfDocument:
+            log.debug("run:complete out of document, state %s prev %s", self.state, self.previous_state)
+
+    def run_profiled(self, profiler):
+        """ run() checking each transition's conditions itself, so profiler sees every attempt
+
+        takes the same transitions as run(), dispatch=True is not profiled
+        """
+        machine = self.machine
+        execute = self.grammar.dispatch.execute
+        self.profiler = profiler
+        started = time.perf_counter()
+        try:
+            while True:
+                self.previous_state = self.state
+                triggers = machine.get_triggers(self.state)
+                if not triggers:
+                    break
+                row = self.row()
+                selected = None
+                for trigger in triggers:
+                    event = machine.events[trigger]
+                    for transition in event.transitions[self.state]:
+                        start = time.perf_counter()
+                        event_data = EventData(machine.get_state(self.state), event, machine, self, args=(row,), kwargs={})
+                        passed = all(profiler.check(condition, event_data) for condition in transition.conditions)
+                        if passed:
+                            source = self.state
+                            execute(self, event, transition, row)
+                            profiler.attempt(source, trigger, transition.dest, True, time.perf_counter() - start)
+                            selected = transition
+                            break
+                        profiler.attempt(self.state, trigger, transition.dest, False, time.perf_counter() - start)
+                    if selected is not None:
+                        log.debug("run:st %s tr %s worked", self.state, trigger)
+                        break
+                    profiler.failed_trigger(self.state)
+                if selected is None:
+                    break
+
+            log.debug("run:complete state %s prev %s row %s", self.state, self.previous_state, self.row())
+        except EndOfDocument:
+            log.debug("run:complete out of document, state %s prev %s", self.state, self.previous_state)
+        finally:
+            self.profiler = None
+            profiler.run(time.perf_counter() - started)
+
+    def run_dispatch(self):
+        """ run() picking each transition from the grammar's DispatchTable """
+        table = self.grammar.dispatch
+        try:
+            while True:
+                self.previous_state = self.state
+                candidates, _ = table.candidates(self.state)
+                if not candidates:
+                    break
+                row = self.row()
+                selected = table.select(self, row)
+                if selected is None:
+                    break
+                event, transition = selected
+                log.debug("run:st %s tr %s selected", self.state, event.name)
+                table.execute(self, event, transition, row)
+
+            log.debug("run:complete state %s prev %s row %s", self.state, self.previous_state, self.row())
+        except EndOfDocument:
+            log.debug("run:complete out of document, state %s prev %s", self.state, self.previous_state)
 
 
 
+# institution parsers by name, classify() tries their probes in this order
+PARSERS = {}
+
+
+def parser(name):
+    """ class decorator registering a PdfDocument subclass as the parser for name """
+    def register(cls):
+        cls.parser_name = name
+        PARSERS[name] = cls
+        return cls
+    return register
+
+
+class Unclassified(ValueError):
+    """ no parser's probe accepts a pdf's first page """
+    def __init__(self, pdf):
+        super().__init__(f"no parser recognises the first page of {pdf}")
+
+
+def classify(page):
+    """ the name of the first parser whose probe accepts page, a pdf's first page, or None """
+    if page is None:
+        return None
+    for name, cls in PARSERS.items():
+        if cls.probe(page):
+            return name
+    return None
+
+
+def parser_versions(crop=False):
+    """ version of every registered parser, by name, see PdfDocument.version """
+    return {name: cls.version(crop) for name, cls in PARSERS.items()}
+
+
+def registry_version(versions=None):
+    """ changes when a parser is registered or any parser's grammar changes """
+    versions = parser_versions() if versions is None else versions
+    return hashlib.sha256(json.dumps(versions, sort_keys=True).encode()).hexdigest()[:16]
+
+
 class PdfDocument(Document):
-    def __init__(self, document):
-        super().__init__(document)
+    # regex over the cell texts of a pdf's first page that identifies this parser's statements
+    signature = None
+    # what to extract of the pages after the first once the parser is known
+    profile = Profile()
+
+    @classmethod
+    def probe(cls, page):
+        """ True if page, the first page of a pdf as extracted, looks like this parser's statements
+
+        only ever sees the one page, so it has to be cheap and not depend on the layout parsing
+        """
+        if cls.signature is None:
+            return False
+        rows = page if isinstance(page, ColumnarPage) else page['data']
+        return any(cls.signature.search(text) for row in rows for text in texts(row))
+
+    @classmethod
+    def compile(cls, diagram=False):
+        """ the grammar documents of this parser share """
+        raise NotImplementedError
+
+    @classmethod
+    def version(cls, crop=False):
+        """ the grammar's version, changing too with this class, its Profile and whether pages are cropped to it """
+        import inspect
+
+        digest = hashlib.sha256(cls.compile().version().encode())
+        for base in cls.__mro__:
+            if base.__module__.startswith('pydfminer'):
+                digest.update(inspect.getsource(base).encode())
+        digest.update(json.dumps([cls.profile.options(crop), cls.profile.header_rows], sort_keys=True).encode())
+        return digest.hexdigest()[:16]
+
+    def __init__(self, document, grammar, cropped=False):
+        """ cropped says pages after the first were extracted with profile.rest """
+        super().__init__(document, grammar)
+        # running header rows to skip after a page break, the crop already dropped them
+        self.header_rows = 0 if cropped else self.profile.header_rows
         self.location = {
             'page': 0,
             'row': 0,
             'col': 0
             }
+        # (page, row) row() stops at as if the document ended there, see parse_pages
+        self.stop = None
+        self.stopped = False
+        self._checkpoint = None
 
     def last_page(self):
-        return (self.location['page']+1) >= len(self.document)
+        # by index rather than len() so document can be a PageStream
+        try:
+            self.document[self.location['page'] + 1]
+        except IndexError:
+            return True
+        return False
 
     def page(self):
-        return self.document[self.location['page']]['data']
+        page = self.document[self.location['page']]
+        if isinstance(page, ColumnarPage):
+            return page
+        return page['data']
 
     def row(self):
-        return self.page()[self.location['row']]
+        if self.stop is not None and (self.location['page'], self.location['row']) >= self.stop:
+            self.stopped = True
+            raise EndOfDocument("past the pages being parsed")
+        try:
+            return self.page()[self.location['row']]
+        except IndexError:
+            # running off any other page means its page break was never found
+            if self.last_page():
+                raise EndOfDocument(f"no row {self.location['row']} on the last page") from None
+            raise
 
     def col(self):
         return self.row()[self.location['col']]
@@ -119,6 +573,7 @@ class PdfDocument(Document):
     def consume_row(self):
         r = self.row()
         self.location['row'] = self.location['row'] + 1
+        self.consumed += 1
         return r
 
     def consume_page(self):
@@ -126,18 +581,110 @@ class PdfDocument(Document):
         self.location['row'] = 0
         self.location['page'] = self.location['page'] + 1
 
+    def page_entry(self, page):
+        """ (state, row) a page break into page leaves the document in, None if there is no such page
+
+        PageBoundary skips the running headers unless it is the last page
+        """
+        try:
+            self.document[page]
+        except IndexError:
+            return None
+        try:
+            self.document[page + 1]
+        except IndexError:
+            return self.grammar.page_boundary.name, 0
+        return self.grammar.page_boundary.name, self.header_rows
+
+    def checkpoint(self):
+        """ remember the location, records and accumulated lists to roll back to, taken after every page break """
+        self._checkpoint = Checkpoint(
+            self.state, self.previous_state, dict(self.location), len(self.records), self.consumed,
+            {identifier: {name: len(getattr(local, name)) for name in self.grammar[identifier].accumulates
+                          if hasattr(local, name)}
+             for identifier, local in self.locals.items()})
+
+    def recover(self, error, rollback=False):
+        """ enter the page after the one that failed as a page break would
+
+        the rest of the failed page is skipped. with rollback the records
+        and accumulates lists it added before the failure are dropped too,
+        back to the checkpoint its page break took, since the first rows of a
+        page can be read wrong without failing. the other locals, the account
+        and activity header, are kept as the failed page left them so the
+        lines after it are recorded under them. the error, the state and
+        location it happened at and what was dropped are appended to errors.
+        False if the failed page was the last
+        """
+        checkpoint = self._checkpoint
+        failed = {'page': self.location['page'], 'row': self.location['row'], 'state': self.state}
+        dropped = 0
+        page = failed['page'] + 1
+        if rollback:
+            dropped = len(self.records) - checkpoint.records
+            del self.records[checkpoint.records:]
+            self.consumed = checkpoint.consumed
+            for identifier, local in self.locals.items():
+                saved = checkpoint.locals.get(identifier, {})
+                for name in self.grammar[identifier].accumulates:
+                    if hasattr(local, name):
+                        del getattr(local, name)[saved.get(name, 0):]
+            page = checkpoint.location['page'] + 1
+
+        entry = self.page_entry(page)
+        self.errors.append({
+            **failed,
+            'error': repr(error),
+            'traceback': ''.join(traceback.format_exception(type(error), error, error.__traceback__)),
+            'rolled_back': rollback,
+            'dropped_records': dropped,
+            'resumed_page': None if entry is None else page,
+            })
+        log.warning(f"run: {error!r} in {failed['state']} at page {failed['page']} row {failed['row']}"
+                    f"{f', dropped {dropped} records' if rollback else ''}"
+                    f"{'' if entry is None else f', resuming at page {page}'}")
+        if entry is None:
+            return False
+        self.state = self.previous_state = entry[0]
+        self.location = {'page': page, 'row': entry[1], 'col': 0}
+        self.checkpoint()
+        return True
+
 
 
+@parser('becu')
 class Becu(PdfDocument):
-    def __init__(self, document):
-        super().__init__(document)
+    signature = re.compile(r"\bBECU\b|becu\.org", flags=re.IGNORECASE)
+    # continuation pages repeat the organisation and statement period, in the top 6% of
+    # synthetic.py's layout. no columns, whole lines like the activity rows are single
+    # cells that fixed columns would split
+    profile = Profile(rest={'area': [6.0, 0, 100, 100]}, header_rows=2)
+    _grammars = {}
 
-        self.bank = Bank(tag="BECU", document=self)
+    @classmethod
+    def compile(cls, diagram=False):
+        """ the BecuGrammar every Becu document shares, built on first use
+
+        diagram=True is a separate grammar on a GraphMachine, for drawing
+        """
+        if diagram not in cls._grammars:
+            cls._grammars[diagram] = BecuGrammar(diagram=diagram)
+        return cls._grammars[diagram]
+
+    def __init__(self, document, grammar=None, cropped=False):
+        super().__init__(document, grammar or self.compile(), cropped=cropped)
+
+
+class BecuGrammar(Grammar):
+    def __init__(self, diagram=False):
+        super().__init__(diagram=diagram)
+
+        self.bank = Bank(tag="BECU", grammar=self)
         self.add_node(self.bank)
 
         self.page_boundary = PageBoundary(
             section_regex="page [0-9]+ of [0-9]+",
-            document=self)
+            grammar=self)
         self.machine.add_state(self.page_boundary)
 
         initial = self.section_initial(self.bank)
@@ -155,8 +702,7 @@ class Becu(PdfDocument):
         last = self.section_summary(
             section_transitions,
             regex="Summary of Loan",
-            tag="summary_loan_account",
-            fee_section=False
+            tag="summary_loan_account"
             )
         section_transitions.append(last)
 
@@ -180,13 +726,14 @@ class Becu(PdfDocument):
             section_transitions)
 
     def section_initial(self, node):
-        section = Section(tag="initial", document=self)
+        section = Section(tag="initial", grammar=self)
         self.add_node(section, parent=self.bank)
         self.machine.add_transition(
                 "from_" + self.bank.name + "_to_" + section.name,
                 node, section)
 
-        contents = [Address(document=self), StatementPeriod(document=self)]
+        self.statement_period = StatementPeriod(grammar=self)
+        contents = [Address(grammar=self), self.statement_period]
         for item in contents:
             self.add_node(item, parent=section)
 
@@ -201,9 +748,6 @@ class Becu(PdfDocument):
 
         return last
 
-    def page_boundary(self):
-        pass
-
     def add_incomming_transitions(self, incomming, target):
         for last in incomming:
             self.add_optional_transition(last.tag, last, target)
@@ -224,30 +768,32 @@ class Becu(PdfDocument):
                         ])
 
     def section_summary(self, incomming, regex, tag, fee_section=True):
-        summary = OptionalSection(section_regex=regex, tag=tag, document=self)
+        summary = OptionalSection(section_regex=regex, tag=tag, grammar=self)
         self.add_node(summary, parent=self.bank)
 
         self.add_incomming_transitions(incomming, summary)
 
-        block_header = self.add_node(BlockHeader(tag="BlockHeader/Acc", lines=2, document=self),
+        block_header = self.add_node(BlockHeader(tag="BlockHeader/Acc", lines=2, grammar=self),
                              parent=summary)
         self.machine.add_transition(summary.tag, summary, block_header)
 
         last = self.add_node(
             AccountsSummaryLine(
                 section_regex="checking|savings",
-                document=self),
+                grammar=self),
             parent=summary)
         self.machine.add_transition(block_header.tag, block_header, last)
         self.add_optional_transition("self_" + last.tag, last, last)
+        # a long account list goes on after the page break
+        self.add_outgoing_transitions('pagebreak', self.page_boundary, [last])
 
         if fee_section:
-            node = self.add_node(BlockHeader(tag="BlockHeader/Fee", lines=1, document=self), parent=summary)
+            node = self.add_node(BlockHeader(tag="BlockHeader/Fee", lines=1, grammar=self), parent=summary)
             self.machine.add_transition(last.tag, last, node)
             last = self.add_node(
                 FeesSummary(
                     section_regex="fees",
-                    document=self),
+                    grammar=self),
                 parent=summary)
             self.machine.add_transition(node.tag, node, last)
             self.add_optional_transition("self_" + last.tag, last, last)
@@ -255,7 +801,7 @@ class Becu(PdfDocument):
         return last
 
     def section_detail(self, incomming, regex, tag):
-        detail = OptionalSection(section_regex=regex, tag=tag, document=self)
+        detail = OptionalSection(section_regex=regex, tag=tag, grammar=self)
         self.add_node(detail, parent=self.bank)
 
         self.add_incomming_transitions(incomming, detail)
@@ -264,14 +810,14 @@ class Becu(PdfDocument):
         account = self.add_node(
             AccountDetailHeader(
                 section_regex="checking|savings",
-                document=self),
+                grammar=self),
             parent=detail)
         self.add_optional_transition(f"{tag}:{detail.tag}", detail, account)
 
         # not duplicated on page break
         yield_ = self.add_node(
             AccountDetailYield(
-                document=self,
+                grammar=self,
                 section_regex="yield"),
             parent=account)
         self.add_optional_transition(f"{tag}:{account.tag}", account, yield_)
@@ -279,8 +825,8 @@ class Becu(PdfDocument):
         # duplicated on page break
         header = self.add_node(
             AccountActivityHeader(
-                section_regex="desposits|withdrawals|checks",
-                document=self),
+                section_regex="des?posits|withdrawals|checks",
+                grammar=self),
             parent=account)
 
         self.add_optional_transition(f"pagebreak:{tag}:{detail.tag}_TO_{header.tag}",
@@ -296,7 +842,7 @@ class Becu(PdfDocument):
         line = self.add_node(
             AccountActivityLine(
                 section_regex="[0-9]{2}/[0-9]{2}",
-                document=self),
+                grammar=self),
             parent=header)
         self.add_optional_transition(f"{tag}:{header.tag}", header, line)
         self.add_optional_transition("self_" + line.tag, line, line)
@@ -322,11 +868,20 @@ class Becu(PdfDocument):
 
 
 class NodeState(State, Node):
-    def __init__(self, *args, document, **kwargs):
+    # which field of the Context of the node and its descendants this node is
+    role = None
+    # tag of the section the node is in, its own for a section, see Grammar.add_node
+    scope = None
+    # attributes of the node's local that are lists appended to on every entry rather than set
+    accumulates = ()
+
+    def __init__(self, *args, grammar, **kwargs):
         if 'tag' not in kwargs:
             kwargs['tag'] = self.__class__.__name__
+        if 'identifier' not in kwargs:
+            kwargs['identifier'] = grammar.identifier(kwargs['tag'])
         name = kwargs.get('name', kwargs['tag'])
-        self.document = document
+        self.grammar = grammar
         # node consumes data
         Node.__init__(self, *args, **kwargs)
         State.__init__(
@@ -338,33 +893,37 @@ class NodeState(State, Node):
             )
         self.data = self
 
+    def qualify(self, scope):
+        """ name the state <scope>:<tag>, before it is added to the machine """
+        self._name = f"{scope}:{self.tag}"
+
+    def new_local(self):
+        """ fresh per document state for this node, see Document.local """
+        return SimpleNamespace()
+
     def enter(self, event_data):
         """ Call on_enter method on state object """
         log.debug("%s.enter '%s' callback.", self.__class__.__name__, self.tag)
+        profiler = event_data.model.profiler
+        if profiler is not None:
+            start, consumed = time.perf_counter(), event_data.model.consumed
         if hasattr(self, 'on_enter_state') and callable(self.on_enter_state):
-            try:
-                self.on_enter_state(event_data)
-            except:
-                traceback.print_exc()
-                pdb.post_mortem()
-                raise
+            self.on_enter_state(event_data)
         State.enter(self, event_data)
+        if profiler is not None:
+            profiler.enter(self.name, time.perf_counter() - start, event_data.model.consumed - consumed)
 
     def exit(self, event_data):
         """ Call on_exit method on state object """
         log.debug("%s.exit '%s' callback.", self.__class__.__name__, self.tag)
+        profiler = event_data.model.profiler
+        if profiler is not None:
+            start = time.perf_counter()
         if hasattr(self, 'on_exit_state') and callable(self.on_exit_state):
-            try:
-                self.on_exit_state(event_data)
-            except:
-                traceback.print_exc()
-                pdb.post_mortem()
-                raise
+            self.on_exit_state(event_data)
         State.exit(self, event_data)
-
-    @property
-    def ledger_str(self):
-        return ""
+        if profiler is not None:
+            profiler.exit(self.name, time.perf_counter() - start)
 
 
 class TerminalState(NodeState):
@@ -381,14 +940,16 @@ class Section(NodeState):
         super().__init__(*args, **kwargs)
 
     def ready(self, row):
-        log.debug(f"{self.__class__.__name__}[{self.name}] is ready")
+        log.debug("%s[%s] is ready", self.__class__.__name__, self.name)
         return True
 
     def done(self, event_data):
-        log.debug(f"{self.__class__.__name__}[{self.name}] is done")
+        log.debug("%s[%s] is done", self.__class__.__name__, self.name)
         return True
 
     def log_row(row):
+        if not log.isEnabledFor(logging.DEBUG):
+            return
         log.debug((["{:06.2f} {:06.2f}".format(col['left'], col['width']) for col in row]))
         log.debug((["{: >13.13}".format(col['text']) for col in row]))
 
@@ -399,11 +960,11 @@ class RegexMatchingSection(Section):
 
     def ready(self, row):
         search = None
-        for col in row:
-            search = self.regex.search(col['text'])
+        for text in texts(row):
+            search = self.regex.search(text)
             if search:
                 break
-        log.debug(f"{self.__class__.__name__}[{self.name}]\t\tready:{search} {self.regex.pattern}")
+        log.debug("%s[%s]\t\tready:%s %s", self.__class__.__name__, self.name, search, self.regex.pattern)
         return search != None
 
 class OptionalSection(RegexMatchingSection):
@@ -411,82 +972,89 @@ class OptionalSection(RegexMatchingSection):
         super().__init__(*args, **kwargs)
 
     def on_enter_state(self, event_data):
-        print(self.document.consume_row()[0]['text'])
+        row = event_data.model.consume_row()
+        log.debug("section %s", texts(row)[0])
 
 class Address(Section):
+    accumulates = ('address',)
+
     def __init__(self, *args, **kwargs):
-        log.debug(f"{self.__class__.__name__} {args} {kwargs}")
+        log.debug("%s %s %s", self.__class__.__name__, args, kwargs)
         super().__init__(*args, **kwargs)
-        self.orgnization = ""
-        self.address = []
+
+    def new_local(self):
+        return SimpleNamespace(orgnization="", num_after_org="", address=[])
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
-        self.orgnization = row[0]['text']
-        self.num_after_org = ' '.join([col['text']
-                                       for col in row[1:]
-                                       if col['text']])
-
-        row = self.document.consume_row()
-        self.address.append(' '.join([col['text']
-                                    for col in row
-                                    if col['text']]))
-        row = self.document.consume_row()
-        self.address.append(' '.join([col['text']
-                                      for col in row
-                                      if col['text']]))
-        print(f"org {self.orgnization} adr {self.address}")
+        document = event_data.model
+        local = document.local(self)
+        row = texts(document.consume_row())
+        local.orgnization = row[0]
+        local.num_after_org = ' '.join([text
+                                        for text in row[1:]
+                                        if text])
+
+        row = texts(document.consume_row())
+        local.address.append(' '.join([text
+                                     for text in row
+                                     if text]))
+        row = texts(document.consume_row())
+        local.address.append(' '.join([text
+                                       for text in row
+                                       if text]))
+        log.debug("org %s adr %s", local.orgnization, local.address)
 
 class StatementPeriod(Section):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def new_local(self):
+        return SimpleNamespace(start_date=None, stop_date=None)
+
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
-        dates = row[0]['text'].split(':')[1]
+        document = event_data.model
+        local = document.local(self)
+        row = document.consume_row()
+        dates = texts(row)[0].split(':')[1]
         start_date_string, stop_date_string = dates.split('-')
-        self.start_date = start_date_string
-        self.stop_date = stop_date_string
-        print(f"dates {self.start_date} {self.stop_date}")
+        local.start_date = start_date_string
+        local.stop_date = stop_date_string
+        log.debug("dates %s %s", local.start_date, local.stop_date)
 
 class BlockHeader(Section):
+    accumulates = ('headers',)
+
     def __init__(self, *args, lines=1, **kwargs):
         self.lines = lines
         super().__init__(*args, **kwargs)
-        self.headers = []
+
+    def new_local(self):
+        return SimpleNamespace(headers=[])
 
     def on_enter_state(self, event_data):
-        headers = [self.document.consume_row() for _ in range(self.lines)]
+        document = event_data.model
+        local = document.local(self)
+        headers = [document.consume_row() for _ in range(self.lines)]
         for header in headers:
             Section.log_row(header)
 
         if len(headers) > 1:
-            top = [col['text'] for col in headers[0]]
-            bot = [col['text'] for col in headers[1]]
-            self.headers.append(bot[0])
-
-            split_top = top[1].split(' ')
-            split_bot = bot[1].split(' ')
-
-            self.headers.append(' '.join([split_top[0], split_bot[0]]))
-            self.headers.append(' '.join([split_top[1], split_bot[1]]))
-            self.headers.append(bot[2])
-            self.headers.append(' '.join([top[4], bot[4]]))
-            self.headers.append(' '.join([top[5], bot[5]]))
-
+            # extractors merge neighbouring cells differently, where the words are says which column they name
+            local.headers.extend(header_columns(headers[0], headers[1]))
 
-
-        print(self.headers)
+        log.debug("headers %s", local.headers)
 
 class AccountsSummaryLine(RegexMatchingSection):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.lines = []
+
+    def new_local(self):
+        return SimpleNamespace(lines=[])
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        row = event_data.model.consume_row()
         Section.log_row(row)
-        row = [r['text'] for r in row]
+        row = texts(row)
         line = []
         line.append(row[0])
         for r in row[1:]:
@@ -494,105 +1062,93 @@ class AccountsSummaryLine(RegexMatchingSection):
                 line.extend(r.split(' '))
             else:
                 line.append(r)
-        print(line)
+        log.debug("summary %s", line)
 
 class FeesSummary(RegexMatchingSection):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        row = event_data.model.consume_row()
         Section.log_row(row)
 
 class AccountDetailHeader(RegexMatchingSection):
+    role = 'account'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.account = ''
+
+    def new_local(self):
+        return SimpleNamespace(account='')
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        local = event_data.model.local(self)
+        row = event_data.model.consume_row()
         Section.log_row(row)
-        self.account = row[0]['text']
-        print(self.account)
+        local.account = texts(row)[0]
+        log.debug("account %s", local.account)
 
 class AccountDetailYield(RegexMatchingSection):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        document = event_data.model
+        row = document.consume_row()
         Section.log_row(row)
-        row = self.document.consume_row()
+        row = document.consume_row()
         Section.log_row(row)
-        row = self.document.consume_row()
+        row = document.consume_row()
         Section.log_row(row)
 
 class AccountActivityHeader(RegexMatchingSection):
+    role = 'header'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.withdrawlOrDeposit = ''
-        self.headers = []
+
+    def new_local(self):
+        return SimpleNamespace(withdrawlOrDeposit='', headers=[])
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        document = event_data.model
+        local = document.local(self)
+        row = document.consume_row()
         Section.log_row(row)
-        self.withdrawlOrDeposit = row[0]['text']
-        row = self.document.consume_row()
+        local.withdrawlOrDeposit = texts(row)[0]
+        row = document.consume_row()
         Section.log_row(row)
-        self.headers = row[0]['text'].split(' ')
-        self.headers = [*self.headers[0:2], ' '.join(self.headers[2:])]
-        print(self.withdrawlOrDeposit)
-        print(self.headers)
+        local.headers = texts(row)[0].split(' ')
+        local.headers = [*local.headers[0:2], ' '.join(local.headers[2:])]
+        log.debug("%s %s", local.withdrawlOrDeposit, local.headers)
 
 class AccountActivityLine(RegexMatchingSection):
+    accumulates = ('lines',)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.lines = []
+
+    def new_local(self):
+        return SimpleNamespace(lines=[])
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        document = event_data.model
+        row = document.consume_row()
         Section.log_row(row)
-        row = [r['text'] for r in row if r['text']]
+        row = [text for text in texts(row) if text]
         line = row[0].split(' ')
         line.extend(row[1:])
         line = [*line[0:2], ' '.join(line[2:])]
 
-        row = self.document.row()
-        if "Machine" in row[0]['text']:
-            self.document.consume_row()
-            line.extend([r['text'] for r in row if r['text']])
+        row = texts(document.row())
+        if "Machine" in row[0]:
+            document.consume_row()
+            line.extend([text for text in row if text])
             log.debug("continued on next line")
-        print(line)
-        self.lines.append(line)
-
-    @property
-    def ledger_str(self):
-        parent = self.document.parent(self.identifier)
-        pparent = self.document.parent(parent.identifier)
-        ppparent = self.document.parent(pparent.identifier)
-        print(str(ppparent) + ' -> ' + str(pparent) + ' -> ' +
-            str(parent)  + ' -> ' + str(self))
-
-        print(ppparent.tag)
-        print(pparent.account)
-        print(parent.headers)
-        print(parent.withdrawlOrDeposit)
-        for line in self.lines:
-            self.ledger_line_str(line)
-
-    def currency_to_float(self, currency):
-        return float(re.sub(
-            '[(]', '-',
-            re.sub('[,)]', '', currency)))
-
-
-    def ledger_line_str(self, line):
-        date = dateutil.parser.parse(line[0]).strftime("%Y-%m-%d")
-        amount = self.currency_to_float(line[1])
-        description = ' '.join(line[2:])
-        print(f"{date}\t{description}\n"
-              f"\tSomething\t{amount}")
-
+        log.debug("line %s", line)
+        document.local(self).lines.append(line)
+        context = self.context
+        document.record(document.value(context.account, 'account'), document.value(context.header, 'withdrawlOrDeposit'), line)
 
 
 class PageBoundary(RegexMatchingSection):
@@ -600,50 +1156,800 @@ class PageBoundary(RegexMatchingSection):
         super().__init__(*args, **kwargs)
 
     def on_enter_state(self, event_data):
-        row = self.document.consume_row()
+        document = event_data.model
+        row = document.consume_row()
         Section.log_row(row)
-        self.document.consume_page()
-        if not self.document.last_page():
-            row = self.document.consume_row()
-            Section.log_row(row)
-            row = self.document.consume_row()
-            Section.log_row(row)
-
-
-
-
-def process(pdf='/Volumes/2019 Google Drive/Google Drive/foolscap/archive/Financial Accounts/BECU/2020/becu  2020-01-01 2020-01-31 littlecatz Estatement.pdf'):
-    pdf_json = tabula.read_pdf(pdf, pages='all', output_format='json', multiple_tables=True, relative_area=True, area=[0,0,100,100], lattice=False, stream=True)
+        document.consume_page()
+        if not document.last_page():
+            for _ in range(document.header_rows):
+                row = document.consume_row()
+                Section.log_row(row)
+        document.checkpoint()
+
+
+
+
+def extract(pdf, backend='tabula', cache=None, window=None, columnar=True, first=None, rest=None):
+    """ the pdf's pages, as a list or, given a window, a PageStream extracting window pages at a time
+
+    pages are ingested into ColumnarPage unless columnar=False. first is the
+    already extracted first page, the rest are then extracted from page 2
+    with the tabula options in rest, usually a parser's Profile.rest
+    """
+    if first is None:
+        source = extractor(backend, cache=cache)
+        if window:
+            pages = source.pages(pdf, window=window)
+            return PageStream(ingest_pages(pages) if columnar else pages)
+        pdf_json = source.extract(pdf)
+        return ingest(pdf_json) if columnar else pdf_json
+
+    source = extractor(backend, cache=cache, **(rest or {}))
+    if window:
+        pages = itertools.chain([first], source.pages(pdf, window=window, start=2))
+        return PageStream(ingest_pages(pages) if columnar else pages)
+    for _, pdf_json in source.extract_many([pdf], start=2):
+        if isinstance(pdf_json, Exception):
+            raise pdf_json
+        pdf_json = [first, *pdf_json]
+        return ingest(pdf_json) if columnar else pdf_json
+
+
+def first_page(pdf, backend='tabula', cache=None):
+    """ only the first page of pdf, None if it has no text """
+    for _, page in extractor(backend, cache=cache).first_pages([pdf]):
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def store_pages(pdf, store, backend='tabula', cache=None, window=None, parser=None, crop=False):
+    """ a PageStore of pdf's pages in the file store, extracted into it unless it already holds them
+
+    the store's meta records the pdf's digest, the parser that classified
+    it and whether the pages after the first were cropped to its Profile,
+    which crop=True asks for. with a window the pages go to the file as
+    they are extracted, a whole document is never in memory
+    """
+    from pydfminer.cache import file_digest
+    from pydfminer.pagestore import PageStore, write
+
+    digest = file_digest(pdf)
+    if os.path.exists(store):
+        pages = PageStore(store)
+        if (pages.meta.get('digest') == digest and parser in (None, pages.meta.get('parser'))
+                and (crop or not pages.meta.get('cropped'))):
+            return pages
+        pages.close()
+    first = None
+    if parser is None:
+        first = first_page(pdf, backend=backend, cache=cache)
+        parser = classify(first)
+        if parser is None:
+            raise Unclassified(pdf)
+    rest = PARSERS[parser].profile.options(crop)
+    pdf_json = extract(pdf, backend=backend, cache=cache, window=window, columnar=False, first=first, rest=rest)
+    count = write(store, pdf_json, meta={'pdf': pdf, 'digest': digest, 'parser': parser,
+                                         'cropped': first is not None and bool(rest)})
+    log.info(f"store_pages: {count} pages of {pdf} in {store}")
+    return PageStore(store)
+
+
+def page_total(pdf_json):
+    if isinstance(pdf_json, PageStream):
+        return pdf_json.count
+    return len(pdf_json)
+
+def process(pdf='/Volumes/2019 Google Drive/Google Drive/foolscap/archive/Financial Accounts/BECU/2020/becu  2020-01-01 2020-01-31 littlecatz Estatement.pdf', cache=None, dispatch=False, diagram=False, window=None, output=None, format=None, parser=None, profile=None, store=None, workers=None, backend='tabula', errors='raise', crop=False):
+    """ parse one statement and print its ledger, or write it to output
+
+    diagram=True also prints the grammar tree and writes tree.graphviz and
+    state_diagram.png, window streams the pdf that many pages at a time.
+    format is one of ledger.SINKS, taken from output's extension if not given.
+    parser is a name in PARSERS, by default the first page is classified
+    and the rest of the pdf extracted from page 2, cropped to the parser's
+    Profile with crop=True.
+    profile='count' or 'seconds' runs with a StateProfiler, printing its
+    table to stderr and writing state_profile.json and state_profile.png,
+    the state diagram with transitions weighted by their count or time.
+    store is a page store file the pages are extracted into and parsed
+    from, see store_pages. workers parses the pages in that many processes
+    from store, a temporary one if not given, see parse_pages. backend is
+    one of extract.EXTRACTORS, 'pdfminer' needs no java. errors='skip' or
+    'rollback' carries on past pages that fail to parse, see Document.run
+    """
+    if workers and profile:
+        raise ValueError("profile needs a sequential run, leave workers unset")
+    if workers and store is None:
+        import tempfile
+
+        with tempfile.TemporaryDirectory(prefix='pydfminer-') as scratch:
+            return process(pdf, cache=cache, dispatch=dispatch, diagram=diagram, window=window, output=output,
+                           format=format, parser=parser, store=os.path.join(scratch, 'statement.pages'),
+                           workers=workers, backend=backend, errors=errors, crop=crop)
+    if store is not None:
+        pdf_json = store_pages(pdf, store, backend=backend, cache=cache, window=window, parser=parser, crop=crop)
+        parser, cropped = pdf_json.meta['parser'], pdf_json.meta['cropped']
+    else:
+        first = None
+        if parser is None:
+            start = time.perf_counter()
+            first = first_page(pdf, backend=backend, cache=cache)
+            parser = classify(first)
+            log.info(f"process: classified {pdf} as {parser} in {time.perf_counter() - start:.3f}s")
+            if parser is None:
+                raise Unclassified(pdf)
+        rest = PARSERS[parser].profile.options(crop)
+        pdf_json = extract(pdf, backend=backend, cache=cache, window=window, first=first, rest=rest)
+        cropped = first is not None and bool(rest)
+    cls = PARSERS[parser]
     #print(json.dumps(pdf_json, indent=2))
 
-    doc = Becu(pdf_json)
-    log.debug(doc.machine.states.keys())
-    log.debug(doc.machine.get_transitions())
-    doc.show(line_type="ascii-em", reverse=False, idhidden=False, key=False)
-    doc.to_graphviz(filename="tree.graphviz")
-    doc.machine.get_graph().draw('state_diagram.png', prog='dot')
-
-    doc.run()
-
-    doc.show(data_property="ledger_str", reverse=False, idhidden=False, key=False)
+    doc = cls(pdf_json, cls.compile(diagram=diagram), cropped=cropped)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(doc.machine.states.keys())
+        log.debug(doc.machine.get_transitions())
+    if diagram:
+        doc.grammar.show(line_type="ascii-em", reverse=False, idhidden=False, key=False)
+        doc.grammar.to_graphviz(filename="tree.graphviz")
+        doc.get_graph().draw('state_diagram.png', prog='dot')
+
+    profiler = None
+    if profile:
+        from pydfminer.profiler import StateProfiler
+        profiler = StateProfiler()
+
+    if workers:
+        pdf_json.close()
+        doc = parse_pages(store, parser, workers=workers, cropped=cropped, dispatch=dispatch, errors=errors)
+    else:
+        doc.run(dispatch=dispatch, profiler=profiler, errors=errors)
+
+    if profiler is not None:
+        from pydfminer.profiler import annotate
+        print(profiler.table(), file=sys.stderr)
+        with open('state_profile.json', 'w') as f:
+            json.dump(profiler.summary(), f, indent=1)
+        # from a document that has not run, doc's graph would highlight where it stopped
+        graph = cls([], cls.compile(diagram=True)).get_graph()
+        annotate(graph, profiler, weight=profile).draw('state_profile.png', prog='dot')
+
+    doc.ledger(output, format=format)
     #pprint(doc.state)
     #doc.show(line_type="ascii-em", reverse=False, idhidden=False, key=False)
 
 
+def parse_document(pdf, parser, pdf_json, cropped=False, dispatch=False, errors='skip'):
+    """ parse one extracted pdf with PARSERS[parser], as plain data
+
+    a page that fails to parse is skipped and listed in 'page_errors', see Document.run
+    """
+    from pydfminer import ledger
+
+    if not isinstance(pdf_json, PageStream):
+        pdf_json = ingest(pdf_json)
+    doc = PARSERS[parser](pdf_json, cropped=cropped)
+    doc.run(dispatch=dispatch, errors=errors)
+    lines = [line for _, _, line in doc.records]
+    return {
+        'pdf': pdf,
+        'parser': parser,
+        'pages': page_total(pdf_json),
+        'state': doc.state,
+        'lines': lines,
+        'transactions': ledger.to_dicts(doc.frame()),
+        'page_errors': doc.errors,
+        }
+
+
+def _parse_span(doc, start, stop, dispatch=False, entry=None, errors='raise'):
+    """ run doc over pages start:stop from entry, (state, row) on page start, and return what it found as plain data
+
+    without an entry it starts where the page break before start would have
+    left it, partial so the locals it has not set itself are Carried
+    """
+    if start:
+        if entry is None:
+            entry = doc.page_entry(start)
+            doc.partial = True
+        doc.state, doc.location['row'] = entry
+        doc.location['page'] = start
+    if stop < page_total(doc.document):
+        doc.stop = (stop, doc.page_entry(stop)[1])
+    doc.run(dispatch=dispatch, errors=errors)
+    return {
+        'start': start,
+        'stop': stop,
+        'partial': doc.partial,
+        'state': doc.state,
+        'previous_state': doc.previous_state,
+        'location': dict(doc.location),
+        # ran into the next span rather than ending the document
+        'stopped': doc.stopped,
+        'locals': doc.locals,
+        'records': doc.records,
+        'consumed': doc.consumed,
+        'errors': doc.errors,
+        }
+
+
+def _parse_pages(path, parser, start, stop, cropped, dispatch, errors):
+    from pydfminer.pagestore import PageStore
+
+    with PageStore(path) as store:
+        return _parse_span(PARSERS[parser](store, cropped=cropped), start, stop, dispatch=dispatch, errors=errors)
+
+
+def parse_pages(path, parser, workers=None, span=None, cropped=False, dispatch=False, errors='raise'):
+    """ parse the PageStore at path with PARSERS[parser], spans of pages at once in a process pool
+
+    every span but the first is parsed as if the page before it ended in the
+    grammar's page_boundary state, whose entry consumed that page's footer
+    and this one's running header rows; the only way the grammars cross a
+    page. stitching then walks the spans in order: a span whose guessed
+    entry is not where the span before it actually stopped is parsed again
+    from there, in this process, with the real locals. values recorded from
+    locals the span had not set itself come back Carried and are resolved
+    against the locals the spans before it left.
+
+    returns the document, its records, locals, state, location and errors
+    as a sequential run() would have left them. span is the pages per task,
+    an even share per worker by default
+    """
+    import copy
+    from concurrent.futures import ProcessPoolExecutor
+
+    from pydfminer.pagestore import PageStore
+
+    cls = PARSERS[parser]
+    workers = workers or os.cpu_count() or 1
+    store = PageStore(path)
+    doc = cls(store, cropped=cropped)
+    pages = len(store)
+    span = span or max(-(-pages // workers), 1)
+    bounds = [(start, min(start + span, pages)) for start in range(0, pages, span)] or [(0, 0)]
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_parse_pages, path, parser, start, stop, cropped, dispatch, errors)
+                   for start, stop in bounds]
+        spans = [future.result() for future in futures]
+    parsed = time.perf_counter() - start_time
+
+    locals_ = {}
+    records = []
+    errors_ = []
+    reparsed = 0
+    consumed = 0
+    handoff = None
+
+    def resolve(value):
+        if not isinstance(value, Carried):
+            return value
+        local = locals_.get(value.node)
+        return getattr(local if local is not None else doc.grammar[value.node].new_local(), value.name)
+
+    for span_ in spans:
+        if handoff is not None:
+            if not handoff['stopped']:
+                # the document ended in the span before
+                break
+            entry = (handoff['state'], handoff['location']['row'])
+            if entry != doc.page_entry(span_['start']):
+                log.info(f"parse_pages: {span_['start']}:{span_['stop']} starts in {entry}, parsing it again")
+                again = cls(store, doc.grammar, cropped=cropped)
+                again.locals = copy.deepcopy(locals_)
+                span_ = _parse_span(again, span_['start'], span_['stop'], dispatch=dispatch, entry=entry,
+                                    errors=errors)
+                reparsed += 1
+
+        records.extend((resolve(account), resolve(header), line) for account, header, line in span_['records'])
+        errors_.extend(span_['errors'])
+        if span_['partial']:
+            for identifier, local in span_['locals'].items():
+                if identifier not in locals_:
+                    locals_[identifier] = local
+                    continue
+                accumulates = doc.grammar[identifier].accumulates
+                for name, value in vars(local).items():
+                    if name in accumulates:
+                        getattr(locals_[identifier], name).extend(value)
+                    else:
+                        setattr(locals_[identifier], name, value)
+        else:
+            locals_ = span_['locals']
+        consumed += span_['consumed']
+        handoff = span_
+
+    doc.locals = locals_
+    doc.records = records
+    doc.errors = errors_
+    doc.consumed = consumed
+    doc.state = handoff['state']
+    doc.previous_state = handoff['previous_state']
+    doc.location = handoff['location']
+    log.info(f"parse_pages: {pages} pages in {len(bounds)} spans, {parsed:.3f}s parsing, "
+             f"{time.perf_counter() - start_time - parsed:.3f}s stitching, {reparsed} parsed again")
+    return doc
+
+
+def _error(pdf, e, **fields):
+    return {
+        'pdf': pdf,
+        'error': repr(e),
+        'traceback': ''.join(traceback.format_exception(type(e), e, e.__traceback__)),
+        **fields,
+        }
+
+
+def process_batch(pdfs, backend='tabula', cache=None, dispatch=False, window=None, parser=None, errors='skip', crop=False):
+    """ extract and parse pdfs, returning plain data so it can cross a process boundary
+
+    a pdf that fails to extract or parse gets an 'error' entry instead of stopping the batch,
+    with errors='skip' one that fails on some of its pages skips those, see parse_document.
+    unless parser names one of PARSERS, only the first page of every pdf is
+    extracted to pick its parser and pdfs no parser recognises stop there,
+    the others are extracted from page 2, cropped to their parser's Profile
+    with crop=True. classify_seconds is each pdf's share of that, seconds the rest
+    """
+    pdfs = list(pdfs)
+    results = []
+    source = extractor(backend, cache=cache)
+    routes = {}
+    firsts = {}
+    share = 0.0
+    if parser is None:
+        start = time.perf_counter()
+        for pdf, page in source.first_pages(pdfs):
+            if isinstance(page, Exception):
+                results.append(_error(pdf, page, parser=None))
+                continue
+            routes[pdf] = classify(page)
+            if routes[pdf] is None:
+                error = Unclassified(pdf)
+                results.append(_error(pdf, error, parser=None, unclassified=True))
+                del routes[pdf]
+            else:
+                firsts[pdf] = page
+        share = (time.perf_counter() - start) / len(pdfs) if pdfs else 0.0
+        for result in results:
+            result.update(classify_seconds=share, seconds=0.0)
+    else:
+        routes = dict.fromkeys(pdfs, parser)
+
+    routed = [pdf for pdf in pdfs if pdf in routes]
+    cached = set()
+
+    def documents():
+        if window:
+            for pdf in routed:
+                yield pdf, extract(pdf, backend=backend, cache=cache, window=window,
+                                   first=firsts.get(pdf), rest=PARSERS[routes[pdf]].profile.options(crop))
+        elif not firsts:
+            yield from source.extract_many(routed)
+            cached.update(getattr(source, 'cached', ()))
+        else:
+            # one extraction per parser, every pdf in it shares the parser's profile
+            for name, cls in PARSERS.items():
+                group = [pdf for pdf in routed if routes[pdf] == name]
+                if not group:
+                    continue
+                rest = extractor(backend, cache=cache, **cls.profile.options(crop))
+                for pdf, pdf_json in rest.extract_many(group, start=2):
+                    if not isinstance(pdf_json, Exception):
+                        pdf_json = [firsts[pdf], *pdf_json]
+                    if pdf in getattr(rest, 'cached', ()):
+                        cached.add(pdf)
+                    yield pdf, pdf_json
+
+    start = time.perf_counter()
+    for pdf, pdf_json in documents():
+        try:
+            if isinstance(pdf_json, Exception):
+                raise pdf_json
+            cropped = pdf in firsts and bool(PARSERS[routes[pdf]].profile.options(crop))
+            result = parse_document(pdf, routes[pdf], pdf_json, cropped=cropped, dispatch=dispatch, errors=errors)
+            result.update({
+                'cached': pdf in cached or pdf in getattr(source, 'cached', ()),
+                'classify_seconds': share,
+                'seconds': time.perf_counter() - start,
+                })
+            results.append(result)
+        except Exception as e:
+            results.append(_error(pdf, e, parser=routes[pdf], classify_seconds=share,
+                                  seconds=time.perf_counter() - start))
+        start = time.perf_counter()
+    return results
+
+
+def process_one(pdf, backend='tabula', cache=None, dispatch=False, window=None, parser=None, crop=False):
+    return process_batch([pdf], backend=backend, cache=cache, dispatch=dispatch, window=window, parser=parser,
+                         crop=crop)[0]
+
+
+def process_many(paths, workers=None, backend='tabula', cache=None, dispatch=False, window=None, on_result=None, parser=None, crop=False):
+    """ run process_batch over paths in a process pool, one bad pdf does not stop the batch
+
+    with backend='batch' each worker gets one share of the paths and extracts
+    it with a single java process, otherwise every pdf is its own task.
+    cache is a directory of extracted json shared by the workers, window
+    streams each pdf that many pages at a time. on_result is called with
+    every result, failed or not, as soon as its worker returns it. parser
+    skips classification and crop crops, see process_batch.
+
+    a worker that dies, killed for memory say, breaks the pool and fails
+    every unfinished share, whichever worker ran them. their pdfs are tried
+    again one at a time, each in a pool of its own, and only a pdf that
+    breaks its own pool is recorded as an error
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
+
+    if isinstance(paths, str):
+        paths = [paths]
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    if backend == 'batch':
+        size = max(-(-len(paths) // workers), 1)
+    else:
+        size = 1
+    chunks = [paths[i:i + size] for i in range(0, len(paths), size)]
+
+    results = []
+    errors = []
+
+    def collect(batch):
+        for result in batch:
+            if on_result is not None:
+                on_result(result)
+            if 'error' in result:
+                log.error(f"process_many: {result['pdf']} failed {result['error']}")
+                errors.append(result)
+            else:
+                results.append(result)
+
+    start = time.perf_counter()
+    suspects = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_batch, chunk, backend, cache, dispatch, window, parser, crop=crop): chunk
+                   for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                batch = future.result()
+            except BrokenProcessPool:
+                suspects.extend(futures[future])
+                continue
+            collect(batch)
+    if suspects:
+        log.error(f"process_many: a worker died, {len(suspects)} unfinished pdfs are tried again one at a time")
+    order = {pdf: index for index, pdf in enumerate(paths)}
+    for pdf in sorted(suspects, key=order.get):
+        # a pool of its own, so a pdf that breaks it is the one that killed its worker
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(process_batch, [pdf], backend, cache, dispatch, window, parser, crop=crop)
+            try:
+                batch = future.result()
+            except BrokenProcessPool as e:
+                batch = [_error(pdf, e)]
+        collect(batch)
+    elapsed = time.perf_counter() - start
+    files = len(results) + len(errors)
+    pages = sum(result['pages'] for result in results)
+    cached = sum(1 for result in results if result['cached'])
+    summary = {
+        'files': files,
+        'failed': len(errors),
+        'unclassified': sum(1 for result in errors if result.get('unclassified')),
+        'parsers': {name: sum(1 for result in results if result['parser'] == name) for name in PARSERS},
+        'pages': pages,
+        'seconds': elapsed,
+        # summed over workers, so it can exceed seconds
+        'classify_seconds': sum(result.get('classify_seconds', 0.0) for result in results + errors),
+        'parse_seconds': sum(result.get('seconds', 0.0) for result in results + errors),
+        'files_per_sec': files / elapsed if elapsed else 0.0,
+        'pages_per_sec': pages / elapsed if elapsed else 0.0,
+        }
+    if cache is not None:
+        summary['cache_hits'] = cached
+        summary['cache_misses'] = files - cached
+    log.info(f"process_many: {summary}")
+    return {'results': results, 'errors': errors, 'throughput': summary}
+
+
+def pdf_files(directory):
+    """ yield (path relative to directory, path) of the pdfs under directory, in sorted order """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.pdf'):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory), path
+
+
+def process_dir(directory, output, workers=None, backend='batch', cache=None, dispatch=False, window=None, retry=False, save_every=20, database=None, crop=False):
+    """ process the pdfs under directory that are new, changed or parsed by an older grammar
+
+    each pdf's result is written to output as json, at the pdf's relative
+    path, and recorded in output/manifest.json with its digest, the parser
+    that classified it and that parser's grammar version. unchanged pdfs
+    are skipped, so are ones that failed unless retry=True, but ones no
+    parser recognised are tried again whenever the set of parsers changes.
+    database is a sqlite file every parsed statement's transactions are
+    added to as it arrives, see database.TransactionStore. crop is part of
+    the recorded version, switching it processes everything again.
+    returns the counts and process_many's throughput
+    """
+    from pydfminer import ledger
+
+    start = time.perf_counter()
+    versions = parser_versions(crop)
+    # what unclassified pdfs were checked against, a new parser retries them
+    unparsed = registry_version(versions)
+    manifest = Manifest(os.path.join(output, MANIFEST))
+    found = dict(pdf_files(directory))
+
+    counts = {'files': len(found), 'skipped': 0, 'new': 0, 'changed': 0, 'grammar': 0, 'retried': 0}
+    transactions = None
+    if database is not None:
+        from pydfminer.database import TransactionStore
+
+        transactions = TransactionStore(database)
+        counts.update(added=0, duplicates=0)
+    pending = {}
+    for key, pdf in found.items():
+        digest, stat = manifest.digest(key, pdf)
+        entry = manifest.get(key)
+        if entry is None:
+            reason = 'new'
+        elif entry['digest'] != digest:
+            reason = 'changed'
+        elif entry['grammar'] != versions.get(entry.get('parser'), unparsed):
+            reason = 'grammar'
+        elif 'error' in entry:
+            reason = 'retried' if retry else None
+        elif not os.path.exists(entry['output']):
+            reason = 'new'
+        else:
+            reason = None
+        if reason is None:
+            counts['skipped'] += 1
+            # same bytes, touched: the new mtime saves hashing it again next time
+            if any(entry.get(name) != value for name, value in stat.items()):
+                manifest.put(key, {**entry, **stat})
+            continue
+        counts[reason] += 1
+        pending[pdf] = (key, digest, stat)
+    removed = [key for key in manifest.entries if key not in found]
+    for key in removed:
+        manifest.remove(key)
+    counts['removed'] = len(removed)
+    log.info(f"process_dir: {len(pending)} of {len(found)} pdfs to process, {counts}")
+
+    done = 0
+
+    def record(result):
+        nonlocal done
+        key, digest, stat = pending[result['pdf']]
+        parser = result.get('parser')
+        entry = {'digest': digest, **stat, 'parser': parser, 'grammar': versions.get(parser, unparsed),
+                 'processed': time.time()}
+        if 'error' in result:
+            entry['error'] = result['error']
+        else:
+            path = os.path.join(output, os.path.splitext(key)[0] + '.json')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(result, f)
+            entry['output'] = path
+            entry['state'] = result['state']
+            if transactions is not None:
+                loaded = transactions.add(ledger.from_dicts(result['transactions']), digest=digest,
+                                          pdf=result['pdf'], parser=parser)
+                counts['added'] += loaded['added']
+                counts['duplicates'] += loaded['duplicates']
+        manifest.put(key, entry)
+        done += 1
+        log.info(f"process_dir: [{done}/{len(pending)}] {key}{' failed' if 'error' in result else ''}")
+        if done % save_every == 0:
+            manifest.save()
+
+    try:
+        outcome = process_many(list(pending), workers=workers, backend=backend, cache=cache,
+                               dispatch=dispatch, window=window, on_result=record, crop=crop)
+    finally:
+        manifest.save()
+        if transactions is not None:
+            transactions.close()
+    counts['processed'] = len(outcome['results'])
+    counts['failed'] = len(outcome['errors'])
+    counts['seconds'] = time.perf_counter() - start
+    counts['grammar_versions'] = versions
+    counts['throughput'] = outcome['throughput']
+    log.info(f"process_dir: {counts}")
+    return counts
+
+
+
+def export(paths, output, format=None, workers=None, backend='batch', cache=None, dispatch=False, window=None, crop=False):
+    """ parse pdfs with process_many and write every transaction to one output file
+
+    the transactions of all documents are written in a single pass with one
+    of ledger.SINKS, a 'pdf' column says where each came from
+    """
+    from pydfminer import ledger
+
+    outcome = process_many(paths, workers=workers, backend=backend, cache=cache, dispatch=dispatch, window=window,
+                           crop=crop)
+    frame = ledger.concat({result['pdf']: ledger.from_dicts(result['transactions'])
+                           for result in sorted(outcome['results'], key=lambda result: result['pdf'])})
+    ledger.write(frame, output, format=format)
+    return {'transactions': len(frame), 'output': output, **outcome['throughput']}
+
+
+def load(paths, database):
+    """ add the transactions of process_dir's json results, files or directories of them, to database
+
+    statements already in the database, by their pdf's digest, are skipped
+    and transactions already in it from an overlapping statement are counted
+    as duplicates. failed results are counted and left out
+    """
+    from pydfminer.database import TransactionStore
+
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                                if name.endswith('.json') and name != MANIFEST))
+        else:
+            files.append(path)
+    counts = {'files': len(files), 'statements': 0, 'skipped': 0, 'failed': 0, 'added': 0, 'duplicates': 0}
+    start = time.perf_counter()
+    with TransactionStore(database) as transactions:
+        for path in files:
+            with open(path) as f:
+                result = json.load(f)
+            if 'error' in result:
+                counts['failed'] += 1
+                continue
+            loaded = transactions.load(result)
+            counts['skipped' if loaded['skipped'] else 'statements'] += 1
+            counts['added'] += loaded['added']
+            counts['duplicates'] += loaded['duplicates']
+        counts['totals'] = transactions.counts()
+    counts['seconds'] = time.perf_counter() - start
+    return counts
+
+
+def query(database, account=None, start=None, stop=None, output=None, format=None):
+    """ print the ledger of database's transactions of account dated start to stop, YYYY-MM-DD inclusive
+
+    output and format write it with one of ledger.SINKS instead
+    """
+    from pydfminer import ledger
+    from pydfminer.database import TransactionStore
+
+    with TransactionStore(database) as transactions:
+        frame = transactions.query(account, start, stop)
+    if output is None:
+        ledger.write(frame, sys.stdout, format=format or 'ledger')
+    else:
+        ledger.write(frame, output, format=format)
+
+
+def _pipeline_extract(item, backend, cache, parser, crop):
+    """ the extraction stage, classify the first page and extract the rest, cropped to the parser's Profile if crop """
+    pdf = item['pdf']
+    first = None
+    if parser is None:
+        first = first_page(pdf, backend=backend, cache=cache)
+        parser = classify(first)
+        if parser is None:
+            raise Unclassified(pdf)
+    # raw json, ingested by the parse stage on the other side of the process boundary
+    rest = PARSERS[parser].profile.options(crop)
+    pdf_json = extract(pdf, backend=backend, cache=cache, columnar=False, first=first, rest=rest)
+    return {**item, 'parser': parser, 'pdf_json': pdf_json, 'cropped': first is not None and bool(rest)}
+
+
+def _pipeline_parse(item, dispatch):
+    result = parse_document(item['pdf'], item['parser'], item['pdf_json'], cropped=item['cropped'], dispatch=dispatch)
+    return {**result, 'key': item['key']}
+
+
+def _pipeline_write(result, output, format):
+    from pydfminer import ledger
+
+    path = os.path.join(output, os.path.splitext(result['key'])[0] + '.' + format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ledger.write(ledger.from_dicts(result['transactions']), path, format=format)
+    return {'pdf': result['pdf'], 'output': path, 'pages': result['pages'],
+            'transactions': len(result['transactions'])}
+
+
+def pipeline(paths, output, format='ledger', backend='tabula', cache=None, dispatch=False, parser=None,
+             extract_workers=4, parse_workers=None, write_workers=1, queue=None, interval=0.1, crop=False):
+    """ extract, parse and write pdfs in overlapping asyncio stages
+
+    paths is a directory, walked as the pipeline goes, or a list of pdfs.
+    each pdf's transactions are written to output at its relative path with
+    format's extension. extraction runs on extract_workers threads as
+    tabula is a subprocess, parsing on parse_workers processes and writing
+    on write_workers threads, with a queue of queue items in front of each
+    stage (twice its workers if None) so a slow stage holds the others back.
+    crop crops pages after the first to the parser's Profile, see process_batch.
+    returns the written files, the errors and pydfminer.pipeline's per
+    stage metrics
+    """
+    import functools
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from pydfminer import pipeline as pipeline_
+
+    if isinstance(paths, str) and os.path.isdir(paths):
+        source = ({'pdf': pdf, 'key': key} for key, pdf in pdf_files(paths))
+    else:
+        source = ({'pdf': pdf, 'key': os.path.basename(pdf)} for pdf in ([paths] if isinstance(paths, str) else paths))
+    parse_workers = parse_workers or os.cpu_count() or 1
+
+    written = []
+    errors = []
+
+    def on_error(stage, item, e):
+        log.error(f"pipeline: {item['pdf']} failed in {stage} {e!r}")
+        errors.append(_error(item['pdf'], e, stage=stage, unclassified=isinstance(e, Unclassified)))
+
+    # forking while the extraction threads hold locks can hang the parse workers
+    spawn = multiprocessing.get_context('spawn')
+    with ThreadPoolExecutor(1) as discover, \
+            ThreadPoolExecutor(extract_workers) as extractors, \
+            ProcessPoolExecutor(parse_workers, mp_context=spawn) as parsers, \
+            ThreadPoolExecutor(write_workers) as writers:
+        stages = [
+            pipeline_.Stage('extract', functools.partial(_pipeline_extract, backend=backend, cache=cache, parser=parser,
+                                                         crop=crop),
+                            workers=extract_workers, queue=queue, executor=extractors),
+            pipeline_.Stage('parse', functools.partial(_pipeline_parse, dispatch=dispatch),
+                            workers=parse_workers, queue=queue, executor=parsers),
+            pipeline_.Stage('write', functools.partial(_pipeline_write, output=output, format=format),
+                            workers=write_workers, queue=queue, executor=writers),
+            ]
+        metrics = pipeline_.run(source, stages, on_error=on_error, on_result=written.append,
+                                interval=interval, source_executor=discover)
+    files = len(written) + len(errors)
+    pages = sum(result['pages'] for result in written)
+    summary = {
+        'files': files,
+        'failed': len(errors),
+        'unclassified': sum(1 for error in errors if error['unclassified']),
+        'pages': pages,
+        'transactions': sum(result['transactions'] for result in written),
+        'seconds': metrics['seconds'],
+        'files_per_sec': files / metrics['seconds'] if metrics['seconds'] else 0.0,
+        'pages_per_sec': pages / metrics['seconds'] if metrics['seconds'] else 0.0,
+        'stages': metrics,
+        }
+    log.info(f"pipeline: {summary}")
+    return {'written': written, 'errors': errors, 'throughput': summary}
+
 
 if __name__ == '__main__':
-    #level = logging.WARN
-    level = logging.DEBUG
+    # PYDFMINER_LOG=WARNING for production runs, per row debug output is skipped entirely
+    level = os.environ.get('PYDFMINER_LOG', 'DEBUG').upper()
     logging.basicConfig(level=level)
     # Set transitions' log level to INFO; DEBUG messages will be omitted
     logging.getLogger('transitions').setLevel(level)
 
-    log = logging.getLogger(__name__)
     #log.setLevel(level=logging.INFO)
     log.setLevel(level=level)
 
+    import fire
     try:
         fire.Fire()
-    except:
+    except Exception:
+        # PYDFMINER_PDB=1 to debug a failure, unattended runs just exit with the traceback
+        if not os.environ.get('PYDFMINER_PDB'):
+            raise
         traceback.print_exc()
+        import pdb
         pdb.post_mortem()
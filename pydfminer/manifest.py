@@ -0,0 +1,54 @@
+""" index of the pdfs of an archive that have already been processed
+
+one json file mapping each pdf's path, relative to the archive, to the
+sha256 of its bytes, the grammar version that parsed it and where its
+output went. size and mtime are kept too so an unchanged file is not
+hashed again on every run.
+"""
+import json
+import logging
+import os
+import tempfile
+
+from pydfminer.cache import file_digest
+
+log = logging.getLogger(__name__)
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except ValueError as e:
+            log.warning(f"starting over, unreadable manifest {path}: {e}")
+            self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+
+    def digest(self, key, pdf):
+        """ (digest, stat fields) of pdf, reusing the recorded digest if size and mtime match """
+        stat = os.stat(pdf)
+        fields = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        entry = self.entries.get(key)
+        if entry and all(entry.get(name) == value for name, value in fields.items()):
+            return entry['digest'], fields
+        return file_digest(pdf), fields
+
+    def save(self):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
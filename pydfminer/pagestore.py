@@ -0,0 +1,185 @@
+""" extracted pages in one memory mapped file
+
+write() stores a document's pages in the columnar layout of
+pydfminer.columnar: per page the cell count, row count and the text id,
+left, width, top, height and row offset arrays, then the interned texts
+and an index of page offsets at the end. PageStore maps the file and
+hands out ColumnarPage whose arrays are views into the mapping, so only
+the pages a run touches are read, and processes opening the same file
+share one copy in the page cache.
+
+    header   magic, pages, index offset, texts, texts offset, meta offset, meta length
+    pages    <II cells rows, int32 text_id, float32 left width top height, int32 offsets
+    texts    uint64 end of every text in the utf-8 blob, then the blob
+    meta     json, what extracted the pages
+    index    uint64 offset of every page
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from pydfminer.columnar import ColumnarPage, TextTable
+
+MAGIC = b'PDFPAGE1'
+_HEADER = struct.Struct('<8sQQQQQQ')
+_PAGE = struct.Struct('<II')
+
+
+def _pad(f, size=8):
+    f.write(b'\0' * (-f.tell() % size))
+
+
+def write(path, pages, meta=None):
+    """ write pages, tabula json pages or ColumnarPage, to path and return how many
+
+    pages can be a PageStream, each page is written as it is extracted.
+    the file is written next to path and renamed into place when complete
+    """
+    import numpy as np
+
+    table = TextTable()
+    offsets = []
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'\0' * _HEADER.size)
+            for page in pages:
+                if isinstance(page, ColumnarPage):
+                    text_id = np.array([table.intern(page.table.texts[id_]) for id_ in page.text_id.tolist()],
+                                       dtype=np.int32)
+                else:
+                    page = ColumnarPage.from_tabula(page, table)
+                    text_id = page.text_id
+                _pad(f)
+                offsets.append(f.tell())
+                f.write(_PAGE.pack(len(text_id), len(page)))
+                for array, dtype in ((text_id, np.int32), (page.left, np.float32), (page.width, np.float32),
+                                     (page.top, np.float32), (page.height, np.float32),
+                                     (page.offsets, np.int32)):
+                    f.write(np.asarray(array, dtype=dtype).tobytes())
+
+            _pad(f)
+            texts_offset = f.tell()
+            blobs = [text.encode('utf-8') for text in table.texts]
+            ends = np.cumsum([len(blob) for blob in blobs], dtype=np.uint64)
+            f.write(ends.tobytes())
+            f.write(b''.join(blobs))
+
+            meta_offset = f.tell()
+            meta_bytes = json.dumps(meta or {}).encode('utf-8')
+            f.write(meta_bytes)
+
+            _pad(f)
+            index_offset = f.tell()
+            f.write(np.array(offsets, dtype=np.uint64).tobytes())
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, len(offsets), index_offset, len(table.texts), texts_offset,
+                                 meta_offset, len(meta_bytes)))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(offsets)
+
+
+class MappedTexts:
+    """ the interned texts of a PageStore, decoded from the mapping as they are asked for """
+    def __init__(self, buffer, count, offset):
+        import numpy as np
+
+        self.buffer = buffer
+        self.ends = np.frombuffer(buffer, dtype=np.uint64, count=count, offset=offset).tolist()
+        self.blob = offset + 8 * count
+        self.decoded = {}
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, id_):
+        try:
+            return self.decoded[id_]
+        except KeyError:
+            start = self.ends[id_ - 1] if id_ else 0
+            text = self.decoded[id_] = str(self.buffer[self.blob + start:self.blob + self.ends[id_]], 'utf-8')
+            return text
+
+
+class MappedTable:
+    """ stands in for the TextTable of a ColumnarPage """
+    def __init__(self, texts):
+        self.texts = texts
+
+
+class PageStore:
+    """ the pages of a file written by write(), indexed like the list of pages they were """
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+        magic, pages, index_offset, texts, texts_offset, meta_offset, meta_length = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a page store")
+        self.index = np.frombuffer(self.buffer, dtype=np.uint64, count=pages, offset=index_offset).tolist()
+        self.table = MappedTable(MappedTexts(self.buffer, texts, texts_offset))
+        self.meta = json.loads(str(self.buffer[meta_offset:meta_offset + meta_length], 'utf-8'))
+        # run() asks for the current page for every row and last_page() for the
+        # next one, the two most recently built are kept
+        self._recent = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, index):
+        import numpy as np
+
+        if index < 0:
+            index += len(self.index)
+        if not 0 <= index < len(self.index):
+            raise IndexError(f"page {index} out of range")
+        try:
+            return self._recent[index]
+        except KeyError:
+            pass
+        offset = self.index[index]
+        cells, rows = _PAGE.unpack_from(self.buffer, offset)
+        offset += _PAGE.size
+        arrays = []
+        for dtype, count in ((np.int32, cells), (np.float32, cells), (np.float32, cells),
+                             (np.float32, cells), (np.float32, cells), (np.int32, rows + 1)):
+            arrays.append(np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset))
+            offset += 4 * count
+        text_id, left, width, top, height, row_offsets = arrays
+        page = ColumnarPage(self.table, text_id, left, width, top, height, row_offsets.tolist())
+        if len(self._recent) == 2:
+            del self._recent[next(iter(self._recent))]
+        self._recent[index] = page
+        return page
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def nbytes(self):
+        return len(self.mmap)
+
+    def close(self):
+        self._recent = {}
+        try:
+            self.buffer.release()
+            self.mmap.close()
+        except BufferError:
+            # pages handed out still view the mapping, it goes when they do
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
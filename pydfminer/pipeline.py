@@ -0,0 +1,167 @@
+""" asyncio pipeline of bounded stages
+
+a source iterable feeds a chain of Stage. each stage runs its blocking
+function on a number of workers in an executor and hands what it returns
+to the next stage through a bounded queue, so a slow stage blocks the put
+of the one before it: memory stays at the queue sizes plus the items in
+flight, however far ahead the fast stages could get. an item whose
+function raises goes to on_error and no further.
+
+run() returns per stage metrics: items, latency, how long the workers
+waited on an empty inbox (idle) or a full outbox (blocked), and the depth
+of the stage's inbox sampled every interval seconds.
+"""
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue=None, executor=None):
+        """ func is called with each item in executor, the loop's default one if None
+
+        queue is the size of the stage's inbox, twice its workers if None
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = 2 * workers if queue is None else queue
+        self.executor = executor
+
+
+class Metrics:
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self.queue = queue
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.max_latency = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.samples = 0
+        self.depth = 0
+        self.max_depth = 0
+
+    def done(self, seconds, failed=False):
+        self.items += 1
+        self.failed += failed
+        self.busy += seconds
+        self.max_latency = max(self.max_latency, seconds)
+
+    def sample(self, depth):
+        self.samples += 1
+        self.depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def summary(self):
+        return {
+            'workers': self.workers,
+            'queue': self.queue,
+            'items': self.items,
+            'failed': self.failed,
+            'busy_seconds': self.busy,
+            'mean_latency': self.busy / self.items if self.items else 0.0,
+            'max_latency': self.max_latency,
+            'idle_seconds': self.idle,
+            'blocked_seconds': self.blocked,
+            'mean_depth': self.depth / self.samples if self.samples else 0.0,
+            'max_depth': self.max_depth,
+            }
+
+
+async def _source(source, outbox, metrics, executor):
+    # next() may block, walking a directory on a network mount say
+    loop = asyncio.get_running_loop()
+    iterator = iter(source)
+    while True:
+        start = time.perf_counter()
+        item = await loop.run_in_executor(executor, next, iterator, _DONE)
+        if item is _DONE:
+            return
+        metrics.done(time.perf_counter() - start)
+        start = time.perf_counter()
+        await outbox.put(item)
+        metrics.blocked += time.perf_counter() - start
+
+
+async def _worker(stage, inbox, outbox, metrics, on_error, on_result):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = time.perf_counter()
+        item = await inbox.get()
+        metrics.idle += time.perf_counter() - start
+        if item is _DONE:
+            return
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(stage.executor, stage.func, item)
+        except Exception as e:
+            metrics.done(time.perf_counter() - start, failed=True)
+            log.debug(f"pipeline: {stage.name} failed {e!r}")
+            if on_error is not None:
+                on_error(stage.name, item, e)
+            continue
+        metrics.done(time.perf_counter() - start)
+        if outbox is None:
+            if on_result is not None:
+                on_result(result)
+            continue
+        start = time.perf_counter()
+        await outbox.put(result)
+        metrics.blocked += time.perf_counter() - start
+
+
+async def _stage(stage, inbox, outbox, metrics, on_error, on_result, following):
+    await asyncio.gather(*(_worker(stage, inbox, outbox, metrics, on_error, on_result)
+                           for _ in range(stage.workers)))
+    # one end marker for every worker of the next stage
+    for _ in range(following):
+        await outbox.put(_DONE)
+
+
+async def _sampler(stages, queues, metrics, interval):
+    while True:
+        for stage, queue in zip(stages, queues):
+            metrics[stage.name].sample(queue.qsize())
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("pipeline: depth " + ' '.join(f"{stage.name}={queue.qsize()}/{stage.queue}"
+                                                    for stage, queue in zip(stages, queues)))
+        await asyncio.sleep(interval)
+
+
+async def run_async(source, stages, on_error=None, on_result=None, interval=0.1, source_executor=None):
+    """ feed source through stages, on_result gets what the last stage returns """
+    queues = [asyncio.Queue(stage.queue) for stage in stages]
+    metrics = {'source': Metrics(1, 0)}
+    metrics.update((stage.name, Metrics(stage.workers, stage.queue)) for stage in stages)
+    sampler = asyncio.ensure_future(_sampler(stages, queues, metrics, interval))
+    start = time.perf_counter()
+    try:
+        tasks = []
+        for index, stage in enumerate(stages):
+            last = index == len(stages) - 1
+            tasks.append(_stage(stage, queues[index], None if last else queues[index + 1],
+                                metrics[stage.name], on_error, on_result,
+                                0 if last else stages[index + 1].workers))
+
+        async def produce():
+            await _source(source, queues[0], metrics['source'], source_executor)
+            for _ in range(stages[0].workers):
+                await queues[0].put(_DONE)
+
+        await asyncio.gather(produce(), *tasks)
+    finally:
+        sampler.cancel()
+    summary = {name: value.summary() for name, value in metrics.items()}
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run(source, stages, on_error=None, on_result=None, interval=0.1, source_executor=None):
+    return asyncio.run(run_async(source, stages, on_error=on_error, on_result=on_result,
+                                 interval=interval, source_executor=source_executor))
@@ -0,0 +1,142 @@
+""" where Document.run() spends its time, state by state
+
+a StateProfiler handed to Document.run(profiler=...) is told about every
+transition attempt of the trigger loop, every condition checked, and every
+NodeState entered or exited. it accumulates over as many documents as are
+run with it. summary() is plain json, table() a text table of the states,
+annotate() weights the edges and nodes of the grammar's state diagram.
+"""
+import collections
+import time
+
+
+class StateStats:
+    __slots__ = ('entries', 'enter_seconds', 'exits', 'exit_seconds', 'rows',
+                 'attempts', 'failed', 'failed_triggers', 'trigger_seconds',
+                 'ready_calls', 'ready_hits', 'ready_seconds')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TransitionStats:
+    __slots__ = ('count', 'failed', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StateProfiler:
+    def __init__(self):
+        self.states = collections.defaultdict(StateStats)
+        # by (source, trigger, dest)
+        self.transitions = collections.defaultdict(TransitionStats)
+        self.documents = 0
+        self.seconds = 0.0
+
+    def run(self, seconds):
+        self.documents += 1
+        self.seconds += seconds
+
+    def enter(self, state, seconds, rows):
+        stats = self.states[state]
+        stats.entries += 1
+        stats.enter_seconds += seconds
+        stats.rows += rows
+
+    def exit(self, state, seconds):
+        stats = self.states[state]
+        stats.exits += 1
+        stats.exit_seconds += seconds
+
+    def check(self, condition, event_data):
+        """ condition.check(event_data), counting it if it is a ready() """
+        func = condition.func
+        if getattr(func, '__name__', None) != 'ready':
+            return condition.check(event_data)
+        start = time.perf_counter()
+        passed = condition.check(event_data)
+        stats = self.states[func.__self__.name]
+        stats.ready_calls += 1
+        stats.ready_hits += passed
+        stats.ready_seconds += time.perf_counter() - start
+        return passed
+
+    def attempt(self, source, trigger, dest, passed, seconds):
+        """ a transition's conditions were checked, seconds includes executing it when they passed """
+        stats = self.states[source]
+        stats.attempts += 1
+        stats.trigger_seconds += seconds
+        transition = self.transitions[source, trigger, dest]
+        transition.seconds += seconds
+        if passed:
+            transition.count += 1
+        else:
+            stats.failed += 1
+            transition.failed += 1
+
+    def failed_trigger(self, source):
+        """ none of a trigger's transitions passed """
+        self.states[source].failed_triggers += 1
+
+    def summary(self):
+        return {
+            'documents': self.documents,
+            'seconds': self.seconds,
+            'states': {state: stats.as_dict() for state, stats in sorted(self.states.items())},
+            'transitions': [{'source': source, 'trigger': trigger, 'dest': dest, **stats.as_dict()}
+                            for (source, trigger, dest), stats in sorted(self.transitions.items())],
+            }
+
+    def table(self, sort='enter_seconds'):
+        """ one line per state, slowest first """
+        columns = ['entries', 'enter_seconds', 'rows', 'attempts', 'failed', 'failed_triggers',
+                   'trigger_seconds', 'ready_calls', 'ready_hits', 'ready_seconds']
+        rows = sorted(self.states.items(), key=lambda item: getattr(item[1], sort), reverse=True)
+        width = max([len('state'), *(len(state) for state in self.states)])
+        lines = [f"{'state':<{width}} " + ' '.join(f"{column:>14}" for column in columns)]
+        for state, stats in rows:
+            values = [getattr(stats, column) for column in columns]
+            lines.append(f"{state:<{width}} " + ' '.join(
+                f"{value:>14.6f}" if isinstance(value, float) else f"{value:>14}" for value in values))
+        return '\n'.join(lines)
+
+
+def annotate(graph, profiler, weight='count'):
+    """ label graph's edges and states with profiler's counts and times, the heaviest drawn thickest
+
+    graph is a pygraphviz AGraph of the grammar, as Document.get_graph() returns.
+    weight is 'count' or 'seconds'
+    """
+    edges = collections.defaultdict(TransitionStats)
+    for (source, _, dest), stats in profiler.transitions.items():
+        edge = edges[source, dest]
+        edge.count += stats.count
+        edge.failed += stats.failed
+        edge.seconds += stats.seconds
+    heaviest = max([getattr(stats, weight) for stats in edges.values()], default=0) or 1
+    for edge in graph.edges():
+        stats = edges.get((edge[0], edge[1]))
+        if stats is None or not stats.count:
+            edge.attr['color'] = 'gray'
+            continue
+        share = getattr(stats, weight) / heaviest
+        edge.attr['label'] = f"{edge.attr['label']}\n{stats.count}x {stats.seconds * 1e3:.1f}ms"
+        edge.attr['penwidth'] = f"{1 + 7 * share:.2f}"
+        edge.attr['color'] = f"{0.0:.3f} {share:.3f} 0.850"
+    for node in graph.nodes():
+        stats = profiler.states.get(str(node))
+        if stats is None:
+            continue
+        node.attr['label'] = (f"{node.attr['label']}\n{stats.entries}x {stats.enter_seconds * 1e3:.1f}ms"
+                              f" {stats.rows} rows\n{stats.failed} failed, {stats.ready_calls} ready")
+    return graph
@@ -0,0 +1,274 @@
+""" synthetic becu-like statements for benchmarks
+
+the layout Becu reads: address block, statement period, deposit and loan
+summaries with their fee blocks, deposit and loan account detail with
+activity sections, "Machine" continuation rows and "page N of M" footers.
+a statement is a list of pages, a page is a list of rows and a row is a list
+of (left, text) cells, left in pdf points. the same statement can be written
+as tabula style json or as a (very) plain pdf for tabula to extract.
+"""
+import json
+import os
+import random
+
+PAGE_WIDTH = 612.0
+PAGE_HEIGHT = 792.0
+MARGIN = 36.0
+ROW_HEIGHT = 12.0
+FONT_SIZE = 9.0
+# helvetica averages a bit over half an em per character
+CHAR_WIDTH = FONT_SIZE * 0.5
+
+COLUMNS = [36.0, 230.0, 330.0, 400.0, 450.0, 520.0]
+
+DESCRIPTIONS = [
+    "Coffee shop",
+    "Grocery outlet",
+    "Payroll deposit",
+    "Transfer to savings",
+    "Utility payment",
+    "Hardware store",
+    ]
+
+
+def row(*texts):
+    return [(left, text) for left, text in zip(COLUMNS, texts)]
+
+
+def amount(cents):
+    text = f"{abs(cents) / 100:,.2f}"
+    return f"({text})" if cents < 0 else text
+
+
+ACCOUNT_KINDS = ["Checking", "Savings"]
+# the activity sections of an account, in the order a statement lists them
+DEPOSITS = "Deposits and other credits"
+WITHDRAWALS = "Withdrawals and other debits"
+CHECKS = "Checks"
+MACHINES = [
+    "Machine 0042 3rd Ave Seattle WA",
+    "Machine 1187 Pike St Seattle WA",
+    "Machine 2203 Main St Bellevue WA",
+    ]
+
+
+class _Entry:
+    """ rows that go on one page, what a page starting with them repeats first and whether they belong with what follows """
+    def __init__(self, rows, continued=(), keep=False, line=False, new_page=False):
+        self.rows = rows
+        self.continued = list(continued)
+        self.keep = keep
+        self.line = line
+        self.new_page = new_page
+
+
+def _activity(rng, account, section, count, machine, records, descriptions=DESCRIPTIONS):
+    """ the entries of count activity lines, a share of them withdrawals at a machine """
+    for _ in range(count):
+        day = rng.randint(1, 28)
+        cents = rng.randint(-50000, 250000)
+        description = rng.choice(descriptions)
+        rows = [row(f"01/{day:02d} {amount(cents)} {description}")]
+        if machine and rng.random() < machine:
+            # the machine's location is printed on a row of its own
+            continuation = rng.choice(MACHINES)
+            rows.append(row(continuation))
+            description = f"{description} {continuation}"
+        if records is not None:
+            records.append((account, section, [f"01/{day:02d}", amount(cents), description]))
+        yield rows
+
+
+def _shares(total, parts):
+    return [total // parts + (index < total % parts) for index in range(parts)]
+
+
+def statement(pages=3, transactions=40, org="ACME LLC", seed=0, footer="Member NCUA  becu.org",
+              accounts=1, loans=0, sections=(WITHDRAWALS,), machine=0.0, records=None):
+    """ build a statement spread over about pages pages, the last one a disclosure page as on real statements
+
+    transactions are shared out between the accounts, checking and savings
+    alternately, and each account's sections; savings have a dividend
+    yield block. loans adds a loan summary and loan accounts with deposit
+    and withdrawal activity, each starting a page, and are share secured
+    loans since Becu only recognises accounts named checking or savings.
+    machine is the chance an activity line is followed by a "Machine ..."
+    row. activity lines fill pages evenly, pages are added when they do
+    not fit. footer is printed beside every page number, it is what
+    Becu.probe looks for. records, a list, gets the (account, section, line)
+    of every activity line in the order Becu records them
+    """
+    rng = random.Random(seed)
+    rows_per_page = int((PAGE_HEIGHT - 2 * MARGIN) // ROW_HEIGHT) - 2
+    period = row("Statement Period: 01/01/2020 - 01/31/2020")
+    names = [f"{ACCOUNT_KINDS[index % 2]} {1234 + 1111 * index}" for index in range(accounts)]
+    loan_names = [f"Savings Secured Loan {7001 + index}" for index in range(loans)]
+    loan_sections = (DEPOSITS, WITHDRAWALS)
+
+    entries = [
+        _Entry([row("Summary of Deposit Accounts"),
+                row("", "Beginning Deposits", "", "", "Ending", "Dividends"),
+                row("Account", "Balance & Credits", "Withdrawals", "", "Balance", "YTD")], keep=True),
+        *(_Entry([row(name, "100.00 50.00", "20.00", "0.00", "130.00", "0.01")]) for name in names),
+        _Entry([row("Total Fees", "This Period", "YTD")], keep=True),
+        _Entry([row("Overdraft fees", "0.00", "0.00")]),
+        ]
+    if loans:
+        entries += [
+            _Entry([row("Summary of Loan Accounts"),
+                    row("", "Beginning Payments", "", "", "Ending", "Interest"),
+                    row("Account", "Balance & Credits", "Advances", "", "Balance", "YTD")], keep=True),
+            *(_Entry([row(name, "5,000.00 250.00", "0.00", "0.00", "4,750.00", "12.50")]) for name in loan_names),
+            # Becu reads a fee block after every accounts summary
+            _Entry([row("Total Fees", "This Period", "YTD")], keep=True),
+            _Entry([row("Late fees", "0.00", "0.00")]),
+            ]
+
+    blocks = [("Deposit Account Detail", name, sections) for name in names]
+    blocks += [("Loan Account Detail", name, loan_sections) for name in loan_names]
+    counts = iter(_shares(transactions, sum(len(block_sections) for _, _, block_sections in blocks)))
+    for index, (detail, name, block_sections) in enumerate(blocks):
+        if index == 0 or detail != blocks[index - 1][0]:
+            # Becu only finds the loan detail at the top of a page
+            entries.append(_Entry([row(detail)], keep=True, new_page=index > 0))
+        account = [row(name)]
+        if name.startswith("Savings") and detail.startswith("Deposit"):
+            account += [row("Annual Percentage Yield Earned 0.05%"),
+                        row("Dividends Earned", "0.01"),
+                        row("Days in Period", "31")]
+        entries.append(_Entry(account, continued=[row(f"{detail} (continued)")], keep=True))
+        for section in block_sections:
+            entries.append(_Entry([row(section), row("Date Amount Description")],
+                                  continued=[row(f"{detail} (continued)")], keep=True))
+            continued = [row(f"{detail} (continued)"), row(f"{section} (continued)"), row("Date Amount Description")]
+            for rows in _activity(rng, name, section, next(counts), machine, records):
+                entries.append(_Entry(rows, continued=continued, line=True))
+
+    body_pages = max(pages - 1, 1)
+    per_page = max(transactions // body_pages, 1)
+    result = []
+    rows = [row(org, "Account Number", "123456"), row("123 Main St"), row("Seattle WA 98101"), period]
+    lines = 0
+    for index, entry in enumerate(entries):
+        need = 0
+        for following in entries[index:]:
+            need += len(following.rows)
+            if not following.keep:
+                break
+        # every page but the last body page gets its share of the lines
+        quota = entry.line and lines >= per_page and len(result) < body_pages - 1
+        if entry.new_page or quota or len(rows) + need > rows_per_page:
+            result.append(rows)
+            rows = [row(org), period, *([] if entry.new_page else entry.continued)]
+            lines = 0
+        rows.extend(entry.rows)
+        lines += entry.line
+    result.append(rows)
+    result.append([
+        row("In case of errors or questions about your electronic transfers"),
+        ])
+    for number, rows in enumerate(result):
+        # blank rows push the footer to the bottom of the page
+        rows.extend([] for _ in range(rows_per_page + 1 - len(rows)))
+        rows.append(row(f"page {number + 1} of {len(result)}", *([footer] if footer else [])))
+    return result
+
+
+def _cell(top, left, text):
+    if not text:
+        # tabula pads short rows with zeroed empty cells
+        return {'top': 0.0, 'left': 0.0, 'width': 0.0, 'height': 0.0, 'text': ''}
+    return {
+        'top': top,
+        'left': left,
+        'width': len(text) * CHAR_WIDTH,
+        'height': ROW_HEIGHT,
+        'text': text,
+        }
+
+
+def to_tabula_json(pages):
+    """ the json tabula.read_pdf(output_format='json') returns for a statement """
+    document = []
+    for rows in pages:
+        width = max(len(cells) for cells in rows)
+        data = []
+        for index, cells in enumerate(rows):
+            if not any(text for _, text in cells):
+                # tabula has no rows for blank lines
+                continue
+            top = MARGIN + index * ROW_HEIGHT
+            cells = cells + [(0.0, '')] * (width - len(cells))
+            data.append([_cell(top, left, text) for left, text in cells])
+        document.append({
+            'extraction_method': 'stream',
+            'top': 0.0,
+            'left': 0.0,
+            'width': PAGE_WIDTH,
+            'height': PAGE_HEIGHT,
+            'right': PAGE_WIDTH,
+            'bottom': PAGE_HEIGHT,
+            'data': data,
+            })
+    return document
+
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def to_pdf(pages):
+    """ a minimal single font pdf with every cell placed at its left offset """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # pages, filled in once the kids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        ]
+    kids = []
+    for rows in pages:
+        lines = []
+        for index, cells in enumerate(rows):
+            y = PAGE_HEIGHT - MARGIN - index * ROW_HEIGHT
+            for left, text in cells:
+                if text:
+                    lines.append(f"BT /F1 {FONT_SIZE:g} Tf {left:g} {y:g} Td ({_pdf_string(text)}) Tj ET")
+        stream = '\n'.join(lines).encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b' '.join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_directory(directory, files=10, pages=3, transactions=40, footer="Member NCUA  becu.org", prefix="statement", **layout):
+    """ write files synthetic statements as pdf, with the expected json alongside
+
+    layout is passed on to statement(), accounts=3, loans=1 say
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for seed in range(files):
+        pages_ = statement(pages=pages, transactions=transactions, seed=seed, footer=footer, **layout)
+        path = os.path.join(directory, f"{prefix}-{seed:04d}.pdf")
+        with open(path, 'wb') as f:
+            f.write(to_pdf(pages_))
+        with open(path[:-len('.pdf')] + '.expected.json', 'w') as f:
+            json.dump(to_tabula_json(pages_), f)
+        paths.append(path)
+    return paths
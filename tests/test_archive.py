@@ -0,0 +1,64 @@
+""" process_dir only processes what is new, changed or parsed by another grammar version """
+import json
+import os
+
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.main import MANIFEST, process_dir
+
+
+@pytest.fixture
+def archive(tmp_path):
+    directory = str(tmp_path / 'pdfs')
+    synthetic.write_directory(directory, files=3, pages=2, transactions=20)
+    # no parser recognises a statement without the becu footer
+    synthetic.write_directory(directory, files=1, pages=2, transactions=20, footer='', prefix='other')
+    return directory, str(tmp_path / 'output')
+
+
+def _process(archive, **kwargs):
+    directory, output = archive
+    return process_dir(directory, output, workers=1, backend='pdfminer', **kwargs)
+
+
+def _counts(counts):
+    return {name: counts[name] for name in ('new', 'changed', 'grammar', 'retried', 'skipped', 'removed', 'processed',
+                                            'failed')}
+
+
+def test_unchanged_archive_is_skipped(archive):
+    assert _counts(_process(archive)) == {'new': 4, 'changed': 0, 'grammar': 0, 'retried': 0, 'skipped': 0,
+                                          'removed': 0, 'processed': 3, 'failed': 1}
+    assert _counts(_process(archive)) == {'new': 0, 'changed': 0, 'grammar': 0, 'retried': 0, 'skipped': 4,
+                                          'removed': 0, 'processed': 0, 'failed': 0}
+    # the unrecognised pdf only when asked
+    assert _counts(_process(archive, retry=True)) == {'new': 0, 'changed': 0, 'grammar': 0, 'retried': 1,
+                                                      'skipped': 3, 'removed': 0, 'processed': 0, 'failed': 1}
+
+
+def test_changes_are_processed_again(archive):
+    directory, output = archive
+    _process(archive)
+    names = sorted(name for name in os.listdir(directory) if name.startswith('statement') and name.endswith('.pdf'))
+    # touched but the same bytes
+    os.utime(os.path.join(directory, names[0]), ns=(1, 1))
+    # other bytes under the same name
+    with open(os.path.join(directory, names[1]), 'wb') as f:
+        f.write(synthetic.to_pdf(synthetic.statement(pages=2, transactions=20, seed=99)))
+    os.remove(os.path.join(output, os.path.splitext(names[2])[0] + '.json'))
+    os.remove(os.path.join(directory, 'other-0000.pdf'))
+    assert _counts(_process(archive)) == {'new': 1, 'changed': 1, 'grammar': 0, 'retried': 0, 'skipped': 1,
+                                          'removed': 1, 'processed': 2, 'failed': 0}
+    with open(os.path.join(output, MANIFEST)) as f:
+        entries = json.load(f)
+    assert sorted(entries) == names
+    assert entries[names[0]]['mtime_ns'] == 1
+
+
+def test_another_grammar_version_is_processed_again(archive):
+    _process(archive)
+    # the crop is part of the version
+    counts = _process(archive, crop=True)
+    assert (counts['grammar'], counts['skipped'], counts['processed']) == (4, 0, 3)
+    assert _process(archive, crop=True)['skipped'] == 4
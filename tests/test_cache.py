@@ -0,0 +1,120 @@
+""" ExtractionCache and the CachedExtractor in front of a backend """
+import os
+
+import pytest
+
+from pydfminer import cache as cache_module
+from pydfminer.cache import ExtractionCache
+from pydfminer.extract import CachedExtractor, Extractor
+
+
+class Counting(Extractor):
+    """ a backend that makes up a page per pdf and counts what it is asked to extract """
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.extracted = []
+
+    def extract(self, pdf):
+        self.extracted.append(pdf)
+        return [{'data': [[{'text': os.path.basename(pdf), 'left': 0.0, 'width': 1.0, 'top': 0.0, 'height': 1.0}]]},
+                {'data': []}]
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"statement-{index}.pdf"
+        path.write_bytes(b'%PDF-1.4 ' + bytes([index]) * 64)
+        paths.append(str(path))
+    return paths
+
+
+def _age(cache, key, seconds):
+    os.utime(cache.path(key), (seconds, seconds))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    keys = [f"{index:064x}" for index in range(4)]
+    for age, key in enumerate(keys):
+        cache.put(key, [{'data': [['x' * 200]]}])
+        _age(cache, key, 1000 + age)
+    size = os.path.getsize(cache.path(keys[0]))
+    # reading the oldest makes it the most recent
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert [os.path.exists(cache.path(key)) for key in keys] == [True, False, False, True]
+    assert cache.bytes == 2 * size
+
+
+def test_put_past_max_bytes_evicts(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    cache.put('0' * 64, [{'data': []}])
+    size = os.path.getsize(cache.path('0' * 64))
+    _age(cache, '0' * 64, 1000)
+    cache.max_bytes = size
+    cache.put('1' * 64, [{'data': []}])
+    assert not os.path.exists(cache.path('0' * 64))
+    assert cache.stats()['entries'] == 1
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    with open(cache.path('0' * 64), 'wb') as f:
+        f.write(b'not gzip')
+    assert cache.get('0' * 64) is None
+    assert not os.path.exists(cache.path('0' * 64))
+    assert cache.stats()['misses'] == 1
+
+
+def test_key_follows_bytes_and_options(pdfs):
+    cache = ExtractionCache(os.path.join(os.path.dirname(pdfs[0]), 'cache'))
+    assert cache.key(pdfs[0], {'stream': True}) == cache.key(pdfs[0], {'stream': True})
+    assert cache.key(pdfs[0], {'stream': True}) != cache.key(pdfs[1], {'stream': True})
+    assert cache.key(pdfs[0], {'stream': True}) != cache.key(pdfs[0], {'stream': False})
+
+
+def test_warm_cache_does_not_extract(tmp_path, pdfs):
+    backend = Counting()
+    cached = CachedExtractor(backend, ExtractionCache(str(tmp_path / 'cache')))
+    cold = dict(cached.extract_many(pdfs))
+    assert backend.extracted == pdfs
+    assert cached.cached == set()
+    warm = dict(cached.extract_many(pdfs))
+    assert warm == cold
+    assert backend.extracted == pdfs
+    assert cached.cached == set(pdfs)
+    # pages from 2 on are a slice of the cached document
+    assert dict(cached.extract_many(pdfs, start=2)) == {pdf: pdf_json[1:] for pdf, pdf_json in cold.items()}
+    assert backend.extracted == pdfs
+
+
+def test_each_pdf_is_hashed_once(tmp_path, pdfs, monkeypatch):
+    hashed = []
+    file_digest = cache_module.file_digest
+    monkeypatch.setattr(cache_module, 'file_digest', lambda pdf: hashed.append(pdf) or file_digest(pdf))
+    cached = CachedExtractor(Counting(), ExtractionCache(str(tmp_path / 'cache')))
+    dict(cached.first_pages(pdfs))
+    dict(cached.extract_many(pdfs, start=2))
+    dict(cached.extract_many(pdfs))
+    assert hashed == pdfs
+    # other bytes are hashed again
+    with open(pdfs[0], 'ab') as f:
+        f.write(b'%%EOF')
+    dict(cached.extract_many(pdfs))
+    assert hashed == pdfs + pdfs[:1]
+
+
+def test_one_miss_per_lookup(tmp_path, pdfs):
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    cached = CachedExtractor(Counting(), cache)
+    # each of these tries the whole document's key too
+    dict(cached.first_pages(pdfs))
+    dict(cached.extract_many(pdfs, start=2))
+    assert (cache.hits, cache.misses) == (0, 2 * len(pdfs))
+    dict(cached.extract_many(pdfs))
+    dict(cached.extract_many(pdfs, start=3))
+    assert (cache.hits, cache.misses) == (len(pdfs), 3 * len(pdfs))
+    assert cache.stats()['hit_rate'] == pytest.approx(0.25)
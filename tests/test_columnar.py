@@ -0,0 +1,46 @@
+""" columnar pages and header geometry """
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.columnar import header_columns, ingest, texts
+
+
+def _row(*cells):
+    """ tabula cells from (text, left, width), padded like tabula pads them """
+    return [{'text': text, 'left': left, 'width': width, 'top': 100.0, 'height': 9.0} for text, left, width in cells]
+
+
+TOP = _row(('', 0.0, 0.0), ('Beginning Deposits', 230.0, 78.8), ('', 0.0, 0.0), ('', 0.0, 0.0),
+           ('Ending', 450.0, 29.3), ('Dividends', 520.0, 39.5))
+COLUMNS = ['Account', 'Beginning Balance', 'Deposits & Credits', 'Withdrawals', 'Ending Balance', 'Dividends YTD']
+
+
+@pytest.mark.parametrize('bottom', [
+    # synthetic json, a cell per column
+    _row(('Account', 36.0, 31.5), ('Balance & Credits', 230.0, 76.5), ('Withdrawals', 330.0, 49.5),
+         ('', 0.0, 0.0), ('Balance', 450.0, 31.5), ('YTD', 520.0, 13.5)),
+    # tabula and pdfminer on the rendered pdf merge the middle columns
+    _row(('Account', 36.0, 33.8), ('Balance & Credits Withdrawals', 230.0, 150.3), ('', 0.0, 0.0),
+         ('', 0.0, 0.0), ('Balance', 450.0, 33.8), ('YTD', 520.0, 18.0)),
+    ], ids=['split', 'merged'])
+def test_header_columns(bottom):
+    assert header_columns(TOP, bottom) == COLUMNS
+
+
+def test_header_columns_of_columnar_rows():
+    page, = ingest([{'data': [TOP, _row(('Account', 36.0, 33.8), ('Balance & Credits Withdrawals', 230.0, 150.3),
+                                        ('Balance', 450.0, 33.8), ('YTD', 520.0, 18.0))]}])
+    assert header_columns(page[0], page[1]) == COLUMNS
+
+
+def test_columnar_rows_match_tabula_rows():
+    pdf_json = synthetic.to_tabula_json(synthetic.statement(pages=3, transactions=40, seed=0))
+    pages = ingest(pdf_json)
+    for page, tabula_page in zip(pages, pdf_json):
+        assert len(page) == len(tabula_page['data'])
+        for index, tabula_row in enumerate(tabula_page['data']):
+            row = page[index]
+            assert texts(row) == texts(tabula_row)
+            for cell, tabula_cell in zip(row, tabula_row):
+                assert cell['left'] == pytest.approx(tabula_cell['left'])
+                assert cell['width'] == pytest.approx(tabula_cell['width'])
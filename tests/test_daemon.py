@@ -0,0 +1,100 @@
+""" the Daemon parses pdfs posted to it and dropped in its inbox as process_batch does """
+import json
+import os
+import shutil
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.daemon import Daemon
+from pydfminer.main import process_batch
+
+
+@pytest.fixture(scope='module')
+def pdfs(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('pdfs'))
+    paths = synthetic.write_directory(directory, files=2, pages=2, transactions=30)
+    # no parser recognises a statement without the becu footer
+    paths += synthetic.write_directory(directory, files=1, pages=2, transactions=30, footer='', prefix='other')
+    return {path: process_batch([path], backend='pdfminer')[0] for path in paths}
+
+
+@pytest.fixture
+def service(tmp_path):
+    inbox = str(tmp_path / 'inbox')
+    os.makedirs(inbox)
+    with Daemon(inbox=inbox, port=0, backend='pdfminer', interval=0.02) as service:
+        yield service
+
+
+def _post(service, pdf, **query):
+    host, port = service.address
+    with open(pdf, 'rb') as f:
+        request = urllib.request.Request(f"http://{host}:{port}/parse?" + urllib.parse.urlencode(query),
+                                         data=f.read(), headers={'Content-Type': 'application/pdf'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def _drop(service, pdf, filed, timeout=60):
+    """ copy pdf into the inbox and wait until filed pdfs are in done or failed """
+    shutil.copy(pdf, service.inbox)
+    deadline = time.monotonic() + timeout
+    while sum(len(os.listdir(os.path.join(service.inbox, name))) for name in ('done', 'failed')) < filed:
+        assert time.monotonic() < deadline, f"{pdf} was not filed"
+        time.sleep(0.02)
+
+
+def test_post_parse(service, pdfs):
+    for pdf, expected in pdfs.items():
+        status, result = _post(service, pdf, name=os.path.basename(pdf))
+        assert result['pdf'] == os.path.basename(pdf)
+        if 'error' in expected:
+            assert (status, result['unclassified']) == (422, True)
+        else:
+            assert status == 200
+            assert result['transactions'] == expected['transactions']
+    stats = service.stats()
+    assert stats['sources']['http']['count'] == len(pdfs)
+    assert stats['sources']['http']['failed'] == 1
+
+
+def test_inbox(service, pdfs):
+    for filed, (pdf, expected) in enumerate(pdfs.items(), 1):
+        _drop(service, pdf, filed)
+        name = os.path.basename(pdf)
+        assert os.path.exists(os.path.join(service.inbox, 'failed' if 'error' in expected else 'done', name))
+        with open(os.path.join(service.output, name[:-len('.pdf')] + '.json')) as f:
+            assert json.load(f).get('transactions') == expected.get('transactions')
+    assert [entry.name for entry in os.scandir(service.inbox) if entry.is_file()] == []
+
+
+def test_inbox_keeps_earlier_pdfs_of_the_same_name(service, pdfs, tmp_path):
+    (first, expected), (second, other) = [(pdf, result) for pdf, result in pdfs.items() if 'error' not in result]
+    again = str(tmp_path / os.path.basename(first))
+    shutil.copy(second, again)
+    _drop(service, first, 1)
+    _drop(service, again, 2)
+    name = os.path.basename(first)[:-len('.pdf')]
+    assert sorted(os.listdir(os.path.join(service.inbox, 'done'))) == [f"{name}-1.pdf", f"{name}.pdf"]
+    for suffix, result in (('', expected), ('-1', other)):
+        with open(os.path.join(service.output, f"{name}{suffix}.json")) as f:
+            assert json.load(f)['transactions'] == result['transactions']
+
+
+@pytest.mark.parametrize('host', ['0.0.0.0', '', '192.168.1.10', 'example.com'])
+def test_only_loopback_hosts(host):
+    with pytest.raises(ValueError):
+        Daemon(host=host)
+
+
+@pytest.mark.parametrize('host', ['localhost', '127.0.0.1', '127.0.0.2', '::1'])
+def test_loopback_hosts(host):
+    assert Daemon(host=host).host == host
@@ -0,0 +1,109 @@
+""" TransactionStore keeps every transaction of overlapping, re-downloaded and corrected statements once """
+import datetime
+import random
+
+import pandas as pd
+import pytest
+
+from pydfminer import ledger, synthetic
+from pydfminer.database import TransactionStore
+
+NAMES = ['Checking 1000', 'Savings 1001']
+MONTHS = [datetime.date(2019, month, 1) for month in range(1, 13)] + [datetime.date(2020, 1, 1)]
+OVERLAP = 7
+
+
+@pytest.fixture(scope='module')
+def truth():
+    rng = random.Random(0)
+    rows = []
+    day = MONTHS[0]
+    while day < MONTHS[-1] + datetime.timedelta(OVERLAP):
+        for name in NAMES:
+            previous = None
+            for _ in range(rng.randint(0, 6)):
+                if previous is None or rng.random() > 0.1:
+                    previous = (name, rng.choice(('deposit', 'withdrawal', 'check')), day,
+                                rng.randint(-500000, 2500000), rng.choice(synthetic.DESCRIPTIONS))
+                # otherwise the same purchase twice in a day
+                rows.append(previous)
+        day += datetime.timedelta(1)
+    result = pd.DataFrame.from_records(rows, columns=ledger.COLUMNS)
+    # as ledger.from_dicts parses them, so the frames compare equal
+    result['date'] = pd.to_datetime(result['date'].map(datetime.date.isoformat), format='%Y-%m-%d')
+    for column in ('account', 'section', 'description'):
+        result[column] = result[column].astype(object)
+    return result
+
+
+def _statement(truth, index):
+    """ month index, and overlap days of the next """
+    start, stop = MONTHS[index], MONTHS[index + 1] + datetime.timedelta(OVERLAP)
+    return truth[(truth['date'] >= pd.Timestamp(start)) & (truth['date'] < pd.Timestamp(stop))].reset_index(drop=True)
+
+
+def _ordered(frame):
+    return frame.sort_values(['account', 'date'], kind='stable').reset_index(drop=True)
+
+
+def test_overlaps_redownloads_and_corrections_are_stored_once(tmp_path, truth):
+    with TransactionStore(str(tmp_path / 'transactions.sqlite')) as store:
+        added = duplicates = 0
+        for index in range(len(MONTHS) - 1):
+            frame = _statement(truth, index)
+            loaded = store.add(frame, digest=f"statement-{index}")
+            assert not loaded['skipped']
+            added += loaded['added']
+            duplicates += loaded['duplicates']
+            # a re-download has the same digest
+            assert store.add(frame, digest=f"statement-{index}") == {
+                'added': 0, 'duplicates': len(frame), 'skipped': True}
+            # a correction is another pdf, with the descriptions respaced and in capitals
+            corrected = frame.copy()
+            corrected['description'] = ' ' + corrected['description'].str.upper().str.replace(' ', '  ') + '.'
+            assert store.add(corrected, digest=f"corrected-{index}")['added'] == 0
+        assert added == len(truth)
+        assert duplicates == sum(len(_statement(truth, index)) for index in range(len(MONTHS) - 1)) - len(truth)
+        assert _ordered(store.query()).equals(_ordered(truth))
+
+
+def test_reopened_store_does_not_load_again(tmp_path, truth):
+    path = str(tmp_path / 'transactions.sqlite')
+    frame = _statement(truth, 0)
+    with TransactionStore(path) as store:
+        assert store.add(frame, digest='statement-0')['added'] == len(frame)
+    with TransactionStore(path) as store:
+        assert store.add(frame, digest='statement-0')['skipped']
+        # the same transactions under another digest are all duplicates
+        assert store.add(frame, digest='copy-0') == {'added': 0, 'duplicates': len(frame), 'skipped': False}
+        assert store.statement('statement-0')['transactions'] == len(frame)
+        assert store.counts() == {'accounts': len(NAMES), 'statements': 2, 'transactions': len(frame)}
+
+
+def test_load_takes_a_process_batch_result(tmp_path, truth):
+    frame = _statement(truth, 1)
+    with TransactionStore(':memory:') as store:
+        loaded = store.load({'pdf': str(tmp_path / 'missing.pdf'), 'parser': 'becu',
+                             'transactions': ledger.to_dicts(frame)}, digest='statement-1')
+        assert loaded['added'] == len(frame)
+        with pytest.raises(ValueError):
+            store.load({'pdf': 'broken.pdf', 'error': 'ValueError()'})
+
+
+@pytest.mark.parametrize('days', [1, 31, 365])
+def test_query_by_account_and_dates(truth, days):
+    rng = random.Random(days)
+    with TransactionStore(':memory:') as store:
+        for index in range(len(MONTHS) - 1):
+            store.add(_statement(truth, index), digest=f"statement-{index}")
+        for _ in range(10):
+            name = rng.choice(NAMES)
+            low = MONTHS[0] + datetime.timedelta(rng.randrange(365 - days + 1))
+            high = low + datetime.timedelta(days - 1)
+            expected = truth[(truth['account'] == name) & (truth['date'] >= pd.Timestamp(low))
+                             & (truth['date'] <= pd.Timestamp(high))]
+            result = store.query(name, low, high)
+            if expected.empty:
+                assert result.empty
+            else:
+                assert result.equals(_ordered(expected))
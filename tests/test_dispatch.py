@@ -0,0 +1,54 @@
+""" the dispatch table parses synthetic statements exactly as the trigger loop does """
+import contextlib
+import io
+import itertools
+
+import pytest
+
+from pydfminer import ledger, synthetic
+from pydfminer.columnar import ingest
+from pydfminer.main import Becu
+
+SEEDS = range(8)
+# accounts, loans, machine, pages
+LAYOUTS = list(itertools.product((1, 3), (0, 2), (0.0, 0.3), (2, 5)))
+
+
+@pytest.fixture(scope='module')
+def grammar():
+    return Becu.compile()
+
+
+def _run(pages, grammar, dispatch):
+    doc = Becu(ingest(synthetic.to_tabula_json(pages)), grammar)
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        doc.run(dispatch=dispatch)
+    return doc, {
+        'state': doc.state,
+        'location': dict(doc.location),
+        'locals': {key: vars(value) for key, value in doc.locals.items()},
+        'records': list(doc.records),
+        'output': output.getvalue(),
+        }
+
+
+@pytest.mark.parametrize('accounts, loans, machine, pages', LAYOUTS)
+def test_dispatch_matches_trigger(grammar, accounts, loans, machine, pages):
+    sections = (synthetic.DEPOSITS, synthetic.WITHDRAWALS)
+    for seed in SEEDS:
+        records = []
+        statement = synthetic.statement(pages=pages, transactions=30 * pages, seed=seed, accounts=accounts,
+                                        loans=loans, sections=sections, machine=machine, records=records)
+        doc, trigger = _run(statement, grammar, dispatch=False)
+        _, dispatch = _run(statement, grammar, dispatch=True)
+        assert dispatch == trigger, f"seed {seed}"
+        assert doc.frame().equals(ledger.transactions(records, ' 01/01/2020 ', ' 01/31/2020 ')), f"seed {seed}"
+
+
+def test_long_account_summary_spans_pages(grammar):
+    records = []
+    statement = synthetic.statement(pages=4, transactions=200, accounts=80, loans=30,
+                                    sections=(synthetic.WITHDRAWALS,), records=records)
+    for dispatch in (False, True):
+        doc, _ = _run(statement, grammar, dispatch=dispatch)
+        assert doc.frame().equals(ledger.transactions(records, ' 01/01/2020 ', ' 01/31/2020 '))
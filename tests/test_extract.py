@@ -0,0 +1,93 @@
+""" the pdfminer backend extracts synthetic statements as tabula does, and every backend stops at the last page """
+import contextlib
+import io
+import re
+import shutil
+
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.columnar import ingest
+from pydfminer.extract import extractor, page_count
+from pydfminer.main import Becu
+
+needs_java = pytest.mark.skipif(shutil.which('java') is None, reason="tabula needs java")
+
+# accounts, loans, machine, sections
+LAYOUTS = [
+    (1, 0, 0.0, (synthetic.WITHDRAWALS,)),
+    (3, 1, 0.3, (synthetic.DEPOSITS, synthetic.WITHDRAWALS)),
+    (1, 1, 0.3, (synthetic.WITHDRAWALS,)),
+    (3, 0, 0.0, (synthetic.DEPOSITS, synthetic.WITHDRAWALS)),
+    ]
+
+
+@pytest.fixture(scope='module')
+def pdfs(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('statements')
+    paths = []
+    for seed, (accounts, loans, machine, sections) in enumerate(LAYOUTS):
+        path = directory / f"statement-{seed:04d}.pdf"
+        path.write_bytes(synthetic.to_pdf(synthetic.statement(
+            pages=3 + seed % 3, transactions=120, seed=seed, accounts=accounts, loans=loans,
+            machine=machine, sections=sections)))
+        paths.append(str(path))
+    return paths
+
+
+def _texts(pdf_json):
+    return [[cell['text'] for cell in row] for page in pdf_json for row in page['data']]
+
+
+def _parse(pdf_json):
+    doc = Becu(ingest(pdf_json))
+    with contextlib.redirect_stdout(io.StringIO()):
+        doc.run()
+    return doc.state, doc.records
+
+
+@needs_java
+@pytest.mark.parametrize('options', [{}, {'area': [6.0, 0, 100, 100]}], ids=['whole', 'cropped'])
+def test_pdfminer_matches_tabula(pdfs, options):
+    expected = dict(extractor('tabula', **options).extract_many(pdfs))
+    actual = dict(extractor('pdfminer', **options).extract_many(pdfs))
+    for path in pdfs:
+        assert len(actual[path]) == len(expected[path]), path
+        assert _texts(actual[path]) == _texts(expected[path]), path
+        for page, reference_page in zip(actual[path], expected[path]):
+            for row, reference_row in zip(page['data'], reference_page['data']):
+                for cell, reference_cell in zip(row, reference_row):
+                    assert cell['left'] == pytest.approx(reference_cell['left'], abs=1.0), path
+        if not options:
+            assert _parse(actual[path]) == _parse(expected[path]), path
+
+
+@pytest.fixture
+def stray_count(tmp_path):
+    """ a 4 page statement with an outline dictionary claiming 12 entries """
+    data = synthetic.to_pdf(synthetic.statement(pages=4, transactions=30, seed=1))
+    number = max(int(number) for number in re.findall(rb"(\d+) 0 obj", data)) + 1
+    xref = data.index(b"xref")
+    data = data[:xref] + b"%d 0 obj\n<< /Type /Outlines /Count 12 >>\nendobj\n" % number + data[xref:]
+    data = re.sub(rb"startxref\s+\d+", b"startxref\n%d" % data.index(b"xref"), data)
+    path = tmp_path / 'stray.pdf'
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_page_count_reads_the_page_tree(stray_count):
+    assert page_count(stray_count) == 4
+
+
+@needs_java
+@pytest.mark.parametrize('backend', ['tabula', 'batch', 'pdfminer'])
+def test_pages_after_the_first_stop_at_the_last(stray_count, backend):
+    pdf_json = dict(extractor(backend).extract_many([stray_count], start=2))[stray_count]
+    assert not isinstance(pdf_json, Exception)
+    assert len(pdf_json) == 3
+
+
+@needs_java
+@pytest.mark.parametrize('window', [1, 2, 4])
+def test_page_stream_ends_at_the_last_page(stray_count, window):
+    assert len(list(extractor('tabula').pages(stray_count, window=window))) == 4
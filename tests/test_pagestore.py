@@ -0,0 +1,66 @@
+""" pages written to a PageStore come back as they went in """
+import contextlib
+import io
+
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.columnar import ingest, texts
+from pydfminer.extract import PageStream
+from pydfminer.main import Becu
+from pydfminer.pagestore import PageStore, write
+
+
+@pytest.fixture(scope='module')
+def pdf_json():
+    pages = synthetic.to_tabula_json(synthetic.statement(pages=6, transactions=200, accounts=2, loans=1, machine=0.2))
+    # a page without rows, and texts that are not ascii
+    pages.insert(2, {'data': []})
+    pages[1]['data'].append([{'text': 'Café – 5 €', 'left': 36.0, 'width': 40.0, 'top': 700.0, 'height': 9.0}])
+    return pages
+
+
+def _same(store, pdf_json):
+    assert len(store) == len(pdf_json)
+    for page, tabula_page in zip(store, pdf_json):
+        assert len(page) == len(tabula_page['data'])
+        for index, tabula_row in enumerate(tabula_page['data']):
+            assert texts(page[index]) == texts(tabula_row)
+            for cell, tabula_cell in zip(page[index], tabula_row):
+                for key in ('left', 'width', 'top', 'height'):
+                    assert cell[key] == pytest.approx(tabula_cell[key])
+
+
+@pytest.mark.parametrize('source', ['tabula', 'stream', 'columnar'])
+def test_round_trip(tmp_path, pdf_json, source):
+    pages = {'tabula': pdf_json, 'stream': PageStream(iter(pdf_json)), 'columnar': ingest(pdf_json)}[source]
+    path = str(tmp_path / 'statement.pages')
+    assert write(path, pages, meta={'backend': 'tabula', 'cropped': False}) == len(pdf_json)
+    with PageStore(path) as store:
+        _same(store, pdf_json)
+        assert store.meta == {'backend': 'tabula', 'cropped': False}
+        assert texts(store[-1][-1]) == texts(pdf_json[-1]['data'][-1])
+        with pytest.raises(IndexError):
+            store[len(pdf_json)]
+    # nothing is left of the temporary file it was written to
+    assert list(tmp_path.iterdir()) == [tmp_path / 'statement.pages']
+
+
+def test_store_parses_as_the_list(tmp_path, pdf_json):
+    pdf_json = [page for page in pdf_json if page['data']]
+    path = str(tmp_path / 'statement.pages')
+    write(path, pdf_json)
+    outcomes = []
+    for pages in (ingest(pdf_json), PageStore(path)):
+        doc = Becu(pages)
+        with contextlib.redirect_stdout(io.StringIO()):
+            doc.run()
+        outcomes.append((doc.state, doc.location, doc.records))
+    assert outcomes[0] == outcomes[1]
+
+
+def test_not_a_store(tmp_path):
+    path = tmp_path / 'statement.pages'
+    path.write_bytes(b'%PDF-1.4' + b'\0' * 64)
+    with pytest.raises(ValueError):
+        PageStore(str(path))
@@ -0,0 +1,37 @@
+""" parse_pages stitches spans of pages parsed apart into the sequential parse """
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.main import Becu, parse_pages
+from pydfminer.pagestore import PageStore, write
+
+
+def _outcome(doc):
+    return {
+        'state': doc.state,
+        'location': dict(doc.location),
+        'locals': {key: vars(value) for key, value in doc.locals.items()},
+        'records': list(doc.records),
+        }
+
+
+@pytest.fixture(scope='module', params=[(1, 0), (3, 2)], ids=['one_account', 'accounts_and_loans'])
+def store(request, tmp_path_factory):
+    accounts, loans = request.param
+    statement = synthetic.statement(pages=24, transactions=1200, accounts=accounts, loans=loans, machine=0.2,
+                                    sections=(synthetic.DEPOSITS, synthetic.WITHDRAWALS, synthetic.CHECKS))
+    path = str(tmp_path_factory.mktemp('store') / 'statement.pages')
+    write(path, synthetic.to_tabula_json(statement))
+    store = PageStore(path)
+    doc = Becu(store)
+    doc.run()
+    yield path, _outcome(doc)
+    store.close()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('span', [None, 1, 3])
+def test_stitched_parse_matches_sequential(store, workers, span):
+    path, expected = store
+    doc = parse_pages(path, 'becu', workers=workers, span=span)
+    assert _outcome(doc) == expected
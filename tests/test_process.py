@@ -0,0 +1,43 @@
+""" process_many survives a worker that dies """
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from pydfminer import main, synthetic
+
+# the patched process_batch only reaches workers forked from the test
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork workers")
+
+
+_process_batch = main.process_batch
+
+
+def _crashing(pdfs, *args, **kwargs):
+    """ process_batch, but the worker dies on statement-1.pdf and statement-3.pdf """
+    if any(pdf.endswith(('statement-1.pdf', 'statement-3.pdf')) for pdf in pdfs):
+        os._exit(1)
+    return _process_batch(pdfs, *args, **kwargs)
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    paths = []
+    for seed in range(6):
+        path = tmp_path / f"statement-{seed}.pdf"
+        path.write_bytes(synthetic.to_pdf(synthetic.statement(pages=2, transactions=20, seed=seed)))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('workers', [1, 2, 3])
+@pytest.mark.parametrize('backend', ['pdfminer', 'batch'])
+def test_dead_worker_fails_only_its_pdfs(monkeypatch, pdfs, backend, workers):
+    if backend == 'batch' and shutil.which('java') is None:
+        pytest.skip("the batch backend needs java")
+    monkeypatch.setattr(main, 'process_batch', _crashing)
+    result = main.process_many(pdfs, workers=workers, backend=backend)
+    assert sorted(result['pdf'] for result in result['results']) == [pdfs[0], pdfs[2], pdfs[4], pdfs[5]]
+    assert [error['pdf'] for error in result['errors']] == [pdfs[1], pdfs[3]]
+    assert all('BrokenProcessPool' in error['error'] for error in result['errors'])
@@ -0,0 +1,91 @@
+""" run() past a page that fails to parse """
+import random
+import re
+
+import pytest
+
+from pydfminer import synthetic
+from pydfminer.columnar import ingest
+from pydfminer.main import Becu
+
+SEEDS = range(12)
+
+
+@pytest.fixture(scope='module')
+def grammar():
+    return Becu.compile()
+
+
+def _broken(seed, accounts, new_account=False):
+    """ the clean pages, the same with an empty row after an activity line of a middle page, and that page
+
+    AccountActivityLine looks at the row after a line for a Machine
+    continuation and fails on an empty one. new_account picks a page where
+    an account starts before the empty row
+    """
+    pdf_json = synthetic.to_tabula_json(synthetic.statement(pages=6, transactions=300, seed=seed,
+                                                            accounts=accounts, records=[]))
+    clean = ingest(pdf_json)
+    rng = random.Random(seed)
+    candidates = []
+    for page in range(1, len(pdf_json) - 2):
+        rows = [row[0]['text'] if row else '' for row in pdf_json[page]['data']]
+        account = next((number for number, text in enumerate(rows) if re.match(r'(Checking|Savings) \d+$', text)), None)
+        lines = [number for number, text in enumerate(rows) if re.match(r'\d\d/\d\d', text)
+                 and (not new_account or account is not None and number > account)]
+        candidates.extend((page, line) for line in lines)
+    if not candidates:
+        pytest.skip("no page starts an account")
+    page, line = rng.choice(candidates)
+    pdf_json[page]['data'].insert(line + 1, [])
+    return clean, ingest(pdf_json), page
+
+
+def _bounds(clean, grammar, page):
+    """ how many records the pages before page, and it, give """
+    bounded = []
+    for stop in (page, page + 1):
+        doc = Becu(clean, grammar)
+        doc.stop = (stop, doc.page_entry(stop)[1])
+        doc.run()
+        bounded.append(len(doc.records))
+    return bounded
+
+
+@pytest.mark.parametrize('accounts', [1, 3])
+def test_raise_stops_at_the_failed_page(grammar, accounts):
+    for seed in SEEDS:
+        _, broken, _ = _broken(seed, accounts)
+        with pytest.raises(IndexError):
+            Becu(broken, grammar).run(errors='raise')
+
+
+@pytest.mark.parametrize('accounts', [1, 3])
+def test_skip_drops_the_rest_of_the_failed_page(grammar, accounts):
+    for seed in SEEDS:
+        clean, broken, page = _broken(seed, accounts)
+        expected = Becu(clean, grammar)
+        expected.run()
+        expected = expected.records
+        before, through = _bounds(clean, grammar, page)
+        doc = Becu(broken, grammar)
+        doc.run(errors='skip')
+        assert [error['page'] for error in doc.errors] == [page]
+        kept = len(doc.records) - (len(expected) - through)
+        assert before <= kept < through, f"seed {seed}"
+        assert doc.records == expected[:kept] + expected[through:], f"seed {seed}"
+
+
+@pytest.mark.parametrize('accounts, new_account', [(1, False), (3, False), (3, True)])
+def test_rollback_drops_the_failed_page(grammar, accounts, new_account):
+    for seed in SEEDS:
+        clean, broken, page = _broken(seed, accounts, new_account=new_account)
+        expected = Becu(clean, grammar)
+        expected.run()
+        before, through = _bounds(clean, grammar, page)
+        doc = Becu(broken, grammar)
+        doc.run(errors='rollback')
+        assert [error['page'] for error in doc.errors] == [page]
+        assert doc.errors[0]['dropped_records'] >= 0
+        # the lines after the failed page keep the account and section it set
+        assert doc.records == expected.records[:before] + expected.records[through:], f"seed {seed}"